@@ -0,0 +1,195 @@
+"""
+لایه انتقال async با استخر اتصال keep-alive برای تلگرام و OpenAI
+
+یک event loop در نخ جداگانه اجرا می‌شود و همه درخواست‌های شبکه روی آن انجام می‌شوند.
+نخ‌های worker فقط منتظر نتیجه درخواست خودشان می‌مانند، پس ارسال پیام به چت‌های مختلف
+هم‌زمان و روی اتصال‌های باز مشترک انجام می‌شود.
+
+آدرس‌ها قابل تغییرند (TELEGRAM_API_URL / OPENAI_BASE_URL) تا روی سرور mock محلی هم کار کند.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+
+log = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+
+class TelegramAPIError(Exception):
+    def __init__(self, method, code, description):
+        super().__init__(f"{method}: [{code}] {description}")
+        self.code = code
+        self.description = description
+
+
+class AsyncTransport:
+    def __init__(self, token, api_url=TELEGRAM_API_URL, max_connections=100,
+                 max_keepalive=20, timeout=30.0):
+        self.token = token
+        self.api_url = api_url.rstrip("/")
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.timeout = timeout
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._openai = None
+        self._lock = threading.Lock()
+
+    # --- event loop پس‌زمینه ---
+
+    def start(self):
+        # ساخت loop و نخ آن از پیش (warm-up)، تا اولین درخواست منتظر آن نماند
+        return self.loop
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever,
+                                                name="async-transport", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro):
+        # از هر نخی: coroutine روی loop اجرا و concurrent Future برگردانده می‌شود
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, make_stream):
+        # تبدیل async iterator (مثلاً stream پاسخ OpenAI) به generator همگام برای نخ worker
+        items = queue.Queue()
+
+        async def pump():
+            stream = None
+            try:
+                stream = await make_stream()
+                async for item in stream:
+                    items.put((True, item))
+            except Exception as e:
+                items.put((False, e))
+                return
+            finally:
+                # با لغو هم پاسخ HTTP بسته می‌شود تا اتصال به استخر برگردد
+                close = getattr(stream, "aclose", None) or getattr(getattr(stream, "response", None),
+                                                                   "aclose", None)
+                if close is not None:
+                    await close()
+            items.put((False, None))
+
+        task = self.submit(pump())
+        try:
+            while True:
+                ok, item = items.get()
+                if not ok:
+                    if item is not None:
+                        raise item
+                    return
+                yield item
+        finally:
+            # مصرف‌کننده زودتر دست کشیده (break یا خطا)؛ دریافت بقیه stream بی‌فایده است
+            task.cancel()
+
+    def _http_client(self):
+        # httpx در اولین درخواست ایمپورت می‌شود تا شروع بات سریع بماند
+        import httpx
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_keepalive)
+        return httpx.AsyncClient(limits=limits, timeout=self.timeout)
+
+    @property
+    def client(self):
+        # فقط داخل loop صدا زده می‌شود
+        if self._client is None:
+            self._client = self._http_client()
+        return self._client
+
+    # --- تلگرام ---
+
+    def method_url(self, method):
+        return f"{self.api_url}/bot{self.token}/{method}"
+
+    async def call(self, method, files=None, **params):
+        params = {k: v for k, v in params.items() if v is not None}
+        if files:
+            r = await self.client.post(self.method_url(method), data=params, files=files)
+        else:
+            r = await self.client.post(self.method_url(method), json=params)
+        body = r.json()
+        if not body.get("ok"):
+            raise TelegramAPIError(method, body.get("error_code", r.status_code),
+                                   body.get("description", ""))
+        return body["result"]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self.call("sendMessage", chat_id=chat_id, text=text, **kwargs)
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        # photo: file_id (str) یا bytes
+        if isinstance(photo, str):
+            return await self.call("sendPhoto", chat_id=chat_id, photo=photo,
+                                   caption=caption, **kwargs)
+        return await self.call("sendPhoto", files={"photo": ("photo.png", photo)},
+                               chat_id=chat_id, caption=caption, **kwargs)
+
+    async def gather(self, calls):
+        # ارسال هم‌زمان؛ خطای یکی بقیه را متوقف نمی‌کند
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    def send_many(self, messages, timeout=None):
+        """messages: لیست (chat_id, text, kwargs)"""
+        return self.run(self.gather(
+            [self.send_message(cid, text, **kw) for cid, text, kw in messages]
+        ), timeout)
+
+    # --- سازگاری با pyTelegramBotAPI (apihelper.CUSTOM_REQUEST_SENDER) ---
+
+    async def _request(self, method, url, params=None, files=None, timeout=None):
+        if isinstance(timeout, tuple):
+            import httpx
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        files = {k: v if isinstance(v, tuple) else (k, v) for k, v in (files or {}).items()}
+        return await self.client.request(method.upper(), url, params=params,
+                                         files=files or None, timeout=timeout or self.timeout)
+
+    def request_sender(self, method, url, params=None, files=None, timeout=None, proxies=None, **kwargs):
+        # httpx.Response همان status_code / text / json() مورد نیاز telebot را دارد
+        return self.run(self._request(method, url, params, files, timeout))
+
+    # --- OpenAI ---
+
+    def openai(self, api_key=None, base_url=None):
+        # کلاینت async OpenAI که روی همین loop و با استخر اتصال جداگانه کار می‌کند
+        if self._openai is None:
+            from openai import AsyncOpenAI
+            self._openai = AsyncOpenAI(
+                api_key=api_key, base_url=base_url,
+                http_client=self._http_client(),
+            )
+        return self._openai
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def _close():
+            if self._client is not None:
+                await self._client.aclose()
+            if self._openai is not None:
+                await self._openai.close()
+            # generatorهای async نیمه‌کاره (stream رها شده) قبل از توقف loop بسته می‌شوند
+            await loop.shutdown_asyncgens()
+
+        asyncio.run_coroutine_threadsafe(_close(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(5)
+        self._client = None
+        self._openai = None
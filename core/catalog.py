@@ -0,0 +1,176 @@
+"""
+کاتالوگ نمونه کارها
+
+- ایندکس SQLite از متادیتای عکس‌ها (دسته، برچسب، ابعاد) تا صفحه‌ها بدون اسکن پوشه ساخته شوند
+- ساخت یک‌باره بندانگشتی‌ها در ProcessPool (فقط برای عکس‌های جدید یا تغییر کرده)
+- صفحه‌بندی بر اساس دسته برای دکمه‌های inline تلگرام
+
+دسته هر عکس از زیرپوشه (images/kitchen/a.jpg) یا پیشوند نام فایل (kitchen_a.jpg) گرفته می‌شود.
+برچسب‌ها و دسته دلخواه را می‌توان در images/catalog.json تعریف کرد:
+    {"a.jpg": {"category": "kitchen", "tags": ["هایگلاس", "سفید"]}}
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from core.file_lock import file_lock
+
+log = logging.getLogger(__name__)
+
+CATEGORIES = {
+    "kitchen": "کابینت آشپزخانه",
+    "wardrobe": "کمد دیواری",
+    "bedroom": "سرویس خواب",
+    "table": "میز و کنسول",
+}
+DEFAULT_CATEGORY = "other"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+THUMB_SIZE = (800, 800)
+PAGE_SIZE = 6
+
+
+def make_thumbnail(src, dst, size=THUMB_SIZE):
+    # در پردازه فرزند اجرا می‌شود؛ Pillow همراه matplotlib نصب است
+    from PIL import Image, ImageOps
+
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img)
+        width, height = img.size
+        img.thumbnail(size)
+        Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        img.convert("RGB").save(dst, "JPEG", quality=82, optimize=True, progressive=True)
+    return width, height
+
+
+class Catalog:
+    def __init__(self, root, db_path=None, thumbs=None):
+        self.root = Path(root)
+        self.thumbs = Path(thumbs) if thumbs else self.root / ".thumbs"
+        self._db = sqlite3.connect(str(db_path or self.root / ".catalog.db"), timeout=5,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS photos ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, category TEXT NOT NULL, "
+            "tags TEXT NOT NULL DEFAULT '', width INTEGER, height INTEGER, "
+            "mtime INTEGER NOT NULL, thumb TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS photos_category ON photos (category, id)")
+        self._lock = threading.Lock()
+
+    # --- اسکن و ساخت بندانگشتی (یک بار، افزایشی) ---
+
+    def _meta(self):
+        try:
+            with open(self.root / "catalog.json", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning(f"catalog.json unreadable: {e}")
+            return {}
+
+    def _category(self, rel, meta):
+        if meta.get("category"):
+            return meta["category"]
+        if len(rel.parts) > 1 and rel.parts[0] in CATEGORIES:
+            return rel.parts[0]
+        prefix = rel.stem.split("_", 1)[0].lower()
+        return prefix if prefix in CATEGORIES else DEFAULT_CATEGORY
+
+    def scan(self):
+        # فقط مسیر، دسته و mtime؛ خواندن محتوای عکس در sync و به صورت موازی انجام می‌شود
+        meta = self._meta()
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                path = Path(dirpath) / name
+                if path.suffix.lower() not in IMAGE_SUFFIXES:
+                    continue
+                rel = path.relative_to(self.root)
+                info = meta.get(name) or meta.get(str(rel)) or {}
+                yield (str(rel), self._category(rel, info), " ".join(info.get("tags", [])),
+                       path.stat().st_mtime_ns)
+
+    def sync(self, workers=None):
+        """عکس‌های جدید یا تغییر کرده را ایندکس و بندانگشتی آن‌ها را می‌سازد؛ خروجی: تعداد به‌روز شده"""
+        # warm-up همه workerهای گونیکورن sync را صدا می‌زند؛ فقط یکی بندانگشتی می‌سازد و
+        # بقیه بعد از آن فقط تغییری نمی‌بینند
+        with file_lock(self.root / ".catalog.lock"):
+            return self._sync(workers)
+
+    def _sync(self, workers):
+        with self._lock:
+            known = dict(self._db.execute("SELECT path, mtime FROM photos"))
+        found = list(self.scan())
+        todo = [f for f in found if known.get(f[0]) != f[3]]
+        removed = set(known) - {f[0] for f in found}
+
+        results = []
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    (f, pool.submit(make_thumbnail, str(self.root / f[0]),
+                                    str(self.thumbs / Path(f[0]).with_suffix(".jpg"))))
+                    for f in todo
+                ]
+                for f, fut in futures:
+                    try:
+                        results.append((f, fut.result()))
+                    except Exception as e:
+                        # بدون بندانگشتی هم ایندکس می‌شود و عکس اصلی ارسال خواهد شد
+                        log.warning(f"Thumbnail failed for {f[0]}: {e}")
+                        results.append((f, None))
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            for (rel, category, tags, mtime), size in results:
+                w, h = size or (None, None)
+                thumb = str(self.thumbs / Path(rel).with_suffix(".jpg")) if size else None
+                self._db.execute(
+                    "INSERT INTO photos (path, category, tags, width, height, mtime, thumb) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+                    "category=excluded.category, tags=excluded.tags, width=excluded.width, "
+                    "height=excluded.height, mtime=excluded.mtime, thumb=excluded.thumb",
+                    (rel, category, tags, w, h, mtime, thumb),
+                )
+            for rel in removed:
+                self._db.execute("DELETE FROM photos WHERE path = ?", (rel,))
+            self._db.execute("COMMIT")
+        if results or removed:
+            log.info(f"Catalog sync: {len(results)} updated, {len(removed)} removed")
+        return len(results)
+
+    # --- صفحه‌بندی ---
+
+    def count(self, category):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM photos WHERE category = ?", (category,)
+            ).fetchone()[0]
+
+    def page(self, category, page=0, per_page=PAGE_SIZE, tag=None):
+        """خروجی: (لیست dict عکس‌ها، تعداد کل صفحات)"""
+        where, args = "category = ?", [category]
+        if tag:
+            where += " AND (' ' || tags || ' ') LIKE ?"
+            args.append(f"% {tag} %")
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM photos WHERE {where}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT path, tags, width, height, thumb FROM photos WHERE {where} "
+                "ORDER BY id LIMIT ? OFFSET ?",
+                (*args, per_page, page * per_page),
+            ).fetchall()
+        pages = max(1, -(-total // per_page))
+        items = [
+            {"path": self.root / p, "tags": t.split() if t else [], "width": w, "height": h,
+             "thumb": Path(th) if th else self.root / p}
+            for p, t, w, h, th in rows
+        ]
+        return items, pages
@@ -0,0 +1,146 @@
+"""
+حافظه گفتگوی هر چت برای HAgent
+
+- حلقه ثابت (deque) از آخرین پیام‌ها برای هر چت
+- پیام‌هایی که از حلقه بیرون می‌افتند در یک خلاصه کوتاه ادغام می‌شوند؛ با defer خلاصه‌سازی
+  (فراخوانی مدل) در پس‌زمینه انجام می‌شود و پاسخ کاربر منتظر آن نمی‌ماند
+- هنگام ساخت درخواست فقط پیام‌هایی که در بودجه توکن جا می‌شوند ارسال می‌شوند
+- تعداد چت‌های فعال با LRU محدود است، پس حافظه با زیاد شدن کاربران بی‌حد رشد نمی‌کند
+"""
+
+import logging
+import threading
+from collections import OrderedDict, deque
+
+log = logging.getLogger(__name__)
+
+SUMMARY_LIMIT = 1200  # حداکثر طول خلاصه (کاراکتر)
+
+
+def estimate_tokens(text):
+    # تخمین سریع بدون tokenizer؛ متن فارسی حدوداً ۳ کاراکتر در هر توکن
+    return len(text) // 3 + 1
+
+
+def extractive_summary(summary, turns):
+    # خلاصه پیش‌فرض بدون فراخوانی مدل: سوال‌های کاربر و ابتدای پاسخ‌ها
+    lines = [summary] if summary else []
+    for role, text, _ in turns:
+        text = " ".join(text.split())
+        if role == "user":
+            lines.append(f"کاربر: {text[:160]}")
+        else:
+            lines.append(f"حسین: {text[:100]}")
+    joined = "\n".join(lines)
+    return joined[-SUMMARY_LIMIT:]
+
+
+class ChatMemory:
+    __slots__ = ("turns", "summary", "evicted", "summarising")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)  # (role, text, tokens)
+        self.summary = ""
+        self.evicted = []
+        self.summarising = False
+
+
+class ConversationMemory:
+    def __init__(self, max_turns=12, token_budget=1500, max_chats=5000,
+                 summarise=extractive_summary, summarise_every=4, defer=None):
+        """
+        summarise: تابع (خلاصه فعلی، پیام‌های بیرون‌افتاده) -> خلاصه جدید
+        summarise_every: خلاصه‌سازی بعد از جمع شدن این تعداد پیام بیرون‌افتاده انجام می‌شود
+        defer: تابع (fn, *args) برای اجرای خلاصه‌سازی در پس‌زمینه (مثلاً executor.submit)؛
+               None یعنی همان‌جا در add
+        """
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.max_chats = max_chats
+        self.summarise = summarise
+        self.summarise_every = summarise_every
+        self.defer = defer
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _chat(self, cid):
+        chat = self._chats.get(cid)
+        if chat is None:
+            chat = self._chats[cid] = ChatMemory(self.max_turns)
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(cid)
+        return chat
+
+    def add(self, cid, role, text):
+        with self._lock:
+            chat = self._chat(cid)
+            if len(chat.turns) == chat.turns.maxlen:
+                chat.evicted.append(chat.turns[0])
+            chat.turns.append((role, text, estimate_tokens(text)))
+            if chat.summarising or len(chat.evicted) < self.summarise_every:
+                return
+            chat.summarising = True
+        if self.defer is None:
+            self._summarise(cid)
+            return
+        try:
+            self.defer(self._summarise, cid)
+        except RuntimeError:
+            # executor بسته شده (خاموش شدن پردازه)
+            self._summarise(cid)
+
+    def _summarise(self, cid):
+        # پیام‌های بیرون‌افتاده تا پایان خلاصه‌سازی در evicted می‌مانند تا از زمینه حذف نشوند
+        with self._lock:
+            chat = self._chats.get(cid)
+            if chat is None:
+                return
+            summary, evicted = chat.summary, list(chat.evicted)
+        # خلاصه‌سازی (ممکن است فراخوانی مدل باشد) بیرون از قفل
+        try:
+            summary = self.summarise(summary, evicted)
+        except Exception as e:
+            log.warning(f"Conversation summary failed for {cid}: {e}")
+            summary = extractive_summary(summary, evicted)
+        with self._lock:
+            chat = self._chats.get(cid)
+            if chat is not None:
+                chat.summary = summary[-SUMMARY_LIMIT:]
+                del chat.evicted[:len(evicted)]
+                chat.summarising = False
+
+    def messages(self, cid, budget=None):
+        # پیام‌های قبلی برای درخواست مدل، از جدید به قدیم تا جایی که بودجه اجازه دهد
+        budget = self.token_budget if budget is None else budget
+        with self._lock:
+            chat = self._chats.get(cid)
+            if chat is None:
+                return []
+            turns = list(chat.turns)
+            summary = chat.summary
+            pending = list(chat.evicted)
+
+        out = []
+        if summary or pending:
+            summary = extractive_summary(summary, pending) if pending else summary
+            # خلاصه حداکثر یک سوم بودجه را می‌گیرد تا پیام‌های اخیر حذف نشوند
+            summary = summary[-(budget // 3) * 3:] if budget >= 3 else ""
+            budget -= estimate_tokens(summary)
+        for role, text, tokens in reversed(turns):
+            if tokens > budget:
+                break
+            budget -= tokens
+            out.append({"role": role, "content": text})
+        out.reverse()
+        if summary:
+            out.insert(0, {"role": "system", "content": f"خلاصه گفتگوی قبلی با کاربر:\n{summary}"})
+        return out
+
+    def clear(self, cid):
+        with self._lock:
+            self._chats.pop(cid, None)
+
+    def __len__(self):
+        return len(self._chats)
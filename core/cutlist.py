@@ -0,0 +1,194 @@
+"""
+ورود گروهی لیست برش
+
+قالب‌های قابل قبول در هر خط (متن چسبانده شده یا فایل CSV):
+    60x40            یک قطعه
+    60x40 x12        ۱۲ عدد (همچنین: 60×40×12، 60*40*12، 60x40 12)
+    60x40 x12 ر      با جهت رگه ثابت
+    60,40,12         CSV: عرض، ارتفاع، تعداد، رگه (اختیاری)، برچسب (اختیاری)
+خطوط خالی و خطوطی که با # شروع می‌شوند نادیده گرفته می‌شوند؛ سطر عنوان CSV خودکار تشخیص داده می‌شود.
+
+پارسر خط به خط کار می‌کند و خطای هر خط را با شماره خط گزارش می‌دهد.
+قطعات یکسان (ابعاد، رگه و برچسب برابر) در یک آیتم با تعداد ادغام می‌شوند؛
+دو قطعه هم‌اندازه با برچسب متفاوت جدا می‌مانند تا برچسب هیچ‌کدام گم نشود.
+"""
+
+import csv
+import io
+import math
+import re
+from typing import NamedTuple
+
+from core.packing import Part
+
+GRAIN_MARKS = {"ر", "g", "grain", "رگه"}
+MAX_QTY = 10000
+
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٫", "01234567890123456789.")
+# تعداد عدد صحیح است؛ «x1.5» تعداد ۱ با برچسب «.5» خوانده نمی‌شود
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*[x×*]\s*(\d+(?:\.\d+)?)"
+                   r"(?:\s*[x×*]?\s*(\d+)(?![\d.]))?\s*(.*)$", re.IGNORECASE)
+_QTY_LIKE = re.compile(r"^[x×*]?\s*\d*\.?\d", re.IGNORECASE)
+
+
+class CutItem(NamedTuple):
+    w: float
+    h: float
+    grain: bool = False
+    qty: int = 1
+    label: str = ""
+
+
+class ParseError(NamedTuple):
+    line: int
+    text: str
+    message: str
+
+
+def _number(text, name):
+    # پیام خطا فارسی؛ متن انگلیسی float() به کاربر نشان داده نمی‌شود
+    try:
+        value = float(text.translate(_DIGITS).strip())
+    except ValueError:
+        value = math.nan
+    if not math.isfinite(value):
+        raise ValueError(f"{name} باید عدد باشد")
+    return value
+
+
+def _qty(text):
+    text = text.translate(_DIGITS).strip()
+    if not text.isdigit():
+        raise ValueError("تعداد باید عدد صحیح باشد")
+    return int(text)
+
+
+def parse_fields(fields):
+    """ستون‌های یک سطر CSV -> CutItem یا None؛ در صورت خطا ValueError"""
+    fields = [f.translate(_DIGITS).strip() for f in fields]
+    if not any(fields) or fields[0].startswith("#"):
+        return None
+    if len(fields) < 2 or not fields[1]:
+        raise ValueError("عرض و ارتفاع لازم است")
+    w, h = _number(fields[0], "عرض"), _number(fields[1], "ارتفاع")
+    qty = _qty(fields[2]) if len(fields) > 2 and fields[2] else 1
+    grain = len(fields) > 3 and fields[3].lower() in GRAIN_MARKS | {"1", "yes", "true", "بله"}
+    label = fields[4] if len(fields) > 4 else ""
+    return _item(w, h, grain, qty, label)
+
+
+def parse_line(text):
+    """یک خط -> CutItem یا None (خط خالی/توضیح)؛ در صورت خطا ValueError"""
+    text = text.translate(_DIGITS).strip()
+    if not text or text.startswith("#"):
+        return None
+
+    if "," in text or ";" in text or "\t" in text:
+        return parse_fields(re.split(r"[,;\t]", text))
+
+    m = _SIZE.match(text)
+    if not m:
+        raise ValueError("فرمت ابعاد نامعتبر")
+    if m.group(3) is None and _QTY_LIKE.match(m.group(4)):
+        # «60x40 x1.5» یا «60x40 2.5»: تعداد اعشاری
+        raise ValueError("تعداد باید عدد صحیح باشد")
+    w, h = float(m.group(1)), float(m.group(2))
+    qty = int(m.group(3)) if m.group(3) else 1
+    rest = m.group(4).split()
+    grain = bool(rest) and rest[-1].lower() in GRAIN_MARKS
+    label = " ".join(rest[:-1] if grain else rest)
+    return _item(w, h, grain, qty, label)
+
+
+def _item(w, h, grain, qty, label):
+    if w <= 0 or h <= 0:
+        raise ValueError("ابعاد باید بزرگ‌تر از صفر باشد")
+    if not 1 <= qty <= MAX_QTY:
+        raise ValueError(f"تعداد باید بین ۱ و {MAX_QTY} باشد")
+    return CutItem(w, h, grain, qty, label)
+
+
+def _is_header(first):
+    try:
+        float(first.translate(_DIGITS).strip())
+        return False
+    except ValueError:
+        return True
+
+
+def iter_lines(lines):
+    """
+    (شماره خط، CutItem | ParseError) به صورت جریانی
+    هر خط یا متن است یا لیست ستون‌ها (سطر csv.reader که برچسبش ممکن است کاما داشته باشد)
+    """
+    for no, line in enumerate(lines, 1):
+        if isinstance(line, str):
+            line = line.rstrip("\r\n")
+            text, parse = line, parse_line
+            header = ("," in line or ";" in line) and _is_header(re.split(r"[,;\t]", line, maxsplit=1)[0])
+        else:
+            text, parse = ",".join(line), parse_fields
+            header = len(line) > 1 and _is_header(line[0])
+        if no == 1 and header:
+            continue
+        try:
+            item = parse(line)
+        except ValueError as e:
+            yield no, ParseError(no, text.strip()[:40], str(e) or "فرمت نامعتبر")
+            continue
+        if item is not None:
+            yield no, item
+
+
+class CutList:
+    def __init__(self):
+        self._items = {}   # (w, h, grain, label) -> qty
+        self.errors = []
+
+    def feed(self, lines):
+        for _, item in iter_lines(lines):
+            if isinstance(item, ParseError):
+                self.errors.append(item)
+            else:
+                self.add(item)
+        return self
+
+    def add(self, item):
+        key = (item.w, item.h, bool(item.grain), item.label)
+        self._items[key] = self._items.get(key, 0) + item.qty
+
+    @property
+    def items(self):
+        return [CutItem(w, h, g, q, label) for (w, h, g, label), q in self._items.items()]
+
+    @property
+    def count(self):
+        return sum(self._items.values())
+
+
+def parse_text(text):
+    return CutList().feed(io.StringIO(text))
+
+
+def parse_csv(fileobj, encoding="utf-8-sig"):
+    # fileobj باینری؛ خط به خط خوانده می‌شود تا فایل بزرگ کامل در حافظه نماند
+    text = io.TextIOWrapper(fileobj, encoding=encoding, errors="replace", newline="")
+    return CutList().feed(csv.reader(text))
+
+
+def group(items):
+    # ادغام آیتم‌های یکسان (برای ذخیره فشرده در جلسه)؛ برچسب‌های متفاوت ادغام نمی‌شوند
+    cut = CutList()
+    for item in items:
+        cut.add(CutItem(*item))
+    return cut.items
+
+
+def expand(items):
+    # آیتم‌های با تعداد -> لیست قطعات برای موتور چیدمان
+    # موتور هر قطعه را جدا جای‌گذاری می‌کند و نتیجه را با اندیس قطعه برمی‌گرداند (برچسب‌ها و
+    # خروجی‌ها هم‌ترتیب همین لیست‌اند)؛ پس باز کردن لازم است، ولی یک Part برای همه نسخه‌ها
+    out = []
+    for w, h, g, q, *_ in items:
+        out.extend([Part(w, h, bool(g))] * int(q))
+    return out
@@ -0,0 +1,335 @@
+"""
+خروجی نقشه برش برای کارگاه و دستگاه
+
+- ترتیب برش گیوتینی (saw): برش‌های سرتاسری مرحله به مرحله؛ در هر مرحله همه برش‌ها هم‌جهت‌اند،
+  پس بین دو مرحله فقط یک بار ورق (یا دسته نوارها) چرخانده می‌شود. از دو جهت شروع، آنکه
+  چرخش و برش کمتری دارد انتخاب می‌شود. بخشی که گیوتینی جدا نمی‌شود (چیدمان MaxRects) برای CNC علامت می‌خورد.
+- CSV لیست قطعات با برچسب (UTF-8، قابل باز شدن در Excel)
+- DXF (R12) دور ورق و قطعات برای CNC، G-code مسیر دور هر قطعه
+- PDF برچسب قطعات (A4، ۳×۸)
+
+همه خروجی‌ها ورق به ورق تولید می‌شوند (generator از تکه‌ها)؛ write() تکه‌ها را مستقیم در فایل
+می‌نویسد، پس برای سفارش‌های بزرگ کل خروجی هیچ وقت یکجا در حافظه نیست.
+واحد ورودی سانتی‌متر است؛ DXF و G-code با scale به میلی‌متر تبدیل می‌شوند.
+"""
+
+import csv
+import io
+from typing import NamedTuple
+
+EPS = 1e-6
+MM_PER_CM = 10.0
+LABEL_COLS = 3
+LABEL_ROWS = 8
+
+
+class Cut(NamedTuple):
+    stage: int           # مرحله؛ بین دو مرحله ورق چرخانده می‌شود
+    vertical: bool       # خط برش موازی محور y
+    pos: float           # شروع شکاف تیغ روی محور عمود بر خط برش (شکاف: pos تا pos+kerf)
+    start: float         # ابتدا و انتهای خط برش
+    end: float
+
+
+class SawPlan(NamedTuple):
+    cuts: list
+    stages: int          # تعداد مراحل دارای برش
+    cnc: list            # اندیس placementهایی که با برش سرتاسری جدا نمی‌شوند
+
+    @property
+    def rotations(self):
+        return max(0, self.stages - 1)
+
+
+def _blocks(parts, vertical, kerf=0.0):
+    # گروه‌های قطعاتی که روی این محور همپوشانی دارند -> [(ابتدا، انتها، قطعات)]
+    # فاصله کمتر از ضخامت تیغ هم جداشدنی نیست: شکاف تیغ به قطعه بعدی می‌خورد
+    span = (lambda p: (p.x, p.x + p.w)) if vertical else (lambda p: (p.y, p.y + p.h))
+    blocks = []
+    for p in sorted(parts, key=span):
+        a, b = span(p)
+        if blocks and a < blocks[-1][1] + kerf - EPS:
+            blocks[-1][1] = max(blocks[-1][1], b)
+            blocks[-1][2].append(p)
+        else:
+            blocks.append([a, b, [p]])
+    return blocks
+
+
+def _done(region, parts):
+    x0, y0, x1, y1 = region
+    if len(parts) != 1:
+        return False
+    p = parts[0]
+    return (abs(p.x - x0) < EPS and abs(p.y - y0) < EPS
+            and abs(p.x + p.w - x1) < EPS and abs(p.y + p.h - y1) < EPS)
+
+
+def _split(region, parts, vertical, kerf, stage):
+    """برش‌های سرتاسری یک ناحیه در یک جهت -> (برش‌ها، زیرناحیه‌ها) یا None اگر ممکن نیست"""
+    x0, y0, x1, y1 = region
+    lo, hi = (x0, x1) if vertical else (y0, y1)
+    start, end = (y0, y1) if vertical else (x0, x1)
+    blocks = _blocks(parts, vertical, kerf)
+    cuts, subs = [], []
+    prev = lo
+    for a, b, group in blocks:
+        if a - kerf - prev > EPS:
+            cuts.append(Cut(stage, vertical, a - kerf, start, end))
+        if hi - b > EPS:
+            cuts.append(Cut(stage, vertical, b, start, end))
+        subs.append(((a, y0, b, y1) if vertical else (x0, a, x1, b), group))
+        prev = b + kerf
+    if not cuts:
+        return None
+    return cuts, subs
+
+
+def _plan(sheet, kerf, vertical):
+    cuts, cnc = [], []
+    index = {id(p): i for i, p in enumerate(sheet.placements)}
+    level = [((0.0, 0.0, sheet.width, sheet.height), sheet.placements, 0)]
+    stage = 0
+    while level:
+        nxt = []
+        before = len(cuts)
+        for region, parts, stalled in level:
+            if not parts or _done(region, parts):
+                continue
+            split = _split(region, parts, vertical, kerf, stage)
+            if split is None:
+                if stalled:
+                    # در هیچ جهتی برش سرتاسری ندارد: غیرگیوتینی
+                    cnc.extend(parts)
+                else:
+                    nxt.append((region, parts, 1))
+                continue
+            cuts.extend(split[0])
+            nxt.extend((r, p, 0) for r, p in split[1])
+        if len(cuts) > before:
+            stage += 1
+        # شماره مرحله فقط برای مراحل دارای برش جلو می‌رود
+        cuts[before:] = [c._replace(stage=stage - 1) for c in cuts[before:]]
+        level = nxt
+        vertical = not vertical
+    return SawPlan(cuts, stage, sorted(index[id(p)] for p in cnc))
+
+
+def saw_plan(sheet, kerf=0.0):
+    """ترتیب برش یک ورق با کمترین چرخش؛ مساوی: برش کمتر"""
+    plans = [_plan(sheet, kerf, v) for v in (True, False)]
+    return min(plans, key=lambda p: (len(p.cnc), p.stages, len(p.cuts)))
+
+
+def part_labels(items):
+    # برچسب هر قطعه هم‌ترتیب با cutlist.expand(items)؛ بدون برچسب: ابعاد
+    out = []
+    for w, h, g, q, *rest in items:
+        label = rest[0] if rest and rest[0] else f"{w:g}x{h:g}"
+        out.extend([label] * int(q))
+    return out
+
+
+def _label(labels, index):
+    return labels[index] if labels and index < len(labels) else str(index + 1)
+
+
+def _csv_line(row):
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\r\n").writerow(row)
+    return buf.getvalue()
+
+
+def parts_csv(sheets, parts, labels=None, kerf=0.0):
+    yield "\ufeff" + _csv_line(["part", "label", "w", "h", "sheet", "x", "y", "rotated", "grain"])
+    for n, sheet in enumerate(sheets, 1):
+        rows = []
+        for p in sheet.placements:
+            part = parts[p.index]
+            grain = len(part) > 2 and bool(part[2])
+            rows.append(_csv_line([p.index + 1, _label(labels, p.index), f"{part[0]:g}", f"{part[1]:g}",
+                                   n, f"{p.x:g}", f"{p.y:g}", int(p.rotated), int(grain)]))
+        yield "".join(rows)
+
+
+def saw_csv(sheets, parts, labels=None, kerf=0.0):
+    yield "\ufeff" + _csv_line(["sheet", "step", "stage", "direction", "pos", "from", "to", "note"])
+    for n, sheet in enumerate(sheets, 1):
+        plan = saw_plan(sheet, kerf)
+        rows = [_csv_line([n, i, c.stage + 1, "vertical" if c.vertical else "horizontal",
+                           f"{c.pos:g}", f"{c.start:g}", f"{c.end:g}", ""])
+                for i, c in enumerate(plan.cuts, 1)]
+        for i in plan.cnc:
+            p = sheet.placements[i]
+            rows.append(_csv_line([n, "", "", "cnc", "", "", "",
+                                   f"{_label(labels, p.index)} @ {p.x:g},{p.y:g}"]))
+        rows.append(_csv_line([n, "", "", "summary", "", "", "",
+                               f"{len(plan.cuts)} cuts, {plan.rotations} rotations"]))
+        yield "".join(rows)
+
+
+def _dxf(*pairs):
+    return "".join(f"{code}\n{value}\n" for code, value in pairs)
+
+
+def _dxf_rect(x, y, w, h, layer):
+    out = [_dxf((0, "POLYLINE"), (8, layer), (66, 1), (10, 0.0), (20, 0.0), (70, 1))]
+    for vx, vy in ((x, y), (x + w, y), (x + w, y + h), (x, y + h)):
+        out.append(_dxf((0, "VERTEX"), (8, layer), (10, f"{vx:.3f}"), (20, f"{vy:.3f}")))
+    out.append(_dxf((0, "SEQEND"), (8, layer)))
+    return "".join(out)
+
+
+def dxf(sheets, parts, labels=None, kerf=0.0, scale=MM_PER_CM, gap=50.0):
+    """ورق‌ها کنار هم روی محور x (فاصله gap سانتی‌متر)؛ لایه‌های SHEET، PART، LABEL"""
+    yield _dxf((999, f"units: mm (x{scale:g})"), (0, "SECTION"), (2, "HEADER"),
+               (9, "$ACADVER"), (1, "AC1009"), (0, "ENDSEC"), (0, "SECTION"), (2, "ENTITIES"))
+    ox = 0.0
+    for sheet in sheets:
+        out = [_dxf_rect(ox * scale, 0.0, sheet.width * scale, sheet.height * scale, "SHEET")]
+        for p in sheet.placements:
+            x, y, w, h = (ox + p.x) * scale, p.y * scale, p.w * scale, p.h * scale
+            out.append(_dxf_rect(x, y, w, h, "PART"))
+            size = min(w, h) / 6
+            out.append(_dxf((0, "TEXT"), (8, "LABEL"), (10, f"{x + size / 2:.3f}"),
+                            (20, f"{y + size / 2:.3f}"), (40, f"{size:.3f}"),
+                            (1, _label(labels, p.index))))
+        ox += sheet.width + gap
+        yield "".join(out)
+    yield _dxf((0, "ENDSEC"), (0, "EOF"))
+
+
+def _gcode_comment(labels, index):
+    # پرانتز داخل برچسب کامنت را می‌بندد و بقیه آن به دستگاه می‌رسد؛ فقط ASCII قابل چاپ بدون ()
+    text = "".join(c for c in _label(labels, index) if " " <= c <= "~" and c not in "();").strip()
+    return f"(part {index + 1}{': ' + text if text else ''})"
+
+
+def gcode(sheets, parts, labels=None, kerf=0.0, *, tool, depth, scale=MM_PER_CM, safe=5.0, feed=3000):
+    """
+    مسیر دور هر قطعه، با جبران نیم قطر ابزار به بیرون؛ هر ورق یک بخش با توقف M0 برای گذاشتن ورق
+    tool: قطر ابزار (سانتی‌متر)؛ depth: عمق برش (میلی‌متر، معمولاً ضخامت ورق)
+    هر دو اجباری‌اند: پیش‌فرض اشتباه نباید به فایل دستگاه برسد
+    """
+    if not tool or tool <= 0 or not depth or depth <= 0:
+        raise ValueError("gcode needs a positive tool diameter and cut depth")
+    r = tool * scale / 2
+    yield f"(cut plan: {len(sheets)} sheets)\nG21\nG90\nG0 Z{safe:.3f}\n"
+    for n, sheet in enumerate(sheets, 1):
+        out = [f"(sheet {n}: {sheet.width:g}x{sheet.height:g})\nM0\n"]
+        # ترتیب ردیفی مارپیچ برای حرکت آزاد کوتاه‌تر
+        rows = {}
+        for p in sheet.placements:
+            rows.setdefault(round(p.y, 3), []).append(p)
+        for k, y in enumerate(sorted(rows)):
+            for p in sorted(rows[y], key=lambda p: p.x, reverse=k % 2 == 1):
+                x0, y0 = p.x * scale - r, p.y * scale - r
+                x1, y1 = (p.x + p.w) * scale + r, (p.y + p.h) * scale + r
+                out.append(f"{_gcode_comment(labels, p.index)}\n"
+                           f"G0 X{x0:.3f} Y{y0:.3f}\nG1 Z{-depth:.3f} F{feed // 3}\n"
+                           f"G1 X{x1:.3f} F{feed}\nG1 Y{y1:.3f}\nG1 X{x0:.3f}\nG1 Y{y0:.3f}\n"
+                           f"G0 Z{safe:.3f}\n")
+        yield "".join(out)
+    yield "M30\n"
+
+
+def _pdf_text(text):
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _pdf_label(labels, index, part):
+    # فونت پایه PDF فقط Latin-1 دارد؛ برچسب فارسی (کامل در CSV) با شماره و ابعاد قطعه جایگزین می‌شود
+    label = _label(labels, index)
+    try:
+        label.encode("latin-1")
+    except UnicodeEncodeError:
+        return f"#{index + 1}  {part[0]:g} x {part[1]:g}"
+    return label
+
+
+def labels_pdf(sheets, parts, labels=None, kerf=0.0):
+    """PDF برچسب قطعات؛ اشیا به ترتیب نوشته و جدول xref در پایان ساخته می‌شود (بدون وابستگی)"""
+    page_w, page_h = 595.0, 842.0
+    cell_w, cell_h = page_w / LABEL_COLS, page_h / LABEL_ROWS
+    per_page = LABEL_COLS * LABEL_ROWS
+    offsets = {}
+    pos = 0
+    page_ids = []
+
+    def obj(num, body):
+        nonlocal pos
+        offsets[num] = pos
+        chunk = f"{num} 0 obj\n".encode() + body + b"\nendobj\n"
+        pos += len(chunk)
+        return chunk
+
+    head = b"%PDF-1.4\n"
+    pos = len(head)
+    yield head + obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold >>") \
+        + obj(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    def page(cells):
+        lines = ["0.6 w"]
+        for k, (n, p) in enumerate(cells):
+            x = (k % LABEL_COLS) * cell_w
+            y = page_h - (k // LABEL_COLS + 1) * cell_h
+            part = parts[p.index]
+            grain = " grain" if len(part) > 2 and part[2] else ""
+            lines.append(f"{x + 4:.1f} {y + 4:.1f} {cell_w - 8:.1f} {cell_h - 8:.1f} re S")
+            for font, size, dy, text in (
+                    ("F1", 14, 28, _pdf_label(labels, p.index, part)),
+                    ("F2", 11, 48, f"{part[0]:g} x {part[1]:g} cm{grain}"),
+                    ("F2", 9, 66, f"Sheet {n}  #{p.index + 1}  at {p.x:g}, {p.y:g}"
+                                  f"{'  rotated' if p.rotated else ''}")):
+                lines.append(f"BT /{font} {size} Tf {x + 14:.1f} {y + cell_h - dy:.1f} Td "
+                             f"({_pdf_text(text)}) Tj ET")
+        stream = "\n".join(lines).encode("latin-1")
+        num = 5 + 2 * len(page_ids)
+        page_ids.append(num + 1)
+        return obj(num, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream") \
+            + obj(num + 1, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:g} {page_h:g}] "
+                           f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> "
+                           f"/Contents {num} 0 R >>".encode())
+
+    cells = []
+    for n, sheet in enumerate(sheets, 1):
+        cells.extend((n, p) for p in sheet.placements)
+        chunks = []
+        while len(cells) >= per_page:
+            chunks.append(page(cells[:per_page]))
+            del cells[:per_page]
+        if chunks:
+            yield b"".join(chunks)
+    if cells or not page_ids:
+        yield page(cells)
+
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    tail = obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()) \
+        + obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    count = max(offsets) + 1
+    xref = [f"xref\n0 {count}\n0000000000 65535 f \n"]
+    xref.extend(f"{offsets[i]:010d} 00000 n \n" for i in range(1, count))
+    xref.append(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{pos}\n%%EOF\n")
+    yield tail + "".join(xref).encode()
+
+
+# نام -> (تابع، پسوند فایل)
+EXPORTERS = {
+    "saw": (saw_csv, "saw.csv"),
+    "csv": (parts_csv, "parts.csv"),
+    "dxf": (dxf, "dxf"),
+    "gcode": (gcode, "nc"),
+    "pdf": (labels_pdf, "labels.pdf"),
+}
+
+
+def write(fmt, out, sheets, parts, labels=None, kerf=0.0, **kwargs):
+    """خروجی fmt را تکه به تکه در فایل باینری out می‌نویسد؛ خروجی: تعداد بایت"""
+    size = 0
+    for chunk in EXPORTERS[fmt][0](sheets, parts, labels, kerf, **kwargs):
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out.write(chunk)
+        size += len(chunk)
+    return size
@@ -0,0 +1,30 @@
+"""
+قفل فایلی بین پردازه‌ها (workerهای گونیکورن روی یک سرور)
+
+    with file_lock("images/.catalog.lock"):
+        ...  # فقط یک پردازه در هر لحظه
+
+روی سیستم بدون fcntl (ویندوز، اجرای محلی تک‌پردازه) قفل کاری انجام نمی‌دهد.
+"""
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - ویندوز
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # بستن فایل قفل را هم آزاد می‌کند
+        os.close(fd)
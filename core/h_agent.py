@@ -1,8 +1,39 @@
 import os
-from openai import OpenAI
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# کلید از محیط گرفته می‌شه
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from core import metrics
+from core.rate_limit import FULL, SHED, Admission, AdmissionControl
+from core.response_cache import ResponseCache
+from core.conversation_memory import ConversationMemory
+
+log = logging.getLogger(__name__)
+
+OPENAI_SECONDS = metrics.histogram("openai_request_seconds", "OpenAI chat completion latency",
+                                   ("model", "stream"))
+OPENAI_FIRST_CHUNK = metrics.histogram("openai_first_chunk_seconds",
+                                       "Time to first streamed OpenAI chunk", ("model",))
+OPENAI_TOKENS = metrics.counter("openai_tokens_total", "OpenAI tokens used", ("model", "kind"))
+OPENAI_ERRORS = metrics.counter("openai_errors_total", "Failed OpenAI calls", ("model",))
+
+AI_MODEL = os.getenv("AI_MODEL", "gpt-4o")
+AI_MAX_TOKENS = int(os.getenv("AI_MAX_TOKENS", "800"))
+
+# کلاینت OpenAI در اولین استفاده ساخته می‌شود (ایمپورت openai سنگین است و شروع بات را کند می‌کند)
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            # کلید (و آدرس، برای سرور mock) از محیط گرفته می‌شه
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"),
+                             base_url=os.getenv("OPENAI_BASE_URL") or None)
+        return _client
 
 H_AGENT_SYSTEM_PROMPT = """
 تو «حسین تراب‌پرور» هستی — نجار و MDF کار حرفه‌ای با ۱۵ سال سابقه.
@@ -35,34 +66,250 @@ H_AGENT_SYSTEM_PROMPT = """
 کاربر احساس کند کنار یک استادکار واقعی ایستاده — با راهنمایی عملی، کم‌هزینه و مطمئن.
 """
 
+H_AGENT_ERROR_MSG = (
+    "متاسفانه الان نمی‌تونم جواب بدم 😔\n\n"
+    "📞 **راه‌های دیگر ارتباط:**\n"
+    "• مستقیم با من در تلگرام صحبت کنید\n"
+    "• از طریق واتساپ پیام بدهید\n"
+    "• با شماره تماس بگیرید\n\n"
+    "⏳ لطفاً کمی بعد دوباره امتحان کنید."
+)
+
+H_AGENT_SLOW_DOWN_MSG = "⏳ پیام‌ها خیلی پشت سر هم است؛ لطفاً {seconds} ثانیه دیگر دوباره بپرسید."
+
+H_AGENT_BUSY_MSG = (
+    "الان سرم خیلی شلوغه 😅\n"
+    "لطفاً چند دقیقه دیگر دوباره بپرسید یا از «📞 تماس با ما» مستقیم در ارتباط باشید."
+)
+
+def _count_usage(model, usage):
+    if usage is None:
+        return
+    OPENAI_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    OPENAI_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+
 class HAgent:
-    def __init__(self):
+    def __init__(self, cache=None, transport=None, memory=None, limiter=None):
         self.system_prompt = H_AGENT_SYSTEM_PROMPT
+        self.cache = cache
+        # limiter: AdmissionControl؛ محدودیت نرخ و انتخاب مدل/سقف توکن بر اساس بار
+        self.limiter = limiter
+        # transport: AsyncTransport؛ درخواست‌ها روی استخر اتصال async مشترک ارسال می‌شوند
+        self.transport = transport
+        # memory: ConversationMemory؛ سوال‌های بعدی زمینه گفتگو را از دست نمی‌دهند
+        self.memory = memory
+
+    def _send(self, stream=False, **params):
+        if self.transport is None:
+            return get_client().chat.completions.create(stream=stream, **params)
+        aclient = self.transport.openai(api_key=os.getenv("OPENAI_API_KEY"),
+                                        base_url=os.getenv("OPENAI_BASE_URL") or None)
+        if stream:
+            return self.transport.iterate(lambda: aclient.chat.completions.create(stream=True, **params))
+        return self.transport.run(aclient.chat.completions.create(**params))
+
+    def _create(self, stream=False, **params):
+        model = params.get("model", "")
+        t0 = time.perf_counter()
+        try:
+            response = self._send(stream, **params)
+        except Exception:
+            OPENAI_ERRORS.inc(model=model)
+            raise
+        if stream:
+            return self._measure_stream(response, model, t0)
+        OPENAI_SECONDS.observe(time.perf_counter() - t0, model=model, stream="0")
+        _count_usage(model, getattr(response, "usage", None))
+        return response
+
+    def _measure_stream(self, chunks, model, t0):
+        first = True
+        deltas = 0
+        usage = None
+        try:
+            for chunk in chunks:
+                if first:
+                    OPENAI_FIRST_CHUNK.observe(time.perf_counter() - t0, model=model)
+                    first = False
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    deltas += 1
+                yield chunk
+        except Exception:
+            OPENAI_ERRORS.inc(model=model)
+            raise
+        finally:
+            OPENAI_SECONDS.observe(time.perf_counter() - t0, model=model, stream="1")
+            if usage is not None:
+                _count_usage(model, usage)
+            else:
+                # استریم بدون usage: هر تکه محتوا تقریباً یک توکن خروجی است
+                OPENAI_TOKENS.inc(deltas, model=model, kind="completion")
+
+    def _request(self, user_msg, history=(), stream=False, model=AI_MODEL, max_tokens=AI_MAX_TOKENS):
+        return self._create(
+            model=model,
+            temperature=0.7,
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                *history,
+                {"role": "user", "content": user_msg}
+            ],
+            stream=stream,
+        )
 
-    def generate_response(self, user_msg: str):
+    def _admit(self, cid):
+        if self.limiter is None:
+            return Admission(FULL, AI_MODEL, AI_MAX_TOKENS)
+        return self.limiter.admit(cid)
+
+    def _release(self, admission):
+        if self.limiter is not None and admission.allowed:
+            self.limiter.release()
+
+    def _lookup(self, user_msg, history):
+        # سوال‌های تکراری از کش جواب داده می‌شوند (فقط سوال اول، بدون زمینه قبلی)
+        # (انجام شد؟، پاسخ)؛ _shed با آن دوباره سراغ کش نمی‌رود و یک miss دو بار شمرده نمی‌شود
+        if self.cache is None or history:
+            return False, None
+        return True, self.cache.get(user_msg)
+
+    def _shed(self, user_msg, admission, looked_up=False):
+        # بدون فراخوانی مدل: زیر بار، کش حتی با وجود زمینه گفتگو بهتر از هیچ است
+        if admission.decision == SHED:
+            cached = None
+            if self.cache is not None and not looked_up:
+                cached = self.cache.get(user_msg)
+            return cached or H_AGENT_BUSY_MSG
+        return H_AGENT_SLOW_DOWN_MSG.format(seconds=max(1, round(admission.retry_after)))
+
+    def _cacheable(self, history, admission):
+        # فقط پاسخ کامل مدل اصلی کش می‌شود، نه نسخه ارزان زمان شلوغی
+        return self.cache is not None and not history and admission.decision == FULL
+
+    def _history(self, cid):
+        if self.memory is None or cid is None:
+            return []
+        return self.memory.messages(cid)
+
+    def _remember(self, cid, user_msg, answer):
+        if self.memory is not None and cid is not None:
+            self.memory.add(cid, "user", user_msg)
+            self.memory.add(cid, "assistant", answer)
+
+    def summarise(self, summary, turns):
+        # خلاصه‌سازی پیام‌های قدیمی با مدل ارزان (برای ConversationMemory، در نخ پس‌زمینه)
+        # از همان سقف نرخ و هم‌زمانی سهم می‌گیرد؛ زیر بار رد می‌شود و خلاصه استخراجی جایگزین است
+        admission = self._admit(None)
+        if not admission.allowed:
+            raise RuntimeError(f"summary not admitted ({admission.decision})")
+        dialogue = "\n".join(f"{'کاربر' if role == 'user' else 'حسین'}: {text}" for role, text, _ in turns)
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o",  # یا "gpt-3.5-turbo" برای هزینه کمتر
-                temperature=0.7,
-                max_tokens=800,
+            response = self._create(
+                model=os.getenv("AI_SUMMARY_MODEL", "gpt-4o-mini"),
+                temperature=0.2,
+                max_tokens=200,
                 messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_msg}
-                ]
+                    {"role": "system", "content": "گفتگو را در حداکثر ۵ خط فارسی خلاصه کن. "
+                                                  "جزئیات پروژه، ابعاد، متریال و بودجه کاربر را نگه دار."},
+                    {"role": "user", "content": f"خلاصه قبلی:\n{summary or '-'}\n\nادامه گفتگو:\n{dialogue}"}
+                ],
             )
-            return response.choices[0].message.content.strip()
+        finally:
+            self._release(admission)
+        return response.choices[0].message.content.strip()
+
+    def generate_response(self, user_msg: str, cid=None):
+        history = self._history(cid)
+        looked_up, cached = self._lookup(user_msg, history)
+        if cached is not None:
+            self._remember(cid, user_msg, cached)
+            return cached
+        admission = self._admit(cid)
+        if not admission.allowed:
+            return self._shed(user_msg, admission, looked_up)
+        try:
+            response = self._request(user_msg, history, model=admission.model,
+                                     max_tokens=admission.max_tokens)
+            answer = response.choices[0].message.content.strip()
+            if self._cacheable(history, admission):
+                self.cache.put(user_msg, answer)
+            self._remember(cid, user_msg, answer)
+            return answer
         except Exception as e:
-            error_msg = (
-                "متاسفانه الان نمی‌تونم جواب بدم 😔\n\n"
-                "📞 **راه‌های دیگر ارتباط:**\n"
-                "• مستقیم با من در تلگرام صحبت کنید\n"
-                "• از طریق واتساپ پیام بدهید\n"
-                "• با شماره تماس بگیرید\n\n"
-                "⏳ لطفاً کمی بعد دوباره امتحان کنید."
-            )
             log.error(f"HAgent Error: {str(e)}")
-            return error_msg
+            return H_AGENT_ERROR_MSG
+        finally:
+            self._release(admission)
+
+    def stream_response(self, user_msg: str, cid=None):
+        # تکه‌های پاسخ را به محض رسیدن برمی‌گرداند (برای ویرایش تدریجی پیام)
+        history = self._history(cid)
+        looked_up, cached = self._lookup(user_msg, history)
+        if cached is not None:
+            self._remember(cid, user_msg, cached)
+            yield cached
+            return
+        admission = self._admit(cid)
+        if not admission.allowed:
+            yield self._shed(user_msg, admission, looked_up)
+            return
+        try:
+            yield from self._stream(user_msg, history, cid, admission)
+        finally:
+            self._release(admission)
+
+    def _stream(self, user_msg, history, cid, admission):
+        parts = []
+        try:
+            for chunk in self._request(user_msg, history, stream=True, model=admission.model,
+                                       max_tokens=admission.max_tokens):
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            log.error(f"HAgent stream error: {str(e)}")
+            yield ("\n\n" if parts else "") + H_AGENT_ERROR_MSG
+            return
+        answer = "".join(parts).strip()
+        if answer and self._cacheable(history, admission):
+            self.cache.put(user_msg, answer)
+        if answer:
+            self._remember(cid, user_msg, answer)
 
 # instance برای استفاده در بات
-h_agent = HAgent()
+# AI_CACHE_PATH: فایل SQLite برای ماندگاری کش و جستجوی سوال‌های مشابه
+h_agent = HAgent(
+    cache=ResponseCache(
+        max_size=int(os.getenv("AI_CACHE_SIZE", "2000")),
+        ttl=int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600))),
+        path=os.getenv("AI_CACHE_PATH") or None,
+    ),
+    memory=ConversationMemory(
+        max_turns=int(os.getenv("AI_MEMORY_TURNS", "12")),
+        token_budget=int(os.getenv("AI_MEMORY_TOKENS", "1500")),
+        max_chats=int(os.getenv("AI_MEMORY_CHATS", "5000")),
+    ),
+    # پیام در دقیقه برای هر چت و کل بات؛ AI_MAX_INFLIGHT درخواست هم‌زمان به مدل
+    limiter=AdmissionControl(
+        chat_rate=float(os.getenv("AI_CHAT_RATE", "6")),
+        chat_burst=int(os.getenv("AI_CHAT_BURST", "3")),
+        global_rate=float(os.getenv("AI_GLOBAL_RATE", "120")),
+        global_burst=int(os.getenv("AI_GLOBAL_BURST", "30")),
+        max_inflight=int(os.getenv("AI_MAX_INFLIGHT", "8")),
+        model=AI_MODEL,
+        cheap_model=os.getenv("AI_CHEAP_MODEL", "gpt-4o-mini"),
+        max_tokens=AI_MAX_TOKENS,
+        short_tokens=int(os.getenv("AI_SHORT_TOKENS", "300")),
+    ) if os.getenv("AI_RATE_LIMIT", "1") == "1" else None,
+)
 
+# خلاصه‌سازی پیام‌های قدیمی با مدل؛ پیش‌فرض خلاصه استخراجی بدون هزینه API است
+# فراخوانی مدل در یک نخ جدا و بعد از پاسخ، نه در مسیر پاسخ کاربر
+if os.getenv("AI_SUMMARY_MODEL"):
+    h_agent.memory.summarise = h_agent.summarise
+    h_agent.memory.defer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-summary").submit
@@ -0,0 +1,264 @@
+"""
+سفارش چند متریالی با موجودی ورق
+
+هر سفارش چند متریال دارد (مثلاً MDF ۱۶ بدنه، ۸ میل پشت کار، هایگلاس درب)
+و هر متریال چند سایز ورق با تعداد و قیمت خودش، شامل ورق‌های باقیمانده (offcut).
+
+برای هر متریال ورق به ورق انتخاب می‌شود: روی هر سایز موجود یک ورق چیده می‌شود
+و سایزی که کمترین هزینه به ازای مساحت قطعات چیده شده را دارد برداشته می‌شود.
+اگر یک ورق همه قطعات باقیمانده را جا بدهد، ارزان‌ترین چنین ورقی انتخاب می‌شود.
+
+فایل سفارش (JSON):
+    {"materials": [
+        {"name": "MDF 16", "thickness": 16, "grain": false,
+         "stocks": [{"w": 183, "h": 366, "qty": 10, "cost": 1200000},
+                    {"w": 120, "h": 80, "qty": 1, "offcut": true}],
+         "parts": ["60x40 x12", "30x20 ر"]}
+    ]}
+stocks اگر نباشد از موجودی انبار (STOCK_INVENTORY) با نام متریال خوانده می‌شود.
+"""
+
+import json
+import time
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+
+from core.cutlist import ParseError, group, expand, parse_fields, parse_text
+from core.packing import CutConstraints, pack
+
+
+class Stock(NamedTuple):
+    w: float
+    h: float
+    qty: Optional[int] = None   # None یعنی نامحدود
+    cost: Optional[float] = None
+    offcut: bool = False
+    label: str = ""
+
+    @property
+    def price(self):
+        # بدون قیمت: ورق کامل به نسبت مساحت (متر مربع)، باقیمانده رایگان
+        if self.cost is not None:
+            return self.cost
+        return 0.0 if self.offcut else self.w * self.h / 10000
+
+
+@dataclass
+class Material:
+    name: str
+    stocks: list
+    items: list
+    thickness: float = 0.0
+    constraints: CutConstraints = CutConstraints()
+
+    @property
+    def part_count(self):
+        return sum(item[3] for item in self.items)
+
+
+@dataclass
+class MaterialResult:
+    material: str
+    sheets: list             # Sheet
+    stocks: list             # Stock هر ورق، هم‌ترتیب با sheets
+    unplaced: list           # اندیس قطعات در expand(items)
+    parts: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    heuristic = "stock-mix"
+
+    @property
+    def sheet_count(self):
+        return len(self.sheets)
+
+    @property
+    def cost(self):
+        return sum(s.price for s in self.stocks)
+
+    @property
+    def offcuts_used(self):
+        return sum(1 for s in self.stocks if s.offcut)
+
+    @property
+    def part_area(self):
+        return sum(s.used_area for s in self.sheets)
+
+    @property
+    def sheet_area(self):
+        return sum(s.area for s in self.sheets)
+
+    @property
+    def waste_percent(self):
+        return 100 * (1 - self.part_area / self.sheet_area) if self.sheet_area else 0.0
+
+    def counts(self):
+        # تعداد ورق مصرفی از هر سایز: {(w, h, offcut): n}
+        out = {}
+        for s in self.stocks:
+            key = (s.w, s.h, s.offcut)
+            out[key] = out.get(key, 0) + 1
+        return out
+
+
+@dataclass
+class JobResult:
+    materials: list
+    elapsed: float = 0.0
+
+    @property
+    def sheet_count(self):
+        return sum(m.sheet_count for m in self.materials)
+
+    @property
+    def cost(self):
+        return sum(m.cost for m in self.materials)
+
+    @property
+    def unplaced(self):
+        return sum(len(m.unplaced) for m in self.materials)
+
+
+def solve_material(material, heuristics=("maxrects-bssf", "maxrects-baf")):
+    t0 = time.perf_counter()
+    parts = expand(material.items)
+    remaining = list(range(len(parts)))
+    left = [s.qty for s in material.stocks]
+    sheets, used = [], []
+
+    while remaining:
+        sub = [parts[i] for i in remaining]
+        best = None
+        for si, stock in enumerate(material.stocks):
+            if left[si] == 0:
+                continue
+            for heuristic in heuristics:
+                r = pack(sub, stock.w, stock.h, heuristic=heuristic,
+                         constraints=material.constraints, max_sheets=1)
+                if not r.sheets:
+                    continue
+                sheet = r.sheets[0]
+                finishes = len(sheet.placements) == len(sub)
+                # کمتر بهتر: تمام کردن قطعات، بعد هزینه به ازای مساحت، بعد پرتر بودن
+                if finishes:
+                    score = (0, stock.price, -sheet.used_area)
+                else:
+                    score = (1, stock.price / sheet.used_area, -sheet.used_area)
+                if best is None or score < best[0]:
+                    best = (score, si, sheet)
+        if best is None:
+            break
+
+        _, si, sheet = best
+        if left[si] is not None:
+            left[si] -= 1
+        # اندیس‌ها از زیرلیست به لیست کامل قطعات برگردانده می‌شوند
+        for p in sheet.placements:
+            p.index = remaining[p.index]
+        placed = {p.index for p in sheet.placements}
+        remaining = [i for i in remaining if i not in placed]
+        sheets.append(sheet)
+        used.append(material.stocks[si])
+
+    return MaterialResult(material.name, sheets, used, remaining, parts,
+                          time.perf_counter() - t0)
+
+
+def solve_job(job):
+    # اجرای ترتیبی؛ نسخه موازی در SolverPool.submit_job
+    t0 = time.perf_counter()
+    return JobResult([solve_material(m) for m in job.materials], time.perf_counter() - t0)
+
+
+@dataclass
+class Job:
+    materials: list
+    errors: list = field(default_factory=list)   # (نام متریال، ParseError)
+
+    @property
+    def part_count(self):
+        return sum(m.part_count for m in self.materials)
+
+
+def _float(value, name):
+    # خطای تبدیل با پیام فارسی (به کاربر نشان داده می‌شود)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"مقدار «{name}» باید عدد باشد: {value!r}"[:80]) from None
+
+
+def _stocks(rows):
+    stocks = []
+    for row in rows:
+        try:
+            if isinstance(row, dict):
+                stock = Stock(_float(row["w"], "w"), _float(row["h"], "h"), row.get("qty"),
+                              row.get("cost"), bool(row.get("offcut", False)), row.get("label", ""))
+            else:
+                stock = Stock(*row)
+            invalid = stock.w <= 0 or stock.h <= 0 or (stock.qty is not None and stock.qty < 0)
+        except (KeyError, TypeError):
+            invalid = True
+        if invalid:
+            raise ValueError(f"ابعاد یا تعداد ورق نامعتبر: {str(row)[:40]}")
+        stocks.append(stock)
+    return stocks
+
+
+def load_inventory(path):
+    # {"MDF 16": [{"w": 183, "h": 366, "qty": 20, "cost": 1200000}], ...}
+    with open(path, encoding="utf-8") as f:
+        return {name: _stocks(rows) for name, rows in json.load(f).items()}
+
+
+def job_from_dict(data, inventory=None, kerf=0.0, trim=0.0):
+    inventory = inventory or {}
+    materials, errors = [], []
+    for entry in data.get("materials", []):
+        name = str(entry.get("name", "")).strip() or f"متریال {len(materials) + 1}"
+        if "stocks" in entry:
+            stocks = _stocks(entry["stocks"])
+        elif name in inventory:
+            stocks = list(inventory[name])
+        else:
+            raise ValueError(f"برای «{name}» ورقی تعریف نشده است")
+        if not stocks:
+            raise ValueError(f"برای «{name}» ورقی تعریف نشده است")
+
+        rows = entry.get("parts", [])
+        text = [r for r in rows if isinstance(r, str)]
+        cut = parse_text("\n".join(text))
+        errors.extend((name, e) for e in cut.errors)
+        # ردیف‌های لیستی [عرض، ارتفاع، تعداد، رگه، برچسب] هم با همان پارسر اعتبارسنجی می‌شوند
+        for no, row in enumerate(rows, 1):
+            if isinstance(row, str):
+                continue
+            try:
+                if not isinstance(row, (list, tuple)):
+                    raise ValueError("فرمت نامعتبر")
+                item = parse_fields([str(c) for c in row])
+            except ValueError as e:
+                errors.append((name, ParseError(no, str(row)[:40], str(e))))
+                continue
+            if item is not None:
+                cut.add(item)
+        items = group(cut.items)
+
+        constraints = CutConstraints(kerf=_float(entry.get("kerf", kerf), "kerf"),
+                                     trim=_float(entry.get("trim", trim), "trim"),
+                                     grain=bool(entry.get("grain", False)))
+        materials.append(Material(name, stocks, items, _float(entry.get("thickness", 0), "thickness"),
+                                  constraints))
+    if not materials:
+        raise ValueError("هیچ متریالی در سفارش نیست")
+    return Job(materials, errors)
+
+
+def load_job(fileobj, inventory=None, kerf=0.0, trim=0.0):
+    try:
+        data = json.load(fileobj)
+    except ValueError:   # شامل خطای UTF-8
+        raise ValueError("فایل JSON قابل خواندن نیست") from None
+    if not isinstance(data, dict):
+        raise ValueError("فایل سفارش باید شیء JSON با کلید materials باشد")
+    return job_from_dict(data, inventory, kerf, trim)
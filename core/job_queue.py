@@ -0,0 +1,138 @@
+"""
+صف کار پس‌زمینه برای وبهوک
+
+- هندلر HTTP فقط update را در صف می‌گذارد و بلافاصله 200 برمی‌گرداند
+- هر چت همیشه به یک worker ثابت می‌رسد، پس پیام‌های یک کاربر به ترتیب پردازش می‌شوند
+- update_id تکراری (ارسال مجدد تلگرام) دور ریخته می‌شود؛ با SQLite بین workerهای گونیکورن هم مشترک است
+- صف هر worker سقف دارد (maxsize)؛ وقتی پر است submit خطای queue.Full می‌دهد تا وبهوک
+  به کاربر بگوید سرور شلوغ است، به جای انباشتن بی‌پایان کار در حافظه
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class SeenIds:
+    # شناسه‌های دیده‌شده در حافظه با سقف اندازه
+    def __init__(self, size=10000):
+        self.size = size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, job_id):
+        with self._lock:
+            if job_id in self._ids:
+                return False
+            self._ids[job_id] = None
+            if len(self._ids) > self.size:
+                self._ids.popitem(last=False)
+            return True
+
+
+class SqliteSeenIds:
+    # نسخه فایلی برای چند worker؛ رکوردهای قدیمی‌تر از ttl پاک می‌شوند
+    def __init__(self, path, ttl=3600):
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen (id INTEGER PRIMARY KEY, ts REAL)")
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def add(self, job_id):
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute("INSERT OR IGNORE INTO seen (id, ts) VALUES (?, ?)", (job_id, now))
+            if now - self._last_prune > 60:
+                self._db.execute("DELETE FROM seen WHERE ts < ?", (now - self.ttl,))
+                self._last_prune = now
+            return cur.rowcount == 1
+
+
+class JobQueue:
+    def __init__(self, workers=4, seen=None, maxsize=0):
+        """maxsize: سقف کارهای منتظر در صف هر worker؛ 0 یعنی بدون سقف"""
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self.seen = seen or SeenIds()
+        self._queues = [queue.Queue() for _ in range(self.workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.processed = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _start(self):
+        # ساخت تنبل نخ‌ها تا بعد از fork شدن worker گونیکورن اجرا شوند
+        with self._lock:
+            if self._threads:
+                return
+            for i, q in enumerate(self._queues):
+                t = threading.Thread(target=self._run, args=(q,), name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _run(self, q):
+        while True:
+            item = q.get()
+            try:
+                if item is _STOP:
+                    return
+                fn, args = item
+                fn(*args)
+                with self._stats_lock:
+                    self.processed += 1
+            except Exception as e:
+                with self._stats_lock:
+                    self.failed += 1
+                log.exception(f"Background job failed: {e}")
+            finally:
+                q.task_done()
+
+    @property
+    def depth(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def submit(self, key, fn, *args, job_id=None, bounded=True):
+        """
+        key: کلید ترتیب (شناسه چت)؛ کارهای یک کلید پشت سر هم اجرا می‌شوند
+        job_id: شناسه یکتا برای حذف تکراری (update_id)
+        bounded=False برای کارهایی که نباید رد شوند (تحویل نتیجه محاسبه تمام شده)
+        خروجی False یعنی کار تکراری بوده و در صف قرار نگرفته؛ صف پر: queue.Full
+        """
+        q = self._queues[hash(key) % self.workers]
+        if bounded and self.maxsize and q.qsize() >= self.maxsize:
+            # قبل از ثبت job_id، تا ارسال دوباره همین update تکراری حساب نشود
+            with self._stats_lock:
+                self.rejected += 1
+            raise queue.Full
+        if job_id is not None and not self.seen.add(job_id):
+            with self._stats_lock:
+                self.duplicates += 1
+            return False
+        self._start()
+        q.put((fn, args))
+        return True
+
+    def join(self):
+        for q in self._queues:
+            q.join()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for q in self._queues[:len(threads)]:
+            q.put(_STOP)
+        if wait:
+            for t in threads:
+                t.join()
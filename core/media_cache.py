@@ -0,0 +1,202 @@
+"""
+کش file_id تلگرام برای عکس‌های ثابت (گالری، درباره ما)
+
+هر فایل فقط یک بار آپلود می‌شود؛ file_id برگشتی در یک ایندکس JSON روی دیسک ذخیره می‌شود
+و ارسال‌های بعدی فقط با file_id انجام می‌شوند.
+کلید: مسیر + mtime + اندازه؛ اگر این‌ها عوض شوند ولی هش محتوا یکی باشد، file_id قبلی استفاده می‌شود.
+چند worker گونیکورن یک ایندکس مشترک دارند: هر نوشتن زیر قفل فایل، نسخه دیسک را دوباره می‌خواند
+و فقط تغییر خودش را روی آن اعمال می‌کند؛ file_idی که worker دیگر گرفته قبل از آپلود دوباره خوانده می‌شود.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from core.file_lock import file_lock
+
+log = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+ALBUM_LIMIT = 10  # سقف عکس در یک media group تلگرام
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class MediaCache:
+    def __init__(self, index_path):
+        self.index_path = Path(index_path)
+        self._lock = threading.Lock()
+        self._entries = {}   # path -> {"mtime", "size", "sha1", "file_id"}
+        self._by_hash = {}   # sha1 -> file_id
+        self._listings = {}  # dir -> (mtime_ns, [paths])
+        self._index_mtime = None
+        self.uploads = 0
+        self.reused = 0
+        with self._lock:
+            self._adopt(self._read())
+
+    def _stat_index(self):
+        # هر نوشتن فایل جدیدی جایگزین می‌کند؛ inode حتی با mtime یکسان عوض می‌شود
+        try:
+            st = self.index_path.stat()
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _read(self):
+        self._index_mtime = self._stat_index()
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning(f"Media index unreadable, starting empty: {e}")
+            return {}
+
+    def _adopt(self, entries):
+        # نسخه دیسک مرجع است؛ ورودی‌های محلی بدون file_id (فقط هش محاسبه شده) حفظ می‌شوند
+        for key, entry in self._entries.items():
+            if key not in entries and not entry.get("file_id"):
+                entries[key] = entry
+        self._entries = entries
+        self._by_hash = {e["sha1"]: e["file_id"] for e in entries.values() if e.get("file_id")}
+
+    def _refresh(self):
+        # worker دیگری ایندکس را عوض کرده؟ (فایل اتمیک جایگزین می‌شود، خواندن قفل لازم ندارد)
+        if self._stat_index() != self._index_mtime:
+            self._adopt(self._read())
+
+    def _save(self, key, entry):
+        # خواندن دوباره، اعمال همین یک تغییر (entry=None یعنی حذف) و نوشتن اتمیک زیر قفل فایل
+        with file_lock(self.index_path.with_suffix(".lock")):
+            entries = self._read()
+            if entry is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+            tmp = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.index_path)
+            self._index_mtime = self._stat_index()
+        self._adopt(entries)
+
+    def list_images(self, directory):
+        # فهرست عکس‌ها فقط وقتی پوشه تغییر کرده دوباره خوانده می‌شود
+        directory = Path(directory)
+        mtime = directory.stat().st_mtime_ns
+        cached = self._listings.get(directory)
+        if cached is None or cached[0] != mtime:
+            files = sorted(p for p in directory.iterdir()
+                           if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES)
+            cached = self._listings[directory] = (mtime, files)
+        return list(cached[1])
+
+    def file_id(self, path):
+        path = Path(path)
+        st = path.stat()
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not entry.get("file_id"):
+                self._refresh()
+                entry = self._entries.get(key)
+            if entry and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                return entry.get("file_id")
+        digest = file_hash(path)
+        with self._lock:
+            if digest not in self._by_hash:
+                self._refresh()
+            entry = {"mtime": st.st_mtime_ns, "size": st.st_size, "sha1": digest,
+                     "file_id": self._by_hash.get(digest)}
+            self._entries[key] = entry
+            return entry["file_id"]
+
+    def remember(self, path, file_id):
+        path = Path(path)
+        st = path.stat()
+        with self._lock:
+            entry = self._entries.get(str(path)) or {"sha1": file_hash(path)}
+            entry.update(mtime=st.st_mtime_ns, size=st.st_size, file_id=file_id)
+            self._save(str(path), entry)
+
+    def forget(self, path):
+        with self._lock:
+            entry = self._entries.pop(str(path), None)
+            if entry:
+                self._by_hash.pop(entry["sha1"], None)
+                self._save(str(path), None)
+
+    def send_photo(self, bot, cid, path, **kwargs):
+        file_id = self.file_id(path)
+        if file_id:
+            try:
+                msg = bot.send_photo(cid, file_id, **kwargs)
+                self.reused += 1
+                return msg
+            except Exception as e:
+                # file_id نامعتبر (مثلاً توکن بات عوض شده): آپلود مجدد
+                log.warning(f"Cached file_id failed for {path}: {e}")
+                self.forget(path)
+        with open(path, "rb") as photo:
+            msg = bot.send_photo(cid, photo, **kwargs)
+        self.uploads += 1
+        self.remember(path, msg.photo[-1].file_id)
+        return msg
+
+    def send_album(self, bot, cid, paths, caption=None, parse_mode=None):
+        messages = []
+        for start in range(0, len(paths), ALBUM_LIMIT):
+            chunk = paths[start:start + ALBUM_LIMIT]
+            first_caption = caption if start == 0 else None
+            if len(chunk) == 1:
+                # media group تک‌عکسی را تلگرام نمی‌پذیرد
+                messages.append(self.send_photo(bot, cid, chunk[0], caption=first_caption,
+                                                parse_mode=parse_mode))
+                continue
+            ids = [self.file_id(p) for p in chunk]
+            try:
+                sent = self._send_group(bot, cid, chunk, ids, first_caption, parse_mode)
+            except Exception as e:
+                if not any(ids):
+                    raise
+                # یکی از file_idها نامعتبر است: همه دوباره آپلود می‌شوند
+                log.warning(f"Cached album failed, re-uploading: {e}")
+                for p in chunk:
+                    self.forget(p)
+                ids = [None] * len(chunk)
+                sent = self._send_group(bot, cid, chunk, ids, first_caption, parse_mode)
+            for p, fid, msg in zip(chunk, ids, sent):
+                if fid:
+                    self.reused += 1
+                else:
+                    self.uploads += 1
+                    self.remember(p, msg.photo[-1].file_id)
+            messages.extend(sent)
+        return messages
+
+    def _send_group(self, bot, cid, paths, ids, caption, parse_mode):
+        from telebot import types
+
+        files = [None if fid else open(p, "rb") for p, fid in zip(paths, ids)]
+        try:
+            media = [
+                types.InputMediaPhoto(fid or f, caption=caption if i == 0 else None,
+                                      parse_mode=parse_mode)
+                for i, (fid, f) in enumerate(zip(ids, files))
+            ]
+            return bot.send_media_group(cid, media)
+        finally:
+            for f in files:
+                if f:
+                    f.close()
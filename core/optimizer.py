@@ -0,0 +1,160 @@
+"""
+حالت «بهینه‌سازی بیشتر» برای نقشه برش
+
+۱) همه ترکیب‌های الگوریتم × ترتیب مرتب‌سازی اجرا می‌شوند
+۲) تا پایان بودجه زمانی، شبیه‌سازی تبرید (Simulated Annealing) روی ترتیب قطعات،
+   جهت چرخش و الگوریتم چیدمان با شروع مجدد تصادفی انجام می‌شود
+   (با start، نقشه شروع گرم اولین کاندید و ترتیب و جهت قطعاتش اولین نقطه شروع تبرید است)
+
+بهترین نقشه و روند بهبود در طول زمان برگردانده می‌شود.
+"""
+
+import math
+import random
+import time
+from dataclasses import dataclass, field
+
+from core.packing import HEURISTICS, NO_CONSTRAINTS, SORT_KEYS, pack
+
+DEFAULT_BUDGET = 2.0  # ثانیه
+
+
+@dataclass
+class OptimiseResult:
+    best: object                # PackResult
+    history: list = field(default_factory=list)  # (ثانیه, تعداد ورق, درصد پرتی)
+    iterations: int = 0
+    elapsed: float = 0.0
+    lower_bound: int = 0
+
+
+def energy(result):
+    # کمتر بهتر: قطعات جا نشده، تعداد ورق، پر بودن ورق آخر
+    last = result.sheets[-1].utilisation if result.sheets else 0.0
+    return len(result.unplaced) * 1000 + len(result.sheets) + last
+
+
+def lower_bound(parts, stock_w, stock_h, constraints=NO_CONSTRAINTS):
+    use_w, use_h = constraints.usable(stock_w, stock_h)
+    k = constraints.kerf
+    area = sum((p[0] + k) * (p[1] + k) for p in parts)
+    return math.ceil(area / (use_w * use_h)) if use_w > 0 and use_h > 0 else 0
+
+
+def _neighbour(rng, order, orient, heuristic, heuristics, free_idx):
+    order = order[:]
+    orient = orient[:]
+    n = len(order)
+    move = rng.random()
+    if move < 0.45 and n > 1:
+        i, j = rng.randrange(n), rng.randrange(n)
+        order[i], order[j] = order[j], order[i]
+    elif move < 0.7 and n > 2:
+        # جابجایی یک بلوک از قطعات
+        i = rng.randrange(n)
+        j = rng.randrange(i, min(n, i + 8)) + 1
+        block = order[i:j]
+        del order[i:j]
+        k = rng.randrange(len(order) + 1)
+        order[k:k] = block
+    elif move < 0.9 and free_idx:
+        i = rng.choice(free_idx)
+        orient[i] = rng.choice((None, False, True))
+    else:
+        heuristic = rng.choice(heuristics)
+    return order, orient, heuristic
+
+
+def _layout(result, n, free_idx):
+    # ترتیب و جهت قطعات (فقط چرخش‌پذیرها) یک نقشه موجود، برای شروع تبرید از همان نقشه
+    placed = [p for sheet in result.sheets for p in sheet.placements]
+    order = [p.index for p in placed] + list(result.unplaced)
+    orient = [None] * n
+    free = set(free_idx)
+    for p in placed:
+        if p.index in free:
+            orient[p.index] = p.rotated
+    return order, orient
+
+
+def optimise(parts, stock_w, stock_h, constraints=NO_CONSTRAINTS,
+             budget=DEFAULT_BUDGET, seed=None, heuristics=None, start=None):
+    """start: نقشه شروع گرم (PackResult روی همین parts)"""
+    t0 = time.perf_counter()
+    deadline = t0 + budget
+    rng = random.Random(seed)
+    heuristics = list(heuristics or HEURISTICS)
+    bound = lower_bound(parts, stock_w, stock_h, constraints)
+
+    out = OptimiseResult(best=None, lower_bound=bound)
+
+    def consider(result):
+        out.iterations += 1
+        if out.best is None or energy(result) < energy(out.best):
+            out.best = result
+            out.history.append((time.perf_counter() - t0, result.sheet_count,
+                                round(result.waste_percent, 2)))
+            return True
+        return False
+
+    n = len(parts)
+    grain_all = constraints.grain
+    free_idx = [i for i in range(n)
+                if not grain_all and not (len(parts[i]) > 2 and parts[i][2])]
+
+    # مرحله ۱: شروع گرم و شروع‌های قطعی؛ هر شروع (انرژی، الگوریتم، ترتیب، جهت)
+    starts = []
+    if start is not None:
+        consider(start)
+        starts.append((energy(start), heuristics[0], *_layout(start, n, free_idx)))
+    for h in heuristics:
+        for key in SORT_KEYS:
+            r = pack(parts, stock_w, stock_h, heuristic=h, sort_key=key,
+                     constraints=constraints)
+            consider(r)
+            sort = SORT_KEYS[key]
+            starts.append((energy(r), h, sorted(range(n), key=lambda i: sort(parts[i]), reverse=True),
+                           [None] * n))
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            continue
+        break
+
+    # مرحله ۲: تبرید با شروع مجدد از بهترین شروع‌ها (با انرژی برابر، شروع گرم اول)
+    starts.sort(key=lambda s: s[0])
+    restart = 0
+    while n > 1 and time.perf_counter() < deadline and out.best.sheet_count > bound:
+        _, heuristic, order, orient = starts[restart % len(starts)]
+        restart += 1
+        order, orient = order[:], orient[:]
+        if restart > len(starts):
+            # شروع مجدد تصادفی: به‌هم‌ریختگی جزئی ترتیب
+            for _ in range(max(1, n // 10)):
+                i, j = rng.randrange(n), rng.randrange(n)
+                order[i], order[j] = order[j], order[i]
+        cur = pack(parts, stock_w, stock_h, heuristic=heuristic, order=order,
+                   constraints=constraints, orient=orient)
+        cur_e = energy(cur)
+        consider(cur)
+
+        stale = 0
+        temp = 0.3
+        while stale < 40 + 2 * n and time.perf_counter() < deadline:
+            cand = _neighbour(rng, order, orient, heuristic, heuristics, free_idx)
+            res = pack(parts, stock_w, stock_h, heuristic=cand[2], order=cand[0],
+                       constraints=constraints, orient=cand[1])
+            e = energy(res)
+            if e < cur_e or rng.random() < math.exp((cur_e - e) / temp):
+                order, orient, heuristic = cand
+                stale = 0 if e < cur_e else stale + 1
+                cur_e = e
+            else:
+                stale += 1
+            consider(res)
+            if out.best.sheet_count <= bound and not out.best.unplaced:
+                break
+            temp = max(0.002, temp * 0.995)
+
+    out.elapsed = time.perf_counter() - t0
+    return out
@@ -0,0 +1,156 @@
+"""
+انبار سفارش‌ها (SQLite)
+
+- هر سفارش با شماره پیگیری یکتا ثبت می‌شود؛ ایندکس روی شماره پیگیری، تلفن و تاریخ ثبت
+- همین جدول صف ارسال واتساپ هم هست: وضعیت pending تا ارسال موفق، با زمان تلاش بعدی؛
+  پس سفارش‌ها با ری‌استارت یا اوج ترافیک گم نمی‌شوند
+- برداشتن دسته برای ارسال اتمی است (BEGIN IMMEDIATE)؛ چند worker گونیکورن یک سفارش را دو بار نمی‌فرستند
+"""
+
+import secrets
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+CLAIM_TTL = 300   # ثانیه؛ سفارش برداشته شده و ارسال نشده (کرش worker) دوباره در صف می‌آید
+TRACKING_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"   # بدون O/0 و I/1
+
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+
+class Order(NamedTuple):
+    id: int
+    tracking: str
+    chat_id: int
+    name: str
+    phone: str
+    details: str
+    created: float
+    status: str
+    attempts: int
+    error: str
+
+    @property
+    def text(self):
+        return (f"سفارش جدید {self.tracking}\n"
+                f"نام: {self.name}\n"
+                f"تلفن: {self.phone}\n"
+                f"زمان: {time.strftime('%Y-%m-%d %H:%M', time.localtime(self.created))}\n"
+                f"توضیحات:\n{self.details}")
+
+
+_COLUMNS = "id, tracking, chat_id, name, phone, details, created, status, attempts, error"
+
+
+def normalize_phone(phone):
+    # ارقام فارسی/عربی و پیش‌شماره‌های +98 و 0098 -> 09xxxxxxxxx
+    digits = "".join(c for c in str(phone).translate(_DIGITS) if c.isdigit())
+    if digits.startswith("0098"):
+        digits = "0" + digits[4:]
+    elif digits.startswith("98") and len(digits) == 12:
+        digits = "0" + digits[2:]
+    return digits
+
+
+def new_tracking(length=8):
+    return "".join(secrets.choice(TRACKING_ALPHABET) for _ in range(length))
+
+
+class OrderStore:
+    def __init__(self, path, claim_ttl=CLAIM_TTL):
+        self.claim_ttl = claim_ttl
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            "id INTEGER PRIMARY KEY, tracking TEXT NOT NULL UNIQUE, chat_id INTEGER NOT NULL, "
+            "name TEXT NOT NULL, phone TEXT NOT NULL, details TEXT NOT NULL, created REAL NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_try REAL NOT NULL DEFAULT 0, sent REAL, message_id TEXT, error TEXT NOT NULL DEFAULT '')"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_phone ON orders (phone, created)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_created ON orders (created)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_queue ON orders (status, next_try)")
+        self._lock = threading.Lock()
+
+    def create(self, chat_id, name, phone, details):
+        now = time.time()
+        with self._lock:
+            while True:
+                tracking = new_tracking()
+                try:
+                    cur = self._db.execute(
+                        "INSERT INTO orders (tracking, chat_id, name, phone, details, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (tracking, chat_id, name, normalize_phone(phone), details, now),
+                    )
+                    break
+                except sqlite3.IntegrityError:
+                    continue   # شماره پیگیری تکراری (بسیار نادر)
+        return Order(cur.lastrowid, tracking, chat_id, name, normalize_phone(phone), details, now,
+                     PENDING, 0, "")
+
+    def _select(self, where, args, limit=None):
+        sql = f"SELECT {_COLUMNS} FROM orders WHERE {where} ORDER BY created DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [Order(*row) for row in self._db.execute(sql, args).fetchall()]
+
+    def get(self, tracking):
+        rows = self._select("tracking = ?", (tracking.strip().upper(),))
+        return rows[0] if rows else None
+
+    def by_phone(self, phone, limit=20):
+        phone = normalize_phone(phone)
+        if not phone:
+            # متن بدون رقم (مثلاً شماره پیگیری اشتباه) نباید سفارش‌های بی‌تلفن را برگرداند
+            return []
+        return self._select("phone = ?", (phone,), limit)
+
+    def between(self, start, end, limit=200):
+        return self._select("created >= ? AND created < ?", (start, end), limit)
+
+    def claim(self, limit=20):
+        """برداشتن دسته‌ای از سفارش‌های آماده ارسال (قدیمی‌ترها اول)"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM orders WHERE (status = ? AND next_try <= ?) "
+                f"OR (status = ? AND next_try <= ?) ORDER BY created, id LIMIT ?",
+                (PENDING, now, SENDING, now, limit),
+            ).fetchall()
+            self._db.executemany("UPDATE orders SET status = ?, next_try = ? WHERE id = ?",
+                                 [(SENDING, now + self.claim_ttl, r[0]) for r in rows])
+            self._db.execute("COMMIT")
+        return [Order(*row) for row in rows]
+
+    def mark_sent(self, order_id, message_id=""):
+        with self._lock:
+            self._db.execute(
+                "UPDATE orders SET status = ?, sent = ?, message_id = ?, attempts = attempts + 1, "
+                "error = '' WHERE id = ?",
+                (SENT, time.time(), message_id, order_id),
+            )
+
+    def mark_failed(self, order_id, error, retry_at=None):
+        # retry_at=None یعنی خطای دائمی؛ در غیر این صورت دوباره در صف
+        with self._lock:
+            self._db.execute(
+                "UPDATE orders SET status = ?, next_try = ?, attempts = attempts + 1, error = ? "
+                "WHERE id = ?",
+                (FAILED if retry_at is None else PENDING, retry_at or 0, str(error)[:500], order_id),
+            )
+
+    def depth(self):
+        # سفارش‌های در انتظار ارسال (برای /metrics)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM orders WHERE status IN (?, ?)",
+                                    (PENDING, SENDING)).fetchone()[0]
@@ -0,0 +1,380 @@
+"""
+موتور چیدمان دوبعدی قطعات روی ورق (CutMaster Pro)
+
+دو خانواده الگوریتم دارد:
+- MaxRects: مستطیل‌های آزاد همپوشان، بهترین بازده
+- Guillotine: برش‌های سراسری، مناسب دستگاه دوربر
+
+هر قطعه با مختصات واقعی (x, y) و وضعیت چرخش ۹۰ درجه برگردانده می‌شود.
+"""
+
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import NamedTuple
+
+_BY_WIDTH = itemgetter(2)
+
+
+class Part(NamedTuple):
+    w: float
+    h: float
+    grain: bool = False   # قفل جهت رگه: قطعه نباید بچرخد
+
+
+@dataclass(frozen=True)
+class CutConstraints:
+    kerf: float = 0.0     # ضخامت تیغ اره
+    trim: float = 0.0     # دوربری لبه ورق از هر طرف
+    grain: bool = False   # ورق رگه‌دار (نما چوب): چرخش هیچ قطعه‌ای مجاز نیست
+
+    def usable(self, stock_w, stock_h):
+        # تیغ بعد از آخرین قطعه لازم نیست، پس یک kerf به فضای مفید اضافه می‌شود
+        return (stock_w - 2 * self.trim + self.kerf,
+                stock_h - 2 * self.trim + self.kerf)
+
+
+NO_CONSTRAINTS = CutConstraints()
+
+
+@dataclass
+class Placement:
+    index: int       # اندیس قطعه در لیست ورودی
+    x: float
+    y: float
+    w: float         # ابعاد بعد از چرخش
+    h: float
+    rotated: bool = False
+
+
+@dataclass
+class Sheet:
+    width: float
+    height: float
+    placements: list = field(default_factory=list)
+    # فضاهای خالی باقیمانده (x, y, w, h) در مختصات ورق، بعد از کسر تیغ؛ ممکن است همپوشان باشند
+    free: list = field(default_factory=list, repr=False)
+
+    @property
+    def area(self):
+        return self.width * self.height
+
+    @property
+    def used_area(self):
+        return sum(p.w * p.h for p in self.placements)
+
+    @property
+    def utilisation(self):
+        return self.used_area / self.area if self.area else 0.0
+
+
+@dataclass
+class PackResult:
+    sheets: list
+    unplaced: list           # اندیس قطعاتی که در هیچ ورقی جا نمی‌شوند
+    heuristic: str
+    elapsed: float = 0.0
+
+    @property
+    def sheet_count(self):
+        return len(self.sheets)
+
+    @property
+    def part_area(self):
+        return sum(s.used_area for s in self.sheets)
+
+    @property
+    def sheet_area(self):
+        return sum(s.area for s in self.sheets)
+
+    @property
+    def utilisation(self):
+        return self.part_area / self.sheet_area if self.sheet_area else 0.0
+
+    @property
+    def waste_percent(self):
+        return 100 * (1 - self.utilisation) if self.sheet_area else 0.0
+
+    def score(self):
+        # کمتر بهتر: اول تعداد ورق، بعد پر بودن ورق آخر (ورق آخر خالی‌تر = باقیمانده قابل استفاده‌تر)
+        last = self.sheets[-1].utilisation if self.sheets else 0.0
+        return (len(self.unplaced), len(self.sheets), last)
+
+
+# --- امتیازدهی MaxRects (کمتر بهتر) ---
+
+def _score_bssf(fx, fy, fw, fh, w, h):
+    lw, lh = fw - w, fh - h
+    return (min(lw, lh), max(lw, lh))
+
+
+def _score_blsf(fx, fy, fw, fh, w, h):
+    lw, lh = fw - w, fh - h
+    return (max(lw, lh), min(lw, lh))
+
+
+def _score_baf(fx, fy, fw, fh, w, h):
+    lw, lh = fw - w, fh - h
+    return (fw * fh - w * h, min(lw, lh))
+
+
+def _score_bl(fx, fy, fw, fh, w, h):
+    return (fy + h, fx)
+
+
+class MaxRectsBin:
+    def __init__(self, width, height, score=_score_bssf):
+        self.width = width
+        self.height = height
+        self.score = score
+        # مستطیل‌های آزاد (x, y, w, h) مرتب بر اساس عرض برای جستجوی سریع
+        self.free = [(0.0, 0.0, width, height)]
+        self._widths = [width]
+        self.free_area = width * height
+
+    def find(self, w, h, allow_rotation=True):
+        best = None
+        best_score = None
+        for rw, rh, rot in ((w, h, False), (h, w, True)):
+            if rot and (not allow_rotation or w == h):
+                continue
+            # فقط مستطیل‌هایی که عرض کافی دارند بررسی می‌شوند
+            for i in range(bisect_left(self._widths, rw), len(self.free)):
+                fx, fy, fw, fh = self.free[i]
+                if fh < rh:
+                    continue
+                s = self.score(fx, fy, fw, fh, rw, rh)
+                if best_score is None or s < best_score:
+                    best_score = s
+                    best = (fx, fy, rw, rh, rot)
+        if best is None:
+            return None
+        return best_score, best
+
+    def place(self, x, y, w, h):
+        self.free_area -= w * h
+        kept, created = [], []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+                kept.append((fx, fy, fw, fh))
+                continue
+            if x > fx:
+                created.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                created.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                created.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                created.append((fx, y + h, fw, fy + fh - y - h))
+        # مستطیل‌های قدیمی از قبل هرس شده‌اند؛ فقط مستطیل‌های جدید را بررسی می‌کنیم
+        fresh = []
+        for i, r in enumerate(created):
+            if _contained_in_any(r, kept) or _contained_in_any(r, fresh):
+                continue
+            if _contained_in_any(r, created[i + 1:]):
+                continue
+            fresh.append(r)
+        self.free = kept + fresh
+        self.free.sort(key=_BY_WIDTH)
+        self._widths = [r[2] for r in self.free]
+
+
+def _contained_in_any(r, rects):
+    x, y, w, h = r
+    for ox, oy, ow, oh in rects:
+        if x >= ox and y >= oy and x + w <= ox + ow and y + h <= oy + oh:
+            return True
+    return False
+
+
+class GuillotineBin:
+    def __init__(self, width, height, split="sas"):
+        self.width = width
+        self.height = height
+        self.split = split
+        # مستطیل‌های آزاد در گیوتین همپوشانی ندارند
+        self.free = [(0.0, 0.0, width, height)]
+        self.free_area = width * height
+
+    def find(self, w, h, allow_rotation=True):
+        best = None
+        best_score = None
+        for fx, fy, fw, fh in self.free:
+            for rw, rh, rot in ((w, h, False), (h, w, True)):
+                if rot and (not allow_rotation or w == h):
+                    continue
+                if rw <= fw and rh <= fh:
+                    s = _score_baf(fx, fy, fw, fh, rw, rh)
+                    if best_score is None or s < best_score:
+                        best_score = s
+                        best = (fx, fy, rw, rh, rot)
+        if best is None:
+            return None
+        return best_score, best
+
+    def place(self, x, y, w, h):
+        self.free_area -= w * h
+        for i, (fx, fy, fw, fh) in enumerate(self.free):
+            if fx == x and fy == y and fw >= w and fh >= h:
+                break
+        else:
+            raise ValueError("placement does not match a free rectangle")
+        del self.free[i]
+
+        lw, lh = fw - w, fh - h
+        if self.split == "las":
+            horizontal = lw > lh
+        elif self.split == "min_area":
+            horizontal = w * lh > lw * h
+        else:  # sas
+            horizontal = lw <= lh
+
+        if horizontal:
+            right = (fx + w, fy, lw, h)
+            top = (fx, fy + h, fw, lh)
+        else:
+            right = (fx + w, fy, lw, fh)
+            top = (fx, fy + h, w, lh)
+        for r in (right, top):
+            if r[2] > 0 and r[3] > 0:
+                self.free.append(r)
+        self._merge()
+
+    def _merge(self):
+        # ادغام مستطیل‌های هم‌راستا برای کاهش تکه‌تکه شدن
+        merged = True
+        while merged:
+            merged = False
+            free = self.free
+            for i in range(len(free)):
+                ax, ay, aw, ah = free[i]
+                for j in range(i + 1, len(free)):
+                    bx, by, bw, bh = free[j]
+                    if ay == by and ah == bh and (ax + aw == bx or bx + bw == ax):
+                        free[i] = (min(ax, bx), ay, aw + bw, ah)
+                    elif ax == bx and aw == bw and (ay + ah == by or by + bh == ay):
+                        free[i] = (ax, min(ay, by), aw, ah + bh)
+                    else:
+                        continue
+                    del free[j]
+                    merged = True
+                    break
+                if merged:
+                    break
+
+
+HEURISTICS = {
+    "maxrects-bssf": lambda w, h: MaxRectsBin(w, h, _score_bssf),
+    "maxrects-blsf": lambda w, h: MaxRectsBin(w, h, _score_blsf),
+    "maxrects-baf": lambda w, h: MaxRectsBin(w, h, _score_baf),
+    "maxrects-bl": lambda w, h: MaxRectsBin(w, h, _score_bl),
+    "guillotine-sas": lambda w, h: GuillotineBin(w, h, "sas"),
+    "guillotine-las": lambda w, h: GuillotineBin(w, h, "las"),
+    "guillotine-min": lambda w, h: GuillotineBin(w, h, "min_area"),
+}
+
+SORT_KEYS = {
+    "area": lambda p: (p[0] * p[1], max(p)),
+    "long_side": lambda p: (max(p), min(p)),
+    "perimeter": lambda p: (p[0] + p[1], max(p)),
+    "width": lambda p: (p[0], p[1]),
+    "height": lambda p: (p[1], p[0]),
+}
+
+
+def pack(parts, stock_w, stock_h, heuristic="maxrects-bssf",
+         allow_rotation=True, sort_key="area", order=None,
+         constraints=NO_CONSTRAINTS, orient=None, max_sheets=None, start=None, kernel="python"):
+    """
+    parts: لیست (w, h) یا Part(w, h, grain)
+    order: ترتیب دلخواه اندیس‌ها (برای جستجوی چندشروعی)؛ در غیر این صورت مرتب‌سازی نزولی با sort_key
+    orient: برای هر قطعه None (آزاد)، False (بدون چرخش) یا True (حتماً چرخیده)
+    constraints: kerf و دوربری و رگه هنگام چیدمان اعمال می‌شوند، نه بعد از آن
+    max_sheets: سقف تعداد ورق؛ قطعاتی که جا نشوند در unplaced برمی‌گردند
+    start: ورق‌های چیده شده قبلی (شروع گرم، فقط MaxRects)؛ چیدمان آن‌ها حفظ می‌شود و
+           قطعات order در فضای خالی آن‌ها یا ورق‌های جدید قرار می‌گیرند
+    kernel: "python" یا "numpy" (core.packing_np، فقط MaxRects و بدون start)؛ NumPy فقط از حدود
+            ۱۰٬۰۰۰ قطعه با ابعاد متنوع سریع‌تر است، پس انتخاب آن دستی است (tools/cut_bench.py --kernel)
+    """
+    if kernel == "numpy":
+        from core.packing_np import pack_numpy
+        return pack_numpy(parts, stock_w, stock_h, heuristic, allow_rotation, sort_key, order,
+                          constraints, orient, max_sheets)
+
+    t0 = time.perf_counter()
+    make_bin = HEURISTICS[heuristic]
+    kerf, trim = constraints.kerf, constraints.trim
+    use_w, use_h = constraints.usable(stock_w, stock_h)
+
+    if order is None:
+        key = SORT_KEYS[sort_key]
+        order = sorted(range(len(parts)), key=lambda i: key(parts[i]), reverse=True)
+
+    bins = []
+    sheets = []
+    unplaced = []
+    for old in start or ():
+        if not heuristic.startswith("maxrects"):
+            raise ValueError("warm start needs a maxrects heuristic")
+        b = make_bin(use_w, use_h)
+        for p in old.placements:
+            b.place(p.x - trim, p.y - trim, p.w + kerf, p.h + kerf)
+        bins.append(b)
+        sheets.append(Sheet(old.width, old.height, list(old.placements)))
+    # قطعات تکراری: ورق‌هایی که قطعه مشابه قبلی در آن‌ها جا نشد دوباره بررسی نمی‌شوند
+    # (فضای آزاد ورق‌ها فقط کم می‌شود)
+    resume = {}
+
+    for i in order:
+        part = parts[i]
+        # هر قطعه به اندازه تیغ بزرگ‌تر در نظر گرفته می‌شود تا فاصله برش رعایت شود
+        w, h = part[0] + kerf, part[1] + kerf
+        rotate = allow_rotation and not constraints.grain and not (len(part) > 2 and part[2])
+        flipped = False
+        if rotate and orient is not None and orient[i] is not None:
+            rotate = False
+            if orient[i]:
+                w, h = h, w
+                flipped = True
+        fits = (w <= use_w and h <= use_h) or (rotate and h <= use_w and w <= use_h)
+        if part[0] <= 0 or part[1] <= 0 or not fits:
+            unplaced.append(i)
+            continue
+
+        area = w * h
+        size = (w, h, rotate)
+        found = None
+        for k in range(resume.get(size, 0), len(bins)):
+            b = bins[k]
+            if b.free_area < area:
+                continue
+            hit = b.find(w, h, rotate)
+            if hit is not None:
+                found = (b, sheets[k], hit[1])
+                resume[size] = k
+                break
+
+        if found is None:
+            if max_sheets is not None and len(bins) >= max_sheets:
+                unplaced.append(i)
+                resume[size] = len(bins)
+                continue
+            b = make_bin(use_w, use_h)
+            sheet = Sheet(stock_w, stock_h)
+            bins.append(b)
+            sheets.append(sheet)
+            resume[size] = len(bins) - 1
+            found = (b, sheet, b.find(w, h, rotate)[1])
+
+        b, sheet, (x, y, pw, ph, rot) = found
+        b.place(x, y, pw, ph)
+        rot = rot != flipped
+        ow, oh = (part[1], part[0]) if rot else (part[0], part[1])
+        sheet.placements.append(Placement(i, x + trim, y + trim, ow, oh, rot))
+
+    for b, sheet in zip(bins, sheets):
+        sheet.free = [(fx + trim, fy + trim, fw - kerf, fh - kerf)
+                      for fx, fy, fw, fh in b.free if fw > kerf and fh > kerf]
+
+    return PackResult(sheets, unplaced, heuristic, time.perf_counter() - t0)
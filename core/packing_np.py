@@ -0,0 +1,242 @@
+"""
+هسته برداری MaxRects با NumPy برای سفارش‌های بزرگ (هزاران قطعه)
+
+مستطیل‌های آزاد همه ورق‌های باز در یک ساختار struct-of-arrays (x, y, w, h, sheet) نگه داشته می‌شوند؛
+برای هر قطعه جا شدن و امتیاز همه کاندیدها (همه ورق‌ها، هر دو جهت) یکجا محاسبه می‌شود.
+انتخاب مثل هسته پایتونی است: اولین ورقی که قطعه در آن جا می‌شود، بعد بهترین امتیاز در همان ورق.
+
+خروجی همان PackResult هسته پایتونی است. numpy وابستگی اختیاری است و فقط از pack(kernel=...)
+ایمپورت می‌شود. فضای خالی نهایی هر ورق (sheet.free) بعد از چیدمان از روی خود placementها
+با MaxRectsBin ساخته می‌شود، پس با مستطیل‌های کنار گذاشته شده از جستجو همپوشانی ندارد.
+"""
+
+import time
+
+import numpy as np
+
+from core.packing import NO_CONSTRAINTS, MaxRectsBin, PackResult, Placement, Sheet, SORT_KEYS
+
+
+def _bssf(x, y, fw, fh, w, h):
+    lw, lh = fw - w, fh - h
+    return np.minimum(lw, lh), np.maximum(lw, lh)
+
+
+def _blsf(x, y, fw, fh, w, h):
+    lw, lh = fw - w, fh - h
+    return np.maximum(lw, lh), np.minimum(lw, lh)
+
+
+def _baf(x, y, fw, fh, w, h):
+    return fw * fh - w * h, np.minimum(fw - w, fh - h)
+
+
+def _bl(x, y, fw, fh, w, h):
+    return y + h, x
+
+
+SCORES = {
+    "maxrects-bssf": _bssf,
+    "maxrects-blsf": _blsf,
+    "maxrects-baf": _baf,
+    "maxrects-bl": _bl,
+}
+
+
+class FreeRects:
+    """
+    مستطیل‌های آزاد همه ورق‌ها؛ حذف با w=-1 و فشرده‌سازی دوره‌ای
+    مستطیل‌هایی که ضلع کوچکشان از کوچک‌ترین ضلع قطعات باقیمانده کمتر است دیگر به کار نمی‌آیند؛
+    از آرایه‌ها حذف می‌شوند تا جستجوی قطعات بعدی فقط روی مستطیل‌های مفید انجام شود.
+    """
+
+    def __init__(self, capacity=256):
+        self.x = np.empty(capacity)
+        self.y = np.empty(capacity)
+        self.w = np.empty(capacity)
+        self.h = np.empty(capacity)
+        self.sheet = np.empty(capacity, dtype=np.int64)
+        self.n = 0
+        self.alive = 0
+        self.min_side = 0.0
+
+    def append(self, x, y, w, h, sheet):
+        k = len(x)
+        if self.n + k > len(self.x):
+            self._resize(max(2 * len(self.x), self.n + k))
+        end = self.n + k
+        self.x[self.n:end] = x
+        self.y[self.n:end] = y
+        self.w[self.n:end] = w
+        self.h[self.n:end] = h
+        self.sheet[self.n:end] = sheet
+        self.n = end
+        self.alive += k
+
+    def _resize(self, capacity):
+        for name in ("x", "y", "w", "h", "sheet"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def remove(self, rows):
+        self.w[rows] = -1.0
+        self.alive -= len(rows)
+        if self.n > 1024 and self.n > 2 * self.alive:
+            self.compact()
+
+    def retire(self, min_side):
+        # با کم شدن قطعات باقیمانده، حد ضلع مفید فقط بزرگ‌تر می‌شود
+        self.min_side = min_side
+        n = self.n
+        fw, fh = self.w[:n], self.h[:n]
+        rows = np.flatnonzero((fw > 0) & (np.minimum(fw, fh) < min_side))
+        if len(rows):
+            self.remove(rows)
+
+    def compact(self):
+        keep = np.flatnonzero(self.w[:self.n] > 0)
+        for name in ("x", "y", "w", "h", "sheet"):
+            arr = getattr(self, name)
+            arr[:len(keep)] = arr[keep]
+        self.n = self.alive = len(keep)
+
+    def find(self, w, h, rotate, score):
+        """بهترین جایگاه در اولین ورق ممکن -> (ورق، x، y، عرض، ارتفاع، چرخیده) یا None"""
+        n = self.n
+        fw, fh = self.w[:n], self.h[:n]
+        rows = np.flatnonzero((fw >= w) & (fh >= h))
+        if rotate and w != h:
+            turned = np.flatnonzero((fw >= h) & (fh >= w))
+        else:
+            turned = rows[:0]
+        if not len(rows) and not len(turned):
+            return None
+
+        cand = np.concatenate((rows, turned))
+        rot = np.zeros(len(cand), dtype=bool)
+        rot[len(rows):] = True
+        sheets = self.sheet[cand]
+        first = sheets.min()
+        sel = sheets == first
+        cand, rot = cand[sel], rot[sel]
+        rw = np.where(rot, h, w)
+        rh = np.where(rot, w, h)
+        primary, secondary = score(self.x[cand], self.y[cand], self.w[cand], self.h[cand], rw, rh)
+        best = np.lexsort((secondary, primary))[0]
+        r = cand[best]
+        return int(first), float(self.x[r]), float(self.y[r]), float(rw[best]), float(rh[best]), bool(rot[best])
+
+    def place(self, s, x, y, w, h):
+        n = self.n
+        fx, fy, fw, fh = self.x[:n], self.y[:n], self.w[:n], self.h[:n]
+        mine = (self.sheet[:n] == s) & (fw > 0)
+        hit = np.flatnonzero(mine & (x < fx + fw) & (fx < x + w) & (y < fy + fh) & (fy < y + h))
+        ox, oy, ow, oh = fx[hit], fy[hit], fw[hit], fh[hit]
+
+        # تقسیم هر مستطیل همپوشان به حداکثر چهار مستطیل (چپ، راست، پایین، بالا)
+        pieces = []
+        m = x > ox
+        pieces.append((ox[m], oy[m], x - ox[m], oh[m]))
+        m = x + w < ox + ow
+        pieces.append((np.full(m.sum(), x + w), oy[m], ox[m] + ow[m] - x - w, oh[m]))
+        m = y > oy
+        pieces.append((ox[m], oy[m], ow[m], y - oy[m]))
+        m = y + h < oy + oh
+        pieces.append((ox[m], np.full(m.sum(), y + h), ow[m], oy[m] + oh[m] - y - h))
+        cx, cy, cw, ch = (np.concatenate(c) for c in zip(*pieces))
+
+        self.remove(hit)
+        if not len(cx):
+            return
+
+        # هرس: مستطیل جدیدی که داخل مستطیل آزاد دیگری است حذف می‌شود
+        n = self.n
+        kept = np.flatnonzero((self.sheet[:n] == s) & (self.w[:n] > 0))
+        kx, ky = self.x[kept], self.y[kept]
+        kr, kt = kx + self.w[kept], ky + self.h[kept]
+        cr, ct = cx + cw, cy + ch
+        inside_kept = ((cx[:, None] >= kx) & (cy[:, None] >= ky)
+                       & (cr[:, None] <= kr) & (ct[:, None] <= kt)).any(axis=1)
+        inside = ((cx[:, None] >= cx) & (cy[:, None] >= cy)
+                  & (cr[:, None] <= cr) & (ct[:, None] <= ct))
+        same = ((cx[:, None] == cx) & (cy[:, None] == cy)
+                & (cr[:, None] == cr) & (ct[:, None] == ct))
+        k = len(cx)
+        later = np.arange(k)[None, :] > np.arange(k)[:, None]
+        # داخل دیگری به طور اکید، یا تکراری که نسخه بعدی آن نگه داشته می‌شود
+        drop = inside_kept | ((inside & ~same) | (same & later)).any(axis=1)
+        keep = ~drop & (np.minimum(cw, ch) >= self.min_side)
+        self.append(cx[keep], cy[keep], cw[keep], ch[keep], s)
+
+
+def pack_numpy(parts, stock_w, stock_h, heuristic="maxrects-bssf", allow_rotation=True,
+               sort_key="area", order=None, constraints=NO_CONSTRAINTS, orient=None,
+               max_sheets=None):
+    """همان قرارداد core.packing.pack (بدون start)؛ فقط خانواده MaxRects"""
+    t0 = time.perf_counter()
+    score = SCORES[heuristic]
+    kerf, trim = constraints.kerf, constraints.trim
+    use_w, use_h = constraints.usable(stock_w, stock_h)
+
+    if order is None:
+        key = SORT_KEYS[sort_key]
+        order = sorted(range(len(parts)), key=lambda i: key(parts[i]), reverse=True)
+
+    # کوچک‌ترین ضلع قطعات باقیمانده (با تیغ) از هر نقطه ترتیب به بعد
+    suffix_min = [0.0] * (len(order) + 1)
+    suffix_min[-1] = float("inf")
+    for j in range(len(order) - 1, -1, -1):
+        p = parts[order[j]]
+        suffix_min[j] = min(suffix_min[j + 1], min(p[0], p[1]) + kerf)
+
+    free = FreeRects()
+    sheets = []
+    unplaced = []
+
+    for j, i in enumerate(order):
+        if j % 64 == 0 and suffix_min[j] > free.min_side:
+            free.retire(suffix_min[j])
+        part = parts[i]
+        w, h = part[0] + kerf, part[1] + kerf
+        rotate = allow_rotation and not constraints.grain and not (len(part) > 2 and part[2])
+        flipped = False
+        if rotate and orient is not None and orient[i] is not None:
+            rotate = False
+            if orient[i]:
+                w, h = h, w
+                flipped = True
+        fits = (w <= use_w and h <= use_h) or (rotate and h <= use_w and w <= use_h)
+        if part[0] <= 0 or part[1] <= 0 or not fits:
+            unplaced.append(i)
+            continue
+
+        found = free.find(w, h, rotate, score)
+        if found is None:
+            if max_sheets is not None and len(sheets) >= max_sheets:
+                unplaced.append(i)
+                continue
+            sheets.append(Sheet(stock_w, stock_h))
+            free.append([0.0], [0.0], [use_w], [use_h], len(sheets) - 1)
+            found = free.find(w, h, rotate, score)
+
+        s, x, y, pw, ph, rot = found
+        free.place(s, x, y, pw, ph)
+        rot = rot != flipped
+        ow, oh = (part[1], part[0]) if rot else (part[0], part[1])
+        sheets[s].placements.append(Placement(i, x + trim, y + trim, ow, oh, rot))
+
+    for sheet in sheets:
+        sheet.free = _free_space(sheet, use_w, use_h, kerf, trim)
+
+    return PackResult(sheets, unplaced, heuristic, time.perf_counter() - t0)
+
+
+def _free_space(sheet, use_w, use_h, kerf, trim):
+    # مستطیل‌های آزاد آرایه‌ها ناقص‌اند (هرس شده‌ها کنار رفته‌اند)؛ از روی placementها از نو ساخته می‌شوند
+    b = MaxRectsBin(use_w, use_h)
+    for p in sheet.placements:
+        b.place(p.x - trim, p.y - trim, p.w + kerf, p.h + kerf)
+    return [(fx + trim, fy + trim, fw - kerf, fh - kerf)
+            for fx, fy, fw, fh in b.free if fw > kerf and fh > kerf]
@@ -0,0 +1,212 @@
+"""
+کش نقشه‌های برش و تصاویر رسم شده
+
+کلید: اثر انگشت متعارف سفارش = ابعاد ورق + محدودیت‌ها (تیغ، دوربری، رگه) + حالت جستجو
++ مجموعه مرتب قطعات با تعداد؛ پس ترتیب وارد کردن قطعات روی کلید اثری ندارد.
+
+- تطابق کامل: نقشه و تصاویر بدون چیدمان و رسم دوباره برگردانده می‌شوند
+- سفارش نزدیک (چند قطعه کم یا زیاد): چیدمان قبلی نقطه شروع است؛ قطعات حذف شده برداشته
+  و فقط قطعات جدید در فضای خالی یا ورق جدید چیده می‌شوند (SolverPool.submit_warm)
+- LRU با سقف حجم روی دیسک (SQLite)
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from io import BytesIO
+
+from core.packing import PackResult, Placement, Sheet
+
+log = logging.getLogger(__name__)
+
+MAX_BYTES = 200 * 1024 * 1024
+
+
+def _part_key(p):
+    return (float(p[0]), float(p[1]), bool(len(p) > 2 and p[2]))
+
+
+def canonical_order(parts):
+    # اندیس‌های قطعات به ترتیب متعارف (ابعاد، بعد اندیس)
+    return sorted(range(len(parts)), key=lambda i: (_part_key(parts[i]), i))
+
+
+def _counts(parts):
+    return [[w, h, g, n] for (w, h, g), n in sorted(Counter(map(_part_key, parts)).items())]
+
+
+def _digest(payload):
+    return hashlib.sha1(json.dumps(payload, separators=(",", ":")).encode()).hexdigest()
+
+
+def family(stock_w, stock_h, constraints, mode="pack"):
+    # سفارش‌هایی که فقط در قطعات فرق دارند هم‌خانواده‌اند (کاندید شروع گرم)
+    return _digest([float(stock_w), float(stock_h), constraints.kerf, constraints.trim,
+                    constraints.grain, mode])
+
+
+def fingerprint(parts, stock_w, stock_h, constraints, mode="pack"):
+    return _digest([family(stock_w, stock_h, constraints, mode), _counts(parts)])
+
+
+def _encode(result, parts):
+    position = {i: c for c, i in enumerate(canonical_order(parts))}
+    return json.dumps({
+        "parts": _counts(parts),
+        "heuristic": result.heuristic,
+        "unplaced": [position[i] for i in result.unplaced],
+        "sheets": [[s.width, s.height,
+                    [[position[p.index], p.x, p.y, p.w, p.h, p.rotated] for p in s.placements],
+                    s.free] for s in result.sheets],
+    }, separators=(",", ":"))
+
+
+def _remap(data, parts):
+    """
+    نقشه ذخیره شده -> (ورق‌ها، جا نشده‌ها، قطعات اضافه) با اندیس‌های سفارش فعلی
+    قطعات هم‌اندازه قابل جابجایی‌اند، پس جایگاه‌ها بر اساس ابعاد جفت می‌شوند.
+    """
+    pools = {}
+    for i in canonical_order(parts):
+        pools.setdefault(_part_key(parts[i]), []).append(i)
+    mapping = []
+    for w, h, g, n in data["parts"]:
+        pool = pools.get((w, h, g), [])
+        mapping.extend(pool[:n] + [None] * max(0, n - len(pool)))
+        del pool[:n]
+    add = [i for pool in pools.values() for i in pool]
+
+    sheets = []
+    for width, height, placements, free in data["sheets"]:
+        kept = [Placement(mapping[c], x, y, w, h, rot) for c, x, y, w, h, rot in placements
+                if mapping[c] is not None]
+        if kept:
+            # فضای خالی فقط وقتی معتبر است که قطعه‌ای برداشته نشده باشد
+            sheets.append(Sheet(width, height, kept,
+                                [tuple(r) for r in free] if len(kept) == len(placements) else []))
+    unplaced = [mapping[c] for c in data["unplaced"] if mapping[c] is not None]
+    return sheets, unplaced, add
+
+
+class PlanCache:
+    def __init__(self, path, max_bytes=MAX_BYTES, max_diff=0.1):
+        """
+        max_diff: حداکثر اختلاف قطعات برای شروع گرم، نسبت به تعداد قطعات (حداقل ۳ قطعه)
+        """
+        self.max_bytes = max_bytes
+        self.max_diff = max_diff
+        self.hits = 0
+        self.warm_hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "key TEXT PRIMARY KEY, family TEXT NOT NULL, n INTEGER NOT NULL, "
+            "plan TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS plans_family ON plans (family, n)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS plans_used ON plans (used)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plan_images ("
+            "key TEXT NOT NULL, page INTEGER NOT NULL, data BLOB NOT NULL, PRIMARY KEY (key, page))"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key, parts):
+        """تطابق کامل -> PackResult با اندیس‌های سفارش فعلی، در غیر این صورت None"""
+        with self._lock:
+            row = self._db.execute("SELECT plan FROM plans WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE plans SET used = ? WHERE key = ?", (time.time(), key))
+        data = json.loads(row[0])
+        sheets, unplaced, add = _remap(data, parts)
+        if add:
+            return None
+        self.hits += 1
+        return PackResult(sheets, unplaced, data["heuristic"])
+
+    def nearest(self, fam, parts):
+        """
+        نزدیک‌ترین نقشه هم‌خانواده با اختلاف کم -> (ورق‌های شروع، قطعات اضافه) یا None
+        """
+        n = len(parts)
+        limit = max(3, int(n * self.max_diff))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, plan FROM plans WHERE family = ? AND n BETWEEN ? AND ? "
+                "ORDER BY used DESC LIMIT 20",
+                (fam, n - limit, n + limit),
+            ).fetchall()
+        want = Counter(map(_part_key, parts))
+        best = None
+        for key, plan in rows:
+            data = json.loads(plan)
+            have = Counter({(w, h, g): c for w, h, g, c in data["parts"]})
+            diff = sum(((want - have) + (have - want)).values())
+            if diff <= limit and (best is None or diff < best[0]):
+                best = (diff, key, data)
+        if best is None:
+            self.misses += 1
+            return None
+        self.warm_hits += 1
+        sheets, unplaced, add = _remap(best[2], parts)
+        log.info(f"Plan cache warm start from {best[1][:8]}: {best[0]} parts differ")
+        # قطعاتی که قبلاً جا نشده بودند دوباره امتحان می‌شوند
+        return sheets, add + unplaced
+
+    def put(self, key, fam, parts, result):
+        plan = _encode(result, parts)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO plans (key, family, n, plan, size, used) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET used = excluded.used",
+                (key, fam, len(parts), plan, len(plan), time.time()),
+            )
+        self._evict()
+
+    def images(self, key):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM plan_images WHERE key = ? ORDER BY page", (key,)
+            ).fetchall()
+        return [BytesIO(r[0]) for r in rows] or None
+
+    def put_images(self, key, images):
+        blobs = [img.getvalue() for img in images]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM plan_images WHERE key = ?", (key,))
+            self._db.executemany("INSERT INTO plan_images (key, page, data) VALUES (?, ?, ?)",
+                                 [(key, i, b) for i, b in enumerate(blobs)])
+            self._db.execute("UPDATE plans SET size = length(plan) + ? WHERE key = ?",
+                             (sum(map(len, blobs)), key))
+            self._db.execute("COMMIT")
+        self._evict()
+
+    def _evict(self):
+        # حذف کم‌استفاده‌ترین نقشه‌ها تا حجم کل زیر سقف برگردد
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM plans").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            self._db.execute("BEGIN")
+            for key, size in self._db.execute("SELECT key, size FROM plans ORDER BY used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                self._db.execute("DELETE FROM plan_images WHERE key = ?", (key,))
+                total -= size
+            self._db.execute("COMMIT")
+
+    def stats(self):
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans").fetchone()
+        return {"plans": count, "bytes": size, "hits": self.hits,
+                "warm_hits": self.warm_hits, "misses": self.misses}
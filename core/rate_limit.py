@@ -0,0 +1,153 @@
+"""
+محدودیت نرخ و کاهش بار برای چت هوش مصنوعی
+
+- سطل توکن برای هر چت و یک سطل سراسری (پیام در دقیقه با ظرفیت انفجاری)
+- سقف درخواست‌های هم‌زمان به مدل (in-flight)
+- کاهش تدریجی کیفیت با بالا رفتن بار به جای رد کردن همه:
+    full      مدل اصلی، سقف توکن کامل
+    cheap     مدل ارزان
+    short     مدل ارزان با سقف توکن کم
+    shed      بدون فراخوانی مدل: فقط از کش، در غیر این صورت پیام «شلوغ است»
+  بار = بیشترین مقدار بین پر بودن ظرفیت هم‌زمان و خالی بودن سطل سراسری
+- کارهای پس‌زمینه (خلاصه‌سازی گفتگو) با admit(None) از همان سقف‌ها سهم می‌گیرند، بدون سطل چت؛
+  از بار short_at به بالا رد می‌شوند تا پیام کاربران اولویت داشته باشد
+- پیامی که به خاطر بار سراسری رد می‌شود (shed) توکن سطل چت را پس می‌دهد
+- هر تصمیم شمرده می‌شود (ai_admission_total) تا روی /metrics دیده شود
+
+محدودیت‌ها در هر پردازه جدا هستند (هر worker گونیکورن سهم خودش را دارد).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from core import metrics
+
+FULL = "full"
+CHEAP = "cheap"
+SHORT = "short"
+SHED = "shed"
+CHAT_LIMITED = "chat_limited"
+
+ADMISSIONS = metrics.counter("ai_admission_total", "AI chat admission decisions", ("decision",))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """rate: توکن در ثانیه؛ burst: ظرفیت سطل"""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, n=1, now=None):
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def refund(self, n=1):
+        # پس دادن توکن برداشته شده برای درخواستی که انجام نشد
+        self.tokens = min(self.burst, self.tokens + n)
+
+    def fill(self, now=None):
+        # نسبت پر بودن سطل (1 = پر)
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens / self.burst if self.burst else 0.0
+
+    def wait_time(self, n=1):
+        return max(0.0, (n - self.tokens) / self.rate) if self.rate else float("inf")
+
+
+class Admission(NamedTuple):
+    decision: str
+    model: str = ""
+    max_tokens: int = 0
+    retry_after: float = 0.0
+
+    @property
+    def allowed(self):
+        return self.decision in (FULL, CHEAP, SHORT)
+
+
+class AdmissionControl:
+    def __init__(self, chat_rate=6, chat_burst=3, global_rate=120, global_burst=30,
+                 max_inflight=8, model="gpt-4o", cheap_model="gpt-4o-mini", max_tokens=800,
+                 short_tokens=300, cheap_at=0.5, short_at=0.8, max_chats=10000):
+        """
+        chat_rate / global_rate: پیام در دقیقه؛ cheap_at / short_at: آستانه بار برای مدل ارزان و پاسخ کوتاه
+        """
+        self.chat_rate = chat_rate / 60
+        self.chat_burst = chat_burst
+        self.max_inflight = max_inflight
+        self.model = model
+        self.cheap_model = cheap_model
+        self.max_tokens = max_tokens
+        self.short_tokens = short_tokens
+        self.cheap_at = cheap_at
+        self.short_at = short_at
+        self.max_chats = max_chats
+        self.inflight = 0
+        self._global = TokenBucket(global_rate / 60, global_burst)
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _chat_bucket(self, cid):
+        bucket = self._chats.get(cid)
+        if bucket is None:
+            bucket = self._chats[cid] = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(cid)
+        return bucket
+
+    def load(self):
+        # 0 = بیکار، 1 = ظرفیت هم‌زمان پر یا سطل سراسری خالی
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        busy = self.inflight / self.max_inflight if self.max_inflight else 0.0
+        return max(busy, 1.0 - self._global.fill())
+
+    def admit(self, cid):
+        """
+        تصمیم برای یک پیام؛ اگر allowed باشد باید بعد از پایان فراخوانی release() صدا زده شود
+        cid=None: کار پس‌زمینه؛ فقط با بار کمتر از short_at و همیشه با مدل ارزان
+        """
+        with self._lock:
+            bucket = self._chat_bucket(cid) if cid is not None else None
+            if bucket is not None and not bucket.take():
+                admission = Admission(CHAT_LIMITED, retry_after=bucket.wait_time())
+            elif bucket is None and self._load() >= self.short_at:
+                admission = Admission(SHED)
+            elif self.inflight >= self.max_inflight or not self._global.take():
+                admission = Admission(SHED)
+                if bucket is not None:
+                    # پیام رد شده از سهم چت کم نمی‌شود
+                    bucket.refund()
+            elif bucket is None:
+                admission = Admission(CHEAP, self.cheap_model, self.short_tokens)
+                self.inflight += 1
+            else:
+                load = self._load()
+                if load >= self.short_at:
+                    admission = Admission(SHORT, self.cheap_model, self.short_tokens)
+                elif load >= self.cheap_at:
+                    admission = Admission(CHEAP, self.cheap_model, self.max_tokens)
+                else:
+                    admission = Admission(FULL, self.model, self.max_tokens)
+                self.inflight += 1
+        ADMISSIONS.inc(decision=admission.decision)
+        return admission
+
+    def release(self):
+        with self._lock:
+            self.inflight = max(0, self.inflight - 1)
@@ -0,0 +1,243 @@
+"""
+انبار ورق‌های باقیمانده (offcut)
+
+بعد از هر نقشه برش، فضاهای خالی قابل استفاده هر ورق به صورت مستطیل‌های جدا از هم ثبت می‌شوند
+و سفارش‌های بعدی همان متریال اول این باقیمانده‌ها را پر می‌کنند، بعد ورق کامل باز می‌کنند.
+
+- ایندکس فضایی R*Tree در SQLite روی (عرض، ارتفاع): جستجوی «حداقل این ابعاد» با هزاران باقیمانده سریع است
+- رزرو موقت: باقیمانده‌های پیشنهاد شده به یک سفارش تا تحویل نتیجه به سفارش دیگری داده نمی‌شوند
+- نقشه تحویل شده هنوز بریده نشده است: hold باقیمانده‌های مصرفی را رزرو و فضاهای خالی را کنار می‌گذارد
+  و فقط confirm (تأیید «برش زده شد») آن‌ها را در انبار ثبت می‌کند؛ استعلام قیمت باقیمانده خیالی نمی‌سازد
+- کلید انبار نام متریال است (مثلاً «MDF 16»)، نه ابعاد ورق؛ ابعاد به دقت تیغ (resolution) گرد می‌شوند
+"""
+
+import json
+import logging
+import math
+import secrets
+import sqlite3
+import threading
+import time
+
+from core.job import Stock
+
+log = logging.getLogger(__name__)
+
+MIN_SIDE = 20.0        # باقیمانده باریک‌تر از این (سانتی‌متر) دور ریخته می‌شود
+MIN_AREA = 1500.0      # و کوچک‌تر از این مساحت
+RESERVE_TTL = 600      # ثانیه؛ رزرو رها نشده (مثلاً کرش) بعد از این زمان آزاد می‌شود
+HOLD_TTL = 3 * 86400   # ثانیه؛ نقشه تأیید نشده بعد از این زمان کنار گذاشته می‌شود
+LABEL_PREFIX = "remnant-"
+
+
+def _remnant_id(stock):
+    # شناسه باقیمانده از label؛ offcutهای تعریف شده در موجودی انبار شناسه ندارند
+    if stock.label.startswith(LABEL_PREFIX):
+        return int(stock.label[len(LABEL_PREFIX):])
+    return None
+
+
+def _overlaps(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+def leftovers(sheet, min_side=MIN_SIDE, min_area=MIN_AREA):
+    """
+    فضاهای خالی ورق -> مستطیل‌های جدا از هم قابل استفاده (x, y, w, h)
+    فضاهای MaxRects همپوشان‌اند؛ از بزرگ به کوچک انتخاب می‌شوند و همپوشان‌ها کنار می‌روند.
+    """
+    chosen = []
+    for rect in sorted(sheet.free, key=lambda r: r[2] * r[3], reverse=True):
+        if min(rect[2], rect[3]) < min_side or rect[2] * rect[3] < min_area:
+            continue
+        if not any(_overlaps(rect, c) for c in chosen):
+            chosen.append(rect)
+    return chosen
+
+
+class RemnantStore:
+    def __init__(self, path, reserve_ttl=RESERVE_TTL, hold_ttl=HOLD_TTL, resolution=0.0):
+        """resolution: ابعاد ثبت شده رو به پایین به مضرب آن گرد می‌شوند (معمولاً ضخامت تیغ)"""
+        self.reserve_ttl = reserve_ttl
+        self.hold_ttl = hold_ttl
+        self.resolution = resolution
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS remnants ("
+            "id INTEGER PRIMARY KEY, material TEXT NOT NULL, w REAL NOT NULL, h REAL NOT NULL, "
+            "source TEXT NOT NULL DEFAULT '', created REAL NOT NULL, reserved REAL NOT NULL DEFAULT 0)"
+        )
+        # نقشه‌های تحویل شده در انتظار تأیید برش: {"used": [id], "add": {متریال: [[w, h]]}}
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "token TEXT PRIMARY KEY, data TEXT NOT NULL, source TEXT NOT NULL DEFAULT '', "
+            "created REAL NOT NULL)"
+        )
+        try:
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS remnant_index USING rtree(id, min_w, max_w, min_h, max_h)"
+            )
+            self._rtree = True
+        except sqlite3.OperationalError:
+            # SQLite بدون ماژول rtree: ایندکس معمولی روی (متریال، عرض)
+            log.warning("SQLite rtree unavailable, using a B-tree index for remnants")
+            self._db.execute("CREATE INDEX IF NOT EXISTS remnants_size ON remnants (material, w, h)")
+            self._rtree = False
+        self._lock = threading.Lock()
+
+    def _round(self, size):
+        # رو به پایین تا باقیمانده ثبت شده هرگز بزرگ‌تر از واقعیت نباشد
+        if not self.resolution:
+            return size
+        return round(math.floor(size / self.resolution + 1e-9) * self.resolution, 6)
+
+    def add(self, material, rects, source=""):
+        """rects: [(w, h)] یا [(x, y, w, h)]؛ خروجی: شناسه‌های ثبت شده"""
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._db.execute("BEGIN")
+            for rect in rects:
+                w, h = self._round(rect[-2]), self._round(rect[-1])
+                if w <= 0 or h <= 0:
+                    continue
+                cur = self._db.execute(
+                    "INSERT INTO remnants (material, w, h, source, created) VALUES (?, ?, ?, ?, ?)",
+                    (material, w, h, source, now),
+                )
+                if self._rtree:
+                    self._db.execute("INSERT INTO remnant_index VALUES (?, ?, ?, ?, ?)",
+                                     (cur.lastrowid, w, w, h, h))
+                ids.append(cur.lastrowid)
+            self._db.execute("COMMIT")
+        return ids
+
+    def _query(self, material, min_w, min_h, now):
+        if self._rtree:
+            # R*Tree مختصات را float32 (گرد شده به بیرون) نگه می‌دارد؛ مقایسه دقیق روی جدول اصلی
+            return self._db.execute(
+                "SELECT r.id, r.w, r.h FROM remnant_index i JOIN remnants r ON r.id = i.id "
+                "WHERE i.max_w >= ? AND i.max_h >= ? AND r.w >= ? AND r.h >= ? "
+                "AND r.material = ? AND r.reserved < ?",
+                (min_w, min_h, min_w, min_h, material, now),
+            ).fetchall()
+        return self._db.execute(
+            "SELECT id, w, h FROM remnants WHERE material = ? AND w >= ? AND h >= ? AND reserved < ?",
+            (material, min_w, min_h, now),
+        ).fetchall()
+
+    def reserve(self, material, min_w, min_h, rotate=True, limit=20):
+        """
+        باقیمانده‌هایی که حداقل یک قطعه (min_w×min_h) در آن‌ها جا می‌شود، کوچک‌ترها اول
+        خروجی: لیست Stock با offcut=True و شناسه در label؛ تا release یا consume رزرو می‌مانند
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = {r[0]: r for r in self._query(material, min_w, min_h, now)}
+            if rotate and min_w != min_h:
+                rows.update((r[0], r) for r in self._query(material, min_h, min_w, now))
+            picked = sorted(rows.values(), key=lambda r: r[1] * r[2])[:limit]
+            self._db.executemany("UPDATE remnants SET reserved = ? WHERE id = ?",
+                                 [(now + self.reserve_ttl, r[0]) for r in picked])
+            self._db.execute("COMMIT")
+        return [Stock(w, h, qty=1, offcut=True, label=f"{LABEL_PREFIX}{rid}") for rid, w, h in picked]
+
+    def offer(self, material, parts, grain=False, limit=20):
+        # باقیمانده‌های کاندید یک سفارش: حداقل کوچک‌ترین قطعه در آن‌ها جا شود
+        if not parts:
+            return []
+        small = min(parts, key=lambda p: p[0] * p[1])
+        rotate = not grain and not (len(small) > 2 and small[2])
+        return self.reserve(material, small[0], small[1], rotate, limit)
+
+    def settle(self, material, sheets, stocks=(), offered=(), source=""):
+        """
+        ثبت فوری (نقشه‌ای که واقعاً بریده شده): باقیمانده‌های بریده شده حذف، بقیه رزروها آزاد
+        و فضاهای خالی ورق‌های این نقشه به عنوان باقیمانده جدید ثبت می‌شوند
+        """
+        token = self.hold([(material, sheets, stocks, offered)], source)
+        return self.confirm(token) if token else []
+
+    def hold(self, plans, source=""):
+        """
+        بعد از تحویل نقشه، پیش از برش واقعی
+        plans: [(متریال، ورق‌ها، Stock هر ورق، باقیمانده‌های پیشنهاد شده)]
+        باقیمانده‌های استفاده نشده آزاد، استفاده شده‌ها تا hold_ttl رزرو می‌مانند
+        خروجی: token برای confirm، یا None اگر چیزی برای ثبت نیست
+        """
+        used, add = set(), {}
+        for material, sheets, stocks, offered in plans:
+            offered_ids = {_remnant_id(s) for s in offered} - {None}
+            picked = {_remnant_id(s) for s in stocks if s.offcut} & offered_ids
+            used |= picked
+            self.release(offered_ids - picked)
+            rects = [[r[2], r[3]] for sheet in sheets for r in leftovers(sheet)]
+            if rects:
+                add.setdefault(material, []).extend(rects)
+        if not used and not add:
+            return None
+        token = secrets.token_hex(8)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("UPDATE remnants SET reserved = ? WHERE id = ?",
+                                 [(now + self.hold_ttl, i) for i in used])
+            self._db.execute("INSERT INTO pending (token, data, source, created) VALUES (?, ?, ?, ?)",
+                             (token, json.dumps({"used": sorted(used), "add": add}), source, now))
+            self._db.execute("COMMIT")
+        return token
+
+    def confirm(self, token):
+        """نقشه بریده شد: مصرف باقیمانده‌ها و ثبت فضاهای خالی؛ None یعنی token نامعتبر یا قبلاً تأیید شده"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute("SELECT data, source, created FROM pending WHERE token = ?",
+                                   (token,)).fetchone()
+            self._db.execute("DELETE FROM pending WHERE token = ?", (token,))
+            self._db.execute("COMMIT")
+        if row is None or row[2] < time.time() - self.hold_ttl:
+            return None
+        data = json.loads(row[0])
+        self.consume(data["used"])
+        return [i for material, rects in data["add"].items() for i in self.add(material, rects, row[1])]
+
+    def release(self, ids):
+        with self._lock:
+            self._db.executemany("UPDATE remnants SET reserved = 0 WHERE id = ?",
+                                 [(int(i),) for i in ids])
+
+    def release_stocks(self, stocks):
+        # رها کردن رزرو پیشنهادها وقتی محاسبه شکست خورده است
+        self.release(i for i in map(_remnant_id, stocks) if i is not None)
+
+    def consume(self, ids):
+        # باقیمانده‌های بریده شده از انبار حذف می‌شوند
+        with self._lock:
+            self._db.execute("BEGIN")
+            for i in ids:
+                self._db.execute("DELETE FROM remnants WHERE id = ?", (int(i),))
+                if self._rtree:
+                    self._db.execute("DELETE FROM remnant_index WHERE id = ?", (int(i),))
+            self._db.execute("COMMIT")
+
+    def prune(self, max_age):
+        # باقیمانده‌های قدیمی (احتمالاً مصرف یا دور ریخته شده در کارگاه) و نقشه‌های تأیید نشده منقضی
+        now = time.time()
+        cutoff = now - max_age
+        with self._lock:
+            self._db.execute("DELETE FROM pending WHERE created < ?", (now - self.hold_ttl,))
+            ids = [r[0] for r in self._db.execute(
+                "SELECT id FROM remnants WHERE created < ? AND reserved < ?", (cutoff, now))]
+        self.consume(ids)
+        return len(ids)
+
+    def count(self, material=None):
+        with self._lock:
+            if material is None:
+                return self._db.execute("SELECT COUNT(*) FROM remnants").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM remnants WHERE material = ?",
+                                    (material,)).fetchone()[0]
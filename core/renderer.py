@@ -0,0 +1,118 @@
+"""
+رسم نقشه برش بدون pyplot
+
+- PNG: مستقیم با Figure + FigureCanvasAgg (بدون وضعیت سراسری pyplot، امن برای چند نخ)
+- SVG: ساخت متن SVG بدون هیچ وابستگی
+
+خروجی در حافظه (BytesIO) ساخته می‌شود و ورق‌ها در صفحه‌هایی با چند ورق کنار هم چیده می‌شوند.
+"""
+
+import math
+from io import BytesIO
+from html import escape
+
+PART_COLOR = "#4ECDC4"
+ROTATED_COLOR = "#FF9F43"  # قطعات چرخیده رنگ متفاوت
+SHEET_COLOR = "navy"
+SHEETS_PER_PAGE = 6
+COLUMNS = 3
+
+
+def _label(p):
+    return f"{p.w:g}×{p.h:g}"
+
+
+def pages(sheets, per_page=SHEETS_PER_PAGE):
+    return [sheets[i:i + per_page] for i in range(0, len(sheets), per_page)]
+
+
+def render_png(sheets, title="CutMaster Pro", first_index=0, cols=COLUMNS, dpi=110, cell=4.0):
+    from matplotlib.collections import PatchCollection
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Rectangle
+
+    cols = min(cols, len(sheets))
+    rows = math.ceil(len(sheets) / cols)
+    fig = Figure(figsize=(cell * cols, cell * rows + 0.4))
+    FigureCanvasAgg(fig)
+
+    for idx, sheet in enumerate(sheets):
+        ax = fig.add_subplot(rows, cols, idx + 1)
+        ax.add_patch(Rectangle((0, 0), sheet.width, sheet.height, fill=False,
+                               edgecolor=SHEET_COLOR, linewidth=2, alpha=0.7))
+
+        rects = [Rectangle((p.x, p.y), p.w, p.h) for p in sheet.placements]
+        colors = [ROTATED_COLOR if p.rotated else PART_COLOR for p in sheet.placements]
+        ax.add_collection(PatchCollection(rects, facecolors=colors, edgecolors="white",
+                                          linewidths=1, alpha=0.85))
+
+        # متن فقط روی قطعاتی که به اندازه کافی بزرگ‌اند
+        min_side = max(sheet.width, sheet.height) / 12
+        for p in sheet.placements:
+            if min(p.w, p.h) >= min_side:
+                ax.text(p.x + p.w / 2, p.y + p.h / 2, _label(p), ha="center", va="center",
+                        color="white", fontweight="bold", fontsize=7,
+                        rotation=90 if p.h > p.w * 1.5 else 0)
+
+        ax.set_xlim(0, sheet.width * 1.02)
+        ax.set_ylim(0, sheet.height * 1.02)
+        ax.set_aspect("equal")
+        ax.set_title(f"#{first_index + idx + 1}  {sheet.utilisation * 100:.0f}%", fontsize=10)
+        ax.axis("off")
+
+    if title:
+        fig.suptitle(title, fontsize=12, fontweight="bold")
+    fig.tight_layout()
+
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi)
+    buf.seek(0)
+    return buf
+
+
+def render_png_pages(sheets, title="CutMaster Pro", per_page=SHEETS_PER_PAGE, **kwargs):
+    out = []
+    for n, page in enumerate(pages(sheets, per_page)):
+        page_title = title if len(sheets) <= per_page else f"{title}  ({n + 1})"
+        out.append(render_png(page, page_title, first_index=n * per_page, **kwargs))
+    return out
+
+
+def render_svg(sheets, title="CutMaster Pro", cols=COLUMNS, cell=300, gap=20):
+    cols = max(1, min(cols, len(sheets)))
+    rows = math.ceil(len(sheets) / cols) if sheets else 0
+    head = 30 if title else 0
+    width = cols * (cell + gap) + gap
+    height = rows * (cell + gap + 16) + gap + head
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'font-family="sans-serif">']
+    if title:
+        out.append(f'<text x="{width / 2}" y="22" text-anchor="middle" font-size="16" '
+                   f'font-weight="bold">{escape(title)}</text>')
+
+    for idx, sheet in enumerate(sheets):
+        scale = cell / max(sheet.width, sheet.height)
+        ox = gap + (idx % cols) * (cell + gap)
+        oy = head + gap + (idx // cols) * (cell + gap + 16)
+        sh = sheet.height * scale
+        out.append(f'<text x="{ox}" y="{oy + 12}" font-size="12">'
+                   f'#{idx + 1}  {sheet.utilisation * 100:.0f}%</text>')
+        # محور y رو به بالا مثل نقشه PNG
+        out.append(f'<g transform="translate({ox},{oy + 16 + sh}) scale({scale:.5f},{-scale:.5f})">')
+        out.append(f'<rect width="{sheet.width:g}" height="{sheet.height:g}" fill="none" '
+                   f'stroke="{SHEET_COLOR}" stroke-width="{2 / scale:.3f}"/>')
+        for p in sheet.placements:
+            color = ROTATED_COLOR if p.rotated else PART_COLOR
+            out.append(f'<rect x="{p.x:g}" y="{p.y:g}" width="{p.w:g}" height="{p.h:g}" '
+                       f'fill="{color}" stroke="white" stroke-width="{1 / scale:.3f}"/>')
+        out.append("</g>")
+        min_side = max(sheet.width, sheet.height) / 12
+        for p in sheet.placements:
+            if min(p.w, p.h) >= min_side:
+                cx = ox + (p.x + p.w / 2) * scale
+                cy = oy + 16 + sh - (p.y + p.h / 2) * scale
+                out.append(f'<text x="{cx:.1f}" y="{cy:.1f}" font-size="9" fill="white" '
+                           f'text-anchor="middle" dominant-baseline="middle">{_label(p)}</text>')
+    out.append("</svg>")
+    return "\n".join(out)
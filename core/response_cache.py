@@ -0,0 +1,159 @@
+"""
+کش پاسخ‌های HAgent
+
+- نرمال‌سازی متن فارسی (ی/ک عربی، نیم‌فاصله، اعراب، ارقام) برای تطابق دقیق
+- جستجوی شباهت (سه‌حرفی‌ها + Jaccard) روی ایندکس SQLite روی دیسک، اختیاری
+- انقضای ttl و حذف LRU، با آمار نرخ برخورد
+"""
+
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_CHAR_MAP = str.maketrans({
+    "\u064a": "\u06cc", "\u0649": "\u06cc", "\u0626": "\u06cc",  # ی عربی -> فارسی
+    "\u0643": "\u06a9",                                       # ک عربی -> فارسی
+    "\u0629": "\u0647", "\u06c0": "\u0647",                    # ة ۀ -> ه
+    "\u0623": "\u0627", "\u0625": "\u0627", "\u0622": "\u0627", "\u0671": "\u0627",
+    "\u0624": "\u0648",
+    "\u200c": " ",                                             # نیم‌فاصله
+    "\u200d": "", "\u200e": "", "\u200f": "", "\u0640": "",   # جهت‌نما و کشیده
+    **{chr(0x06F0 + i): str(i) for i in range(10)},             # ارقام فارسی
+    **{chr(0x0660 + i): str(i) for i in range(10)},             # ارقام عربی
+})
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670]")
+_PUNCT = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalise(text):
+    text = unicodedata.normalize("NFKC", text or "").translate(_CHAR_MAP)
+    text = _DIACRITICS.sub("", text)
+    text = _PUNCT.sub(" ", text.lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def trigrams(norm):
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ResponseCache:
+    def __init__(self, max_size=2000, ttl=7 * 24 * 3600, path=None, similarity=0.85):
+        """
+        path: فایل SQLite برای ماندگاری و جستجوی شباهت؛ None یعنی فقط تطابق دقیق در حافظه
+        similarity: حداقل شباهت Jaccard سه‌حرفی‌ها برای برخورد تقریبی (0 = غیرفعال)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity if path else 0
+        self._items = OrderedDict()   # key -> (expires, response)
+        self._grams = {}              # key -> set سه‌حرفی‌ها
+        self._index = {}              # سه‌حرفی -> set کلیدها
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+            rows = self._db.execute(
+                "SELECT key, response, expires FROM responses ORDER BY expires DESC LIMIT ?",
+                (max_size,),
+            ).fetchall()
+            for key, response, expires in reversed(rows):
+                self._insert(key, response, expires)
+
+    # --- ایندکس داخلی (فراخوانی زیر قفل) ---
+
+    def _insert(self, key, response, expires):
+        if key in self._items:
+            self._items.move_to_end(key)
+        elif self.similarity:
+            grams = trigrams(key)
+            self._grams[key] = grams
+            for g in grams:
+                self._index.setdefault(g, set()).add(key)
+        self._items[key] = (expires, response)
+        while len(self._items) > self.max_size:
+            self._remove(next(iter(self._items)))
+
+    def _remove(self, key):
+        self._items.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+        for g in self._grams.pop(key, ()):
+            keys = self._index.get(g)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[g]
+
+    def _similar(self, key):
+        grams = trigrams(key)
+        counts = {}
+        for g in grams:
+            for k in self._index.get(g, ()):
+                counts[k] = counts.get(k, 0) + 1
+        best, best_score = None, self.similarity
+        for k, shared in counts.items():
+            score = shared / (len(grams) + len(self._grams[k]) - shared)
+            if score >= best_score:
+                best, best_score = k, score
+        return best
+
+    # --- API ---
+
+    def get(self, text):
+        key = normalise(text)
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] < now:
+                self._remove(key)
+                item = None
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if self.similarity and key:
+                similar = self._similar(key)
+                if similar is not None and self._items[similar][0] >= now:
+                    self._items.move_to_end(similar)
+                    self.similar_hits += 1
+                    return self._items[similar][1]
+            self.misses += 1
+            return None
+
+    def put(self, text, response):
+        key = normalise(text)
+        if not key:
+            return
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._insert(key, response, expires)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, expires) VALUES (?, ?, ?)",
+                    (key, response, expires),
+                )
+
+    def stats(self):
+        total = self.hits + self.similar_hits + self.misses
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.similar_hits) / total if total else 0.0,
+        }
@@ -0,0 +1,124 @@
+"""
+ذخیره وضعیت گفتگو (مرحله ویزارد + داده‌های کاربر)
+
+- MemorySessionStore: LRU در حافظه برای اجرای تک‌پردازه‌ای
+- SqliteSessionStore: فایل SQLite مشترک بین workerهای گونیکورن
+
+هر دو جلسه‌های رها شده را بعد از ttl ثانیه حذف می‌کنند و داده را به صورت JSON فشرده نگه می‌دارند.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 24 * 3600
+
+
+class Session:
+    __slots__ = ("cid", "state", "data")
+
+    def __init__(self, cid, state=None, data=None):
+        self.cid = cid
+        self.state = state
+        self.data = data if data is not None else {}
+
+    def reset(self, state=None, data=None):
+        self.state = state
+        self.data = data if data is not None else {}
+
+
+def dumps(session):
+    return json.dumps([session.state, session.data], ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(cid, raw):
+    state, data = json.loads(raw)
+    return Session(cid, state, data)
+
+
+class MemorySessionStore:
+    def __init__(self, max_size=10000, ttl=DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()  # cid -> (expires, raw)
+        self._lock = threading.Lock()
+
+    def load(self, cid):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(cid)
+            if item is None or item[0] < now:
+                self._items.pop(cid, None)
+                return Session(cid)
+            self._items.move_to_end(cid)
+            return loads(cid, item[1])
+
+    def save(self, session):
+        if session.state is None and not session.data:
+            self.clear(session.cid)
+            return
+        with self._lock:
+            self._items[session.cid] = (time.time() + self.ttl, dumps(session))
+            self._items.move_to_end(session.cid)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self, cid):
+        with self._lock:
+            self._items.pop(cid, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SqliteSessionStore:
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "cid INTEGER PRIMARY KEY, expires REAL NOT NULL, raw TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+
+    def load(self, cid):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT raw FROM sessions WHERE cid = ? AND expires >= ?", (cid, time.time())
+            ).fetchone()
+        return loads(cid, row[0]) if row else Session(cid)
+
+    def save(self, session):
+        if session.state is None and not session.data:
+            self.clear(session.cid)
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (cid, expires, raw) VALUES (?, ?, ?)",
+                (session.cid, now + self.ttl, dumps(session)),
+            )
+            if now - self._last_evict > 60:
+                self._db.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+                self._last_evict = now
+
+    def clear(self, cid):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE cid = ?", (cid,))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def open_store(url=None, ttl=DEFAULT_TTL):
+    # "" یا "memory" -> حافظه، در غیر این صورت مسیر فایل SQLite
+    if not url or url == "memory":
+        return MemorySessionStore(ttl=ttl)
+    return SqliteSessionStore(url, ttl=ttl)
@@ -0,0 +1,162 @@
+"""
+سرویس حل موازی نقشه برش روی چند هسته
+
+هندلر بات فقط کار را ثبت می‌کند و بلافاصله برمی‌گردد؛ نتیجه با callback تحویل داده می‌شود.
+در حالت «بهینه‌تر» چند جستجوی مستقل با seed متفاوت هم‌زمان اجرا و بهترین بازده انتخاب می‌شود.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from core.job import JobResult, solve_material
+from core.optimizer import OptimiseResult, energy, lower_bound, optimise
+from core.packing import NO_CONSTRAINTS, SORT_KEYS, pack
+
+log = logging.getLogger(__name__)
+
+
+# توابع سطح ماژول تا در پردازه‌های فرزند قابل pickle باشند
+def _run_pack(parts, stock_w, stock_h, constraints):
+    return pack(parts, stock_w, stock_h, constraints=constraints)
+
+
+def _warm_pack(parts, stock_w, stock_h, constraints, start, add):
+    # ادامه نقشه قبلی start با قطعات add (بزرگ‌ترها اول)
+    key = SORT_KEYS["area"]
+    order = sorted(add, key=lambda i: key(parts[i]), reverse=True)
+    warm = pack(parts, stock_w, stock_h, constraints=constraints, order=order, start=start)
+    warm.heuristic = "warm-start"
+    return warm
+
+
+def _run_optimise(parts, stock_w, stock_h, constraints, budget, seed, warm=None):
+    # warm: (start, add)؛ نقشه شروع گرم بذر تبرید است
+    start = _warm_pack(parts, stock_w, stock_h, constraints, *warm) if warm else None
+    return optimise(parts, stock_w, stock_h, constraints=constraints,
+                    budget=budget, seed=seed, start=start)
+
+
+def _run_warm(parts, stock_w, stock_h, constraints, start, add):
+    # شروع گرم از نقشه قبلی؛ اگر چیدمان تازه بهتر باشد همان برگردانده می‌شود
+    warm = _warm_pack(parts, stock_w, stock_h, constraints, start, add)
+    if not warm.unplaced and warm.sheet_count <= lower_bound(parts, stock_w, stock_h, constraints):
+        return warm   # به حد پایین رسیده؛ چیدمان تازه بهتر نمی‌شود
+    fresh = pack(parts, stock_w, stock_h, constraints=constraints)
+    return min((warm, fresh), key=lambda r: r.score())
+
+
+def _run_material(material):
+    return solve_material(material)
+
+
+def merge(runs):
+    # ادغام نتایج جستجوهای مستقل: بهترین بازده + روند بهبود سراسری
+    best = min(runs, key=lambda r: energy(r.best))
+    history = []
+    top = None
+    for t, sheets, waste in sorted(h for r in runs for h in r.history):
+        if top is None or (sheets, waste) < top:
+            top = (sheets, waste)
+            history.append((t, sheets, waste))
+    return OptimiseResult(
+        best=best.best,
+        history=history,
+        iterations=sum(r.iterations for r in runs),
+        elapsed=max(r.elapsed for r in runs),
+        lower_bound=best.lower_bound,
+    )
+
+
+class SolverPool:
+    def __init__(self, workers=None):
+        # workers=0 یعنی اجرا در همین پردازه (برای دیباگ یا محیط‌های بدون fork)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # ساخت تنبل: پردازه‌ها بعد از fork شدن worker گونیکورن ساخته می‌شوند
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _call(self, fn, *args):
+        if self.workers == 0:
+            f = Future()
+            try:
+                f.set_result(fn(*args))
+            except Exception as e:
+                f.set_exception(e)
+            return f
+        return self.executor.submit(fn, *args)
+
+    def submit(self, parts, stock_w, stock_h, constraints=NO_CONSTRAINTS, budget=0, warm=None):
+        """
+        budget=0: یک بار چیدمان سریع، نتیجه PackResult
+        budget>0: جستجوی موازی با بودجه زمانی، نتیجه OptimiseResult
+        warm: (start, add) از PlanCache.nearest؛ با budget بذر همه جستجوها، بدون آن submit_warm
+        """
+        if warm is not None and not budget:
+            return self.submit_warm(parts, stock_w, stock_h, constraints, *warm)
+        if not budget:
+            return self._call(_run_pack, parts, stock_w, stock_h, constraints)
+
+        runs = max(1, self.workers)
+        futures = [self._call(_run_optimise, parts, stock_w, stock_h, constraints, budget, seed, warm)
+                   for seed in range(runs)]
+
+        def combine(done):
+            results = [f.result() for f in done if f.exception() is None]
+            if not results:
+                raise done[0].exception()
+            return merge(results)
+
+        return self._gather(futures, combine)
+
+    def submit_warm(self, parts, stock_w, stock_h, constraints, start, add):
+        """ادامه چیدمان start با قطعات add (اندیس در parts)، نتیجه PackResult"""
+        return self._call(_run_warm, parts, stock_w, stock_h, constraints, start, add)
+
+    def submit_job(self, job):
+        """سفارش چند متریالی: هر متریال هم‌زمان در یک پردازه، نتیجه JobResult"""
+        t0 = time.perf_counter()
+        futures = [self._call(_run_material, m) for m in job.materials]
+        return self._gather(futures, lambda done: JobResult(
+            [f.result() for f in done], time.perf_counter() - t0))
+
+    def _gather(self, futures, combine):
+        # یک Future که بعد از تمام شدن همه futures با combine(futures) کامل می‌شود
+        combined = Future()
+        pending = [len(futures)]
+        lock = threading.Lock()
+
+        def finish():
+            try:
+                combined.set_result(combine(futures))
+            except Exception as e:
+                combined.set_exception(e)
+
+        def on_done(_):
+            with lock:
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            finish()
+
+        if not futures:
+            # هیچ callbackی اجرا نمی‌شود (مثلاً سفارش بدون متریال)
+            finish()
+        for f in futures:
+            f.add_done_callback(on_done)
+        return combined
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
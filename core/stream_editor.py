@@ -0,0 +1,81 @@
+"""
+نمایش تدریجی پاسخ هوش مصنوعی با ویرایش یک پیام تلگرام
+
+اولین تکه فوراً ارسال می‌شود؛ تکه‌های بعدی جمع می‌شوند و حداکثر هر min_interval ثانیه
+یک ویرایش انجام می‌شود تا از محدودیت ویرایش تلگرام عبور نکنیم.
+ویرایش‌های میانی بدون Markdown هستند (متن نیمه‌کاره ممکن است قالب ناقص داشته باشد)
+و فقط ویرایش نهایی با Markdown ارسال می‌شود.
+"""
+
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+TELEGRAM_TEXT_LIMIT = 4096
+CURSOR = " ▌"
+
+
+class StreamingMessage:
+    def __init__(self, bot, cid, min_interval=1.0, min_chars=20, parse_mode="Markdown"):
+        self.bot = bot
+        self.cid = cid
+        self.min_interval = min_interval
+        self.min_chars = min_chars
+        self.parse_mode = parse_mode
+        self.text = ""
+        self.message_id = None
+        self.edits = 0
+        self._shown = ""
+        self._last_edit = 0.0
+
+    def feed(self, chunk):
+        self.text += chunk
+        # پیام طولانی‌تر از سقف تلگرام: پیام فعلی بسته و پیام جدید شروع می‌شود
+        limit = TELEGRAM_TEXT_LIMIT - len(CURSOR)
+        while len(self.text) > limit:
+            cut = self.text.rfind("\n", 0, limit)
+            cut = cut if cut > 0 else limit
+            head, self.text = self.text[:cut], self.text[cut:].lstrip("\n")
+            self._flush(head, final=True)
+            self.message_id = None
+            self._shown = ""
+        now = time.monotonic()
+        if self.message_id is None:
+            if self.text.strip():
+                self._flush(self.text + CURSOR)
+        elif now - self._last_edit >= self.min_interval and \
+                len(self.text) - len(self._shown) >= self.min_chars:
+            self._flush(self.text + CURSOR)
+
+    def finish(self):
+        if self.text.strip():
+            self._flush(self.text, final=True)
+
+    def _flush(self, text, final=False):
+        mode = self.parse_mode if final else None
+        try:
+            if self.message_id is None:
+                msg = self.bot.send_message(self.cid, text, parse_mode=mode)
+                self.message_id = msg.message_id
+            elif text != self._shown:
+                self.bot.edit_message_text(text, self.cid, self.message_id, parse_mode=mode)
+                self.edits += 1
+        except Exception as e:
+            if not final or mode is None:
+                log.warning(f"Stream edit failed for {self.cid}: {e}")
+                return
+            # Markdown نامعتبر: ارسال متن ساده
+            self.parse_mode = None
+            self._flush(text, final=True)
+            return
+        self._shown = text
+        self._last_edit = time.monotonic()
+
+
+def stream_to_chat(bot, cid, chunks, **kwargs):
+    message = StreamingMessage(bot, cid, **kwargs)
+    for chunk in chunks:
+        message.feed(chunk)
+    message.finish()
+    return message
@@ -0,0 +1,138 @@
+"""
+ارسال دسته‌ای اعلان سفارش به WhatsApp Cloud API
+
+- صف همان OrderStore است (پایدار)؛ این نخ هر بار یک دسته برمی‌دارد و با نرخ محدود می‌فرستد
+- خطای شبکه، 429 و 5xx: تلاش دوباره با تأخیر نمایی؛ بقیه خطاهای 4xx دائمی (failed)
+- api_url قابل تنظیم است تا با یک سرور stub محلی تست شود
+- rate برای همین پردازه است؛ با چند worker گونیکورن نرخ واقعی workers × rate است،
+  پس بات سقف کل را بر تعداد workerها تقسیم می‌کند
+
+    dispatcher = WhatsAppDispatcher(orders, token, phone_id, to="989123456789")
+    dispatcher.start()
+    dispatcher.notify()  # بعد از ثبت سفارش، بدون انتظار برای دور بعدی
+"""
+
+import logging
+import threading
+import time
+
+import requests
+
+log = logging.getLogger(__name__)
+
+GRAPH_API_URL = "https://graph.facebook.com/v19.0"
+RETRY_BASE = 5.0       # ثانیه؛ تأخیر تلاش n ام: RETRY_BASE * 2**(n-1)
+RETRY_MAX = 3600.0
+
+
+class RetryableError(Exception):
+    pass
+
+
+class WhatsAppDispatcher:
+    def __init__(self, store, token, phone_id, to, api_url=GRAPH_API_URL, batch=20, rate=10.0,
+                 max_attempts=8, interval=5.0, timeout=10.0):
+        """
+        to: شماره گیرنده (مدیر) به فرمت بین‌المللی بدون +
+        rate: حداکثر پیام در ثانیه؛ interval: فاصله بررسی صف وقتی خبری نیست
+        """
+        self.store = store
+        self.to = to
+        self.url = f"{api_url.rstrip('/')}/{phone_id}/messages"
+        self.batch = batch
+        self.rate = rate
+        self.max_attempts = max_attempts
+        self.interval = interval
+        self.timeout = timeout
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._session = requests.Session()
+        self._session.headers["Authorization"] = f"Bearer {token}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_send = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="whatsapp", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self):
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue   # دسته پر بود؛ بقیه صف بلافاصله
+            except Exception as e:
+                log.error(f"WhatsApp dispatch failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def run_once(self):
+        """یک دسته از صف؛ خروجی: آیا دسته پر بود (احتمالاً سفارش دیگری منتظر است)"""
+        orders = self.store.claim(self.batch)
+        for order in orders:
+            if self._stop.is_set():
+                # رزرو بعد از CLAIM_TTL خودکار آزاد می‌شود
+                break
+            self._throttle()
+            try:
+                message_id = self.send(order.text)
+            except RetryableError as e:
+                self._retry(order, e)
+            except Exception as e:
+                self.failed += 1
+                log.error(f"WhatsApp order {order.tracking} failed: {e}")
+                self.store.mark_failed(order.id, e)
+            else:
+                self.sent += 1
+                self.store.mark_sent(order.id, message_id)
+        return len(orders) == self.batch
+
+    def _throttle(self):
+        # فاصله ثابت بین پیام‌ها (rate پیام در ثانیه)
+        now = time.monotonic()
+        if self._next_send > now:
+            time.sleep(self._next_send - now)
+        self._next_send = max(now, self._next_send) + 1.0 / self.rate
+
+    def _retry(self, order, error):
+        attempt = order.attempts + 1
+        if attempt >= self.max_attempts:
+            self.failed += 1
+            log.error(f"WhatsApp order {order.tracking} gave up after {attempt} attempts: {error}")
+            self.store.mark_failed(order.id, error)
+            return
+        self.retried += 1
+        delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempt - 1))
+        log.warning(f"WhatsApp order {order.tracking} retry in {delay:.0f}s: {error}")
+        self.store.mark_failed(order.id, error, retry_at=time.time() + delay)
+
+    def send(self, text):
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": self.to,
+            "type": "text",
+            "text": {"preview_url": False, "body": text},
+        }
+        try:
+            resp = self._session.post(self.url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise RetryableError(str(e)) from e
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise RetryableError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+        if resp.status_code >= 400:
+            raise RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+        messages = resp.json().get("messages") or [{}]
+        return messages[0].get("id", "")
@@ -1,18 +1,40 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import io
+import functools
 import os
+import tempfile
+import time
 import logging
+import queue
+import threading
 from pathlib import Path
-from flask import Flask, request
-from telebot import TeleBot, types
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-import uuid
+from concurrent.futures import Future
+from flask import Flask, Response, request, jsonify
+from telebot import TeleBot, types, apihelper
 import requests
 
 # Import HAgent
-from core.h_agent import h_agent
+from core.h_agent import h_agent, get_client
+from core.packing import CutConstraints, PackResult
+from core.optimizer import OptimiseResult
+from core.solver_pool import SolverPool
+from core.job_queue import JobQueue, SeenIds, SqliteSeenIds
+from core.session_store import Session, open_store
+from core.stream_editor import stream_to_chat
+from core.async_transport import AsyncTransport, TELEGRAM_API_URL
+from core.renderer import render_png_pages
+from core.media_cache import MediaCache, ALBUM_LIMIT
+from core.catalog import Catalog, CATEGORIES
+from core.cutlist import parse_text, parse_csv, group, expand
+from core.job import Job, Material, load_job, load_inventory
+from core.remnants import RemnantStore
+from core.plan_cache import PlanCache, family, fingerprint
+from core import export
+from core.orders import OrderStore, normalize_phone
+from core.whatsapp import WhatsAppDispatcher, GRAPH_API_URL
+from core import metrics
 
 # Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
@@ -27,19 +49,143 @@ if not TELEGRAM_TOKEN:
     log.error("TELEGRAM_TOKEN missing!")
     raise ValueError("TELEGRAM_TOKEN required")
 
+# لایه انتقال async: درخواست‌های تلگرام و OpenAI روی استخر اتصال keep-alive مشترک
+if os.getenv("ASYNC_TRANSPORT", "1") == "1":
+    transport = AsyncTransport(TELEGRAM_TOKEN, api_url=os.getenv("TELEGRAM_API_URL", TELEGRAM_API_URL))
+    apihelper.API_URL = transport.api_url + "/bot{0}/{1}"
+    apihelper.CUSTOM_REQUEST_SENDER = transport.request_sender
+    h_agent.transport = transport
+else:
+    transport = None
+
 # Initialize
-bot = TeleBot(TELEGRAM_TOKEN)
+# threaded=False: ترتیب و هم‌زمانی پردازش را صف کار خودمان کنترل می‌کند
+bot = TeleBot(TELEGRAM_TOKEN, threaded=False)
+solver = SolverPool(int(os.getenv("SOLVER_WORKERS", os.cpu_count() or 1)))
+
+# صف پس‌زمینه؛ با JOB_DEDUP_DB حذف update تکراری بین workerهای گونیکورن هم مشترک می‌شود
+JOB_DEDUP_DB = os.getenv("JOB_DEDUP_DB", "")
+# JOB_QUEUE_SIZE: سقف update منتظر در صف هر worker؛ بیشتر از آن به کاربر «شلوغ است» گفته می‌شود
+jobs = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", "8")),
+    seen=SqliteSeenIds(JOB_DEDUP_DB) if JOB_DEDUP_DB else SeenIds(),
+    maxsize=int(os.getenv("JOB_QUEUE_SIZE", "200")),
+)
 
-user_state = {}
-user_data = {}  # برای ذخیره ورق و قطعات
+# وضعیت گفتگو؛ با SESSION_STORE=مسیر فایل SQLite بین workerهای گونیکورن مشترک می‌شود
+sessions = open_store(os.getenv("SESSION_STORE", ""), ttl=int(os.getenv("SESSION_TTL", "86400")))
 
 IMG_PATH = Path("images")
 IMG_PATH.mkdir(exist_ok=True)  # ایجاد پوشه اگر وجود ندارد
 
+# file_id عکس‌های آپلود شده؛ هر عکس فقط یک بار آپلود می‌شود
+media = MediaCache(os.getenv("MEDIA_INDEX", str(IMG_PATH / ".file_ids.json")))
+
+# ایندکس نمونه کارها و بندانگشتی‌ها (در warm-up همگام‌سازی می‌شود)
+catalog = Catalog(IMG_PATH)
+
+# انبار ورق‌های باقیمانده؛ REMNANT_DB خالی یعنی غیرفعال
+REMNANT_DB = os.getenv("REMNANT_DB", "remnants.db")
+REMNANT_MAX_AGE = int(os.getenv("REMNANT_MAX_AGE", str(90 * 86400)))  # باقیمانده قدیمی‌تر حذف می‌شود
+remnants = RemnantStore(REMNANT_DB) if REMNANT_DB else None
+
+# کش نقشه‌های برش و تصاویر آن‌ها (سفارش تکراری یا با تغییر جزئی)؛ PLAN_CACHE خالی یعنی غیرفعال
+PLAN_CACHE = os.getenv("PLAN_CACHE", "plan_cache.db")
+plan_cache = PlanCache(PLAN_CACHE, max_bytes=int(os.getenv("PLAN_CACHE_MB", "200")) << 20) \
+    if PLAN_CACHE else None
+
+# متریک‌ها (/metrics)؛ مقادیر شمارنده‌های موجود فقط هنگام scrape خوانده می‌شوند
+HANDLER_SECONDS = metrics.histogram("bot_handler_seconds", "Telegram handler latency",
+                                    ("handler", "state"))
+CUT_PHASE_SECONDS = metrics.histogram("cut_plan_phase_seconds", "Cut plan latency by phase",
+                                      ("phase",), buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 30, 60))
+metrics.gauge("job_queue_depth", "Updates waiting in the job queue", fn=lambda: jobs.depth)
+metrics.counter("job_queue_jobs_total", "Background jobs by outcome", ("result",),
+                fn=lambda: {"processed": jobs.processed, "duplicate": jobs.duplicates,
+                            "failed": jobs.failed, "rejected": jobs.rejected})
+metrics.counter("ai_cache_requests_total", "AI response cache lookups", ("result",),
+                fn=lambda: {"hit": h_agent.cache.hits, "similar": h_agent.cache.similar_hits,
+                            "miss": h_agent.cache.misses})
+metrics.gauge("ai_cache_hit_ratio", "AI response cache hit ratio",
+              fn=lambda: h_agent.cache.stats()["hit_rate"])
+if h_agent.limiter:
+    metrics.gauge("ai_inflight_requests", "OpenAI calls in flight", fn=lambda: h_agent.limiter.inflight)
+    metrics.gauge("ai_load", "AI chat load used for degradation (0-1)", fn=h_agent.limiter.load)
+metrics.counter("media_cache_sends_total", "Photo sends by file_id reuse", ("result",),
+                fn=lambda: {"reused": media.reused, "uploaded": media.uploads})
+if plan_cache:
+    metrics.counter("plan_cache_requests_total", "Cut plan cache lookups", ("result",),
+                    fn=lambda: {"hit": plan_cache.hits, "warm": plan_cache.warm_hits,
+                                "miss": plan_cache.misses})
+if remnants:
+    metrics.gauge("remnants_stored", "Offcuts in the remnant store", fn=remnants.count)
+
+def timed(handler):
+    # اندازه‌گیری زمان هندلرهای ساده (بدون state)
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with HANDLER_SECONDS.time(handler=handler, state=""):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
 # اطلاعات تماس
 ADMIN_TELEGRAM_LINK = "https://t.me/hossein_torabparvar"
 ADMIN_PHONE = "09123456789"  # شماره واقعی خودت
 ADMIN_WHATSAPP = f"https://wa.me/{ADMIN_PHONE[1:]}"
+# کارکنانی که با /order سفارش‌ها را جستجو می‌کنند (شناسه چت، جدا با کاما)
+ADMIN_CHAT_IDS = {int(c) for c in os.getenv("ADMIN_CHAT_IDS", "").split(",") if c.strip()}
+
+# سفارش‌ها؛ اعلان واتساپ مدیر از صف همین انبار، فقط وقتی توکن Cloud API تنظیم شده باشد
+# هر worker گونیکورن dispatcher خودش را دارد؛ WHATSAPP_RATE (پیام در ثانیه) سقف کل است و
+# بین workerها (WEB_CONCURRENCY، همان متغیری که گونیکورن برای تعداد worker می‌خواند) تقسیم می‌شود
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+orders = OrderStore(os.getenv("ORDER_DB", "orders.db"))
+whatsapp = WhatsAppDispatcher(
+    orders, WHATSAPP_TOKEN, WHATSAPP_PHONE_ID,
+    to=os.getenv("WHATSAPP_TO", "98" + normalize_phone(ADMIN_PHONE)[1:]),
+    api_url=os.getenv("WHATSAPP_API_URL", GRAPH_API_URL),
+    rate=float(os.getenv("WHATSAPP_RATE", "10")) / WEB_WORKERS,
+).start() if WHATSAPP_TOKEN and WHATSAPP_PHONE_ID else None
+metrics.gauge("orders_pending", "Orders waiting for WhatsApp dispatch", fn=orders.depth)
+if whatsapp:
+    metrics.counter("whatsapp_messages_total", "WhatsApp order notifications by outcome", ("result",),
+                    fn=lambda: {"sent": whatsapp.sent, "retried": whatsapp.retried,
+                                "failed": whatsapp.failed})
+
+# تنظیمات برش (سانتی‌متر)
+CUT_KERF = float(os.getenv("CUT_KERF", "0.4"))  # ضخامت تیغ اره
+CUT_TRIM = float(os.getenv("CUT_TRIM", "1.0"))  # دوربری لبه ورق
+GRAIN_MARKS = ("ر", "g")  # علامت رگه‌دار بعد از ابعاد، مثال: 100x50 ر
+OPTIMISE_BUDGET = float(os.getenv("OPTIMISE_BUDGET", "2.0"))  # ثانیه برای حالت «بهینه‌تر»
+CUT_MAX_PARTS = int(os.getenv("CUT_MAX_PARTS", "2000"))  # سقف تعداد کل قطعات یک سفارش
+CUT_MAX_FILE = 1 << 20  # حداکثر حجم فایل CSV لیست برش
+STOCK_INVENTORY = os.getenv("STOCK_INVENTORY", "")  # JSON موجودی ورق هر متریال برای سفارش‌های چند متریالی
+# فایل‌های همراه نقشه برش: saw (ترتیب برش)، csv، pdf (برچسب)، dxf، gcode
+CUT_EXPORTS = [f for f in os.getenv("CUT_EXPORTS", "saw,csv,pdf").split(",") if f in export.EXPORTERS]
+# G-code پیش‌فرض ندارد: قطر ابزار (سانتی‌متر) و عمق برش (میلی‌متر؛ در سفارش چند متریالی ضخامت متریال)
+CNC_TOOL = float(os.getenv("CNC_TOOL", "0"))
+CNC_DEPTH = float(os.getenv("CNC_DEPTH", "0"))
+if "gcode" in CUT_EXPORTS and CNC_TOOL <= 0:
+    log.warning("CUT_EXPORTS has gcode but CNC_TOOL is not set; G-code export disabled")
+    CUT_EXPORTS.remove("gcode")
+# متریال ورق (کلید انبار باقیمانده‌ها) وقتی کاربر بعد از ابعاد ورق نامی ننوشته باشد
+CUT_MATERIAL = os.getenv("CUT_MATERIAL", "MDF 16")
+if remnants:
+    remnants.resolution = CUT_KERF  # ابعاد باقیمانده به دقت تیغ
+
+# نمایش تدریجی پاسخ هوش مصنوعی (فاصله حداقل بین ویرایش‌های پیام)
+AI_STREAMING = os.getenv("AI_STREAMING", "1") == "1"
+AI_EDIT_INTERVAL = float(os.getenv("AI_EDIT_INTERVAL", "1.0"))
+
+def parse_size(text):
+    # "100x50" یا "183x366 MDF 16 ر" -> (100.0, 50.0, رگه‌دار؟, نام متریال یا "")
+    tokens = text.strip().split()
+    grain = len(tokens) > 1 and tokens[-1].lower() in GRAIN_MARKS
+    w, h = map(float, tokens[0].lower().replace('×', 'x').replace('*', 'x').split('x'))
+    material = " ".join(tokens[1:-1] if grain else tokens[1:])
+    return w, h, grain, material
 
 # منو اصلی
 def main_menu():
@@ -63,15 +209,12 @@ def start(msg):
 
 # دکمه نمونه کارها
 @bot.message_handler(func=lambda m: m.text == "🖼️ نمونه کارها")
+@timed("gallery")
 def gallery(msg):
     cid = msg.chat.id
     
-    # بررسی وجود عکس‌ها
-    image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG']
-    image_files = []
-    
-    for ext in image_extensions:
-        image_files.extend(list(IMG_PATH.glob(ext)))
+    # بررسی وجود عکس‌ها (فهرست فقط با تغییر پوشه دوباره خوانده می‌شود)
+    image_files = media.list_images(IMG_PATH)
     
     if not image_files:
         bot.send_message(cid, 
@@ -81,14 +224,11 @@ def gallery(msg):
             parse_mode="Markdown"
         )
     else:
-        # ارسال ۳ عکس اول
-        for i, img_path in enumerate(image_files[:3]):
-            try:
-                with open(img_path, 'rb') as photo:
-                    caption = f"🖼️ نمونه کار {i+1} - کارگاه حسین تراب‌پرور" if i == 0 else None
-                    bot.send_photo(cid, photo, caption=caption)
-            except Exception as e:
-                log.error(f"Error sending photo: {e}")
+        # ارسال ۳ عکس اول در یک آلبوم، با file_id کش شده
+        try:
+            media.send_album(bot, cid, image_files[:3], caption="🖼️ نمونه کارهای کارگاه حسین تراب‌پرور")
+        except Exception as e:
+            log.error(f"Error sending photo: {e}")
     
     # دکمه‌های دسته‌بندی
     kb = types.InlineKeyboardMarkup(row_width=2)
@@ -165,8 +305,7 @@ def about(msg):
     about_image = IMG_PATH / "about.jpg"
     if about_image.exists():
         try:
-            with open(about_image, 'rb') as photo:
-                bot.send_photo(cid, photo, caption=about_text, parse_mode="Markdown")
+            media.send_photo(bot, cid, about_image, caption=about_text, parse_mode="Markdown")
         except:
             bot.send_message(cid, about_text, parse_mode="Markdown")
     else:
@@ -181,8 +320,7 @@ def about(msg):
 @bot.message_handler(func=lambda m: m.text == "📦 ثبت سفارش")
 def order_start(msg):
     cid = msg.chat.id
-    user_state[cid] = "order_name"
-    user_data[cid] = {}
+    sessions.save(Session(cid, "order_name", {}))
     
     bot.send_message(cid, 
         "📝 **ثبت سفارش جدید**\n\n"
@@ -195,7 +333,10 @@ def order_start(msg):
 @bot.message_handler(func=lambda m: m.text == "🤖 چت با حسین (هوش مصنوعی)")
 def start_ai_chat(msg):
     cid = msg.chat.id
-    user_state[cid] = "ai_chat"
+    session = sessions.load(cid)
+    session.state = "ai_chat"
+    sessions.save(session)
+    h_agent.memory.clear(cid)  # گفتگوی جدید
     
     welcome_msg = (
         "🤖 **چت با حسین تراب‌پرور (نسخه هوش مصنوعی)**\n\n"
@@ -218,8 +359,7 @@ def start_ai_chat(msg):
 @bot.message_handler(func=lambda m: m.text == "✂️ برش بهینه")
 def cut_start(msg):
     cid = msg.chat.id
-    user_state[cid] = "cut_stock"
-    user_data[cid] = {"parts": []}
+    sessions.save(Session(cid, "cut_stock", {"items": []}))
     
     bot.send_message(cid,
         "✂️ **برش بهینه حرفه‌ای**\n\n"
@@ -228,24 +368,64 @@ def cut_start(msg):
         "✅ چیدمان هوشمند قطعات\n"
         "✅ امکان چرخش ۹۰ درجه\n"
         "✅ گزارش کامل متریال\n\n"
+        f"✅ ضخامت تیغ {CUT_KERF} و دوربری {CUT_TRIM} سانتی‌متر\n\n"
         "**لطفاً ابعاد ورق اصلی را وارد کنید (سانتی‌متر):**\n"
-        "📏 مثال: `183x366`",
+        "📏 مثال: `183x366`\n"
+        "🏷️ با نام متریال (برای استفاده از باقیمانده‌ها): `183x366 MDF 16`\n"
+        "🌲 ورق نما چوب (بدون چرخش قطعات): `183x366 ر`",
         parse_mode="Markdown"
     )
 
+# جستجوی سفارش برای کارکنان: /order شماره‌پیگیری | تلفن | تاریخ (YYYY-MM-DD)
+@bot.message_handler(commands=["order"])
+@timed("order_lookup")
+def order_lookup(msg):
+    cid = msg.chat.id
+    if cid not in ADMIN_CHAT_IDS:
+        bot.send_message(cid, "لطفاً از منوی زیر انتخاب کنید 👇", reply_markup=main_menu())
+        return
+    query = msg.text.partition(" ")[2].strip()
+    if not query:
+        bot.send_message(cid, "مثال: /order K7M2PQ9X یا /order 09121234567 یا /order 2024-05-01")
+        return
+    if len(query) == 10 and query[4] == "-" and query[7] == "-":
+        try:
+            day = time.mktime(time.strptime(query, "%Y-%m-%d"))
+        except ValueError:
+            bot.send_message(cid, "❌ تاریخ نامعتبر")
+            return
+        found = orders.between(day, day + 86400)
+    else:
+        order = orders.get(query)
+        found = [order] if order else orders.by_phone(query)
+    if not found:
+        bot.send_message(cid, "سفارشی پیدا نشد")
+        return
+    for first in range(0, min(len(found), 30), 10):
+        bot.send_message(cid, "\n\n".join(f"{o.text}\nوضعیت: {o.status}" for o in found[first:first + 10]))
+
 # هندلر اصلی پیام‌ها
 @bot.message_handler(func=lambda m: True)
 def general_handler(msg):
+    t0 = time.perf_counter()
+    session = sessions.load(msg.chat.id)
+    state = session.state or "none"
+    try:
+        handle_message(msg, session)
+    finally:
+        sessions.save(session)
+        HANDLER_SECONDS.observe(time.perf_counter() - t0, handler="message", state=state)
+
+def handle_message(msg, session):
     cid = msg.chat.id
-    state = user_state.get(cid)
+    state = session.state
+    data = session.data
     text = msg.text
     
     # بازگشت به منو
     if text == "/menu":
         bot.send_message(cid, "منوی اصلی:", reply_markup=main_menu())
-        user_state.pop(cid, None)
-        if cid in user_data:
-            del user_data[cid]
+        session.reset()
         return
     
     # چت با هوش مصنوعی
@@ -253,8 +433,13 @@ def general_handler(msg):
         # نشان دادن تایپ کردن
         bot.send_chat_action(cid, 'typing')
         
+        # پاسخ تدریجی: یک پیام با رسیدن تکه‌ها ویرایش می‌شود
+        if AI_STREAMING:
+            stream_to_chat(bot, cid, h_agent.stream_response(text, cid), min_interval=AI_EDIT_INTERVAL)
+            return
+        
         # استفاده از HAgent برای پاسخ
-        response = h_agent.generate_response(text)
+        response = h_agent.generate_response(text, cid)
         
         # ارسال پاسخ
         bot.send_message(cid, response, parse_mode="Markdown")
@@ -262,14 +447,14 @@ def general_handler(msg):
     
     # ثبت سفارش - مرحله ۱: نام
     elif state == "order_name":
-        user_data[cid]["name"] = text
-        user_state[cid] = "order_phone"
+        data["name"] = text
+        session.state = "order_phone"
         bot.send_message(cid, "✅ نام ثبت شد.\n\n📱 لطفاً **شماره تلفن** خود را وارد کنید:")
     
     # ثبت سفارش - مرحله ۲: تلفن
     elif state == "order_phone":
-        user_data[cid]["phone"] = text
-        user_state[cid] = "order_details"
+        data["phone"] = text
+        session.state = "order_details"
         bot.send_message(cid, 
             "✅ شماره تلفن ثبت شد.\n\n"
             "📝 **توضیحات سفارش را وارد کنید:**\n"
@@ -282,15 +467,15 @@ def general_handler(msg):
     
     # ثبت سفارش - مرحله ۳: جزئیات
     elif state == "order_details":
-        user_data[cid]["details"] = text
-        user_state[cid] = "order_confirm"
+        data["details"] = text
+        session.state = "order_confirm"
         
         # نمایش خلاصه سفارش
         summary = (
             f"📋 **خلاصه سفارش:**\n\n"
-            f"👤 **نام:** {user_data[cid]['name']}\n"
-            f"📱 **تلفن:** {user_data[cid]['phone']}\n"
-            f"📝 **توضیحات:** {user_data[cid]['details']}\n\n"
+            f"👤 **نام:** {data['name']}\n"
+            f"📱 **تلفن:** {data['phone']}\n"
+            f"📝 **توضیحات:** {data['details']}\n\n"
             f"آیا اطلاعات صحیح است؟"
         )
         
@@ -302,12 +487,11 @@ def general_handler(msg):
     # تایید نهایی سفارش
     elif state == "order_confirm":
         if text == "✅ بله، ارسال کن":
-            send_to_whatsapp(cid)
-            user_state.pop(cid, None)
-            user_data.pop(cid, None)
+            send_to_whatsapp(cid, data)
+            session.reset()
             bot.send_message(cid, "منوی اصلی:", reply_markup=main_menu())
         elif text == "❌ نه، اصلاح کن":
-            user_state[cid] = "order_name"
+            session.state = "order_name"
             bot.send_message(cid, "لطفاً نام خود را مجدداً وارد کنید:")
         else:
             bot.send_message(cid, "لطفاً یکی از گزینه‌ها را انتخاب کنید.")
@@ -315,51 +499,113 @@ def general_handler(msg):
     # برش بهینه - مرحله ۱: ورق اصلی
     elif state == "cut_stock":
         try:
-            w, h = map(float, text.replace('×', 'x').split('x'))
-            user_data[cid]["stock"] = (w, h)
+            w, h, grain, material = parse_size(text)
+            data["stock"] = (w, h)
+            data["grain"] = grain
+            data["material"] = material or CUT_MATERIAL
             bot.send_message(cid, 
-                f"✅ ورق اصلی ثبت شد: {w}×{h} سانتی‌متر\n\n"
-                f"**حالا ابعاد قطعات را یکی یکی وارد کنید:**\n"
+                f"✅ ورق اصلی ثبت شد: {data['material']} {w}×{h} سانتی‌متر{' (رگه‌دار)' if grain else ''}\n\n"
+                f"**حالا ابعاد قطعات را وارد کنید:**\n"
                 f"📏 مثال: `100x50`\n"
-                f"✏️ وقتی تمام شد بنویسید: `تمام`",
+                f"🔢 چند عدد: `60x40 x12`\n"
+                f"🌲 قطعه با جهت رگه ثابت: `100x50 ر`\n"
+                f"📋 می‌توانید چند خط را یکجا بفرستید یا فایل CSV (عرض,ارتفاع,تعداد) آپلود کنید\n"
+                f"✏️ وقتی تمام شد بنویسید: `تمام`\n"
+                f"🚀 برای جستجوی عمیق‌تر (ورق کمتر) بنویسید: `بهینه`",
                 parse_mode="Markdown"
             )
-            user_state[cid] = "cut_parts"
+            session.state = "cut_parts"
         except:
             bot.send_message(cid, "❌ فرمت اشتباه!\nمثال صحیح: `183x366`", parse_mode="Markdown")
     
     # برش بهینه - مرحله ۲: قطعات
     elif state == "cut_parts":
         if text.lower() in ["تمام", "تموم", "پایان", "end", "done"]:
-            generate_cut_plan(cid)
+            generate_cut_plan(cid, session)
+        elif text.lower() in ["بهینه", "بهینه تر", "optimise", "optimize"]:
+            bot.send_message(cid, f"⏳ در حال جستجوی بهترین چیدمان ({OPTIMISE_BUDGET:g} ثانیه)...")
+            generate_cut_plan(cid, session, optimise_harder=True)
         else:
-            try:
-                w, h = map(float, text.replace('×', 'x').split('x'))
-                user_data[cid]["parts"].append((w, h))
-                count = len(user_data[cid]["parts"])
-                bot.send_message(cid, f"✅ قطعه {count}: {w}×{h} اضافه شد\nقطعه بعدی یا 'تمام'")
-            except:
-                bot.send_message(cid, "❌ فرمت اشتباه!\nمثال صحیح: `100x50`")
+            add_cut_items(cid, data, parse_text(text))
     
     # حالت پیش‌فرض
     else:
         bot.send_message(cid, "لطفاً از منوی زیر انتخاب کنید 👇", reply_markup=main_menu())
 
-# ارسال سفارش به واتساپ
-def send_to_whatsapp(cid):
-    order_data = user_data.get(cid, {})
+# ثبت قطعات پارس شده (متن چندخطی یا CSV) در جلسه
+def add_cut_items(cid, data, cut):
+    items = group(data.get("items", []) + cut.items)
+    total = sum(item.qty for item in items)
+    if total > CUT_MAX_PARTS:
+        bot.send_message(cid, f"❌ حداکثر {CUT_MAX_PARTS} قطعه در هر سفارش قابل محاسبه است")
+        return
+    if cut.count:
+        data["items"] = [list(item) for item in items]
+
+    lines = []
+    if cut.count == 1 and len(cut.items) == 1:
+        w, h = cut.items[0].w, cut.items[0].h
+        lines.append(f"✅ قطعه {total}: {w:g}×{h:g} اضافه شد")
+    elif cut.count:
+        lines.append(f"✅ {cut.count} قطعه ({len(cut.items)} سایز) اضافه شد؛ جمع کل: {total}")
+    for err in cut.errors[:5]:
+        lines.append(f"❌ خط {err.line}: {err.message} «{err.text}»")
+    if len(cut.errors) > 5:
+        lines.append(f"... و {len(cut.errors) - 5} خطای دیگر")
+    if not cut.count and not cut.errors:
+        lines.append("❌ فرمت اشتباه!\nمثال صحیح: `100x50`")
+    lines.append("قطعه بعدی یا 'تمام'")
+    bot.send_message(cid, "\n".join(lines))
+
+# آپلود فایل: CSV لیست برش یا JSON سفارش چند متریالی
+@bot.message_handler(content_types=["document"])
+@timed("document")
+def cut_list_upload(msg):
+    cid = msg.chat.id
+    session = sessions.load(cid)
+    doc = msg.document
+    is_job = (doc.file_name or "").lower().endswith(".json")
+    if session.state != "cut_parts" and not is_job:
+        bot.send_message(cid, "برای ارسال لیست برش ابتدا «برش بهینه» را انتخاب کنید 👇",
+                         reply_markup=main_menu())
+        return
+    if doc.file_size and doc.file_size > CUT_MAX_FILE:
+        bot.send_message(cid, "❌ حجم فایل بیش از حد مجاز است")
+        return
+    try:
+        content = bot.download_file(bot.get_file(doc.file_id).file_path)
+    except Exception as e:
+        log.error(f"Cut list download failed for {cid}: {e}")
+        bot.send_message(cid, "❌ دریافت فایل ناموفق بود، دوباره تلاش کنید")
+        return
+    if is_job:
+        generate_job_plan(cid, content)
+        return
+    try:
+        add_cut_items(cid, session.data, parse_csv(io.BytesIO(content)))
+    finally:
+        sessions.save(session)
+
+# ثبت سفارش در انبار و ارسال به واتساپ
+def send_to_whatsapp(cid, order_data):
     
     if not order_data:
         bot.send_message(cid, "❌ خطا در دریافت اطلاعات سفارش!")
         return
     
+    order = orders.create(cid, order_data.get('name', 'ندارد'), order_data.get('phone', 'ندارد'),
+                          order_data.get('details', 'ندارد'))
+    if whatsapp:
+        whatsapp.notify()
+    
     # ساخت پیام سفارش
     order_message = (
         "📦 **سفارش جدید از بات تلگرام**\n\n"
-        f"👤 نام: {order_data.get('name', 'ندارد')}\n"
-        f"📱 تلفن: {order_data.get('phone', 'ندارد')}\n"
-        f"📝 توضیحات:\n{order_data.get('details', 'ندارد')}\n\n"
-        f"⏰ زمان: {request.get_data().decode('utf-8')[:19] if request.get_data() else 'همین لحظه'}"
+        f"🔖 شماره پیگیری: {order.tracking}\n"
+        f"👤 نام: {order.name}\n"
+        f"📱 تلفن: {order.phone}\n"
+        f"📝 توضیحات:\n{order.details}\n\n"
+        f"⏰ زمان: {time.strftime('%Y-%m-%d %H:%M', time.localtime(order.created))}"
     )
     
     # لینک مستقیم واتساپ
@@ -372,151 +618,380 @@ def send_to_whatsapp(cid):
         "✅ **سفارش شما آماده ارسال است!**\n\n"
         "برای تکمیل فرآیند، لطفاً روی دکمه زیر کلیک کنید\n"
         "تا مستقیماً به واتساپ منتقل شوید:\n\n"
-        f"**شماره پیگیری:** `{uuid.uuid4().hex[:8].upper()}`",
+        f"**شماره پیگیری:** `{order.tracking}`",
         parse_mode="Markdown",
         reply_markup=kb
     )
     
     # لاگ اطلاعات سفارش
-    log.info(f"New order from {order_data.get('name')} - Phone: {order_data.get('phone')}")
+    log.info(f"New order {order.tracking} from {order.name} - Phone: {order.phone}")
 
 # الگوریتم برش بهینه
-def generate_cut_plan(cid):
-    if cid not in user_data or "stock" not in user_data[cid]:
+def generate_cut_plan(cid, session, optimise_harder=False):
+    data = session.data
+    if "stock" not in data:
         bot.send_message(cid, "❌ اطلاعات ورق اصلی یافت نشد!")
         return
     
-    stock_w, stock_h = user_data[cid]["stock"]
-    parts = user_data[cid].get("parts", [])
+    stock_w, stock_h = data["stock"]
+    parts = expand(data.get("items", []))
     
     if not parts:
         bot.send_message(cid, "❌ هیچ قطعه‌ای وارد نشده است!")
         return
     
-    # الگوریتم ساده برش (می‌توانید پیچیده‌تر کنید)
-    bins = []
+    # چیدمان دوبعدی با MaxRects و چرخش ۹۰ درجه، در پردازه‌های جداگانه
+    constraints = CutConstraints(kerf=CUT_KERF, trim=CUT_TRIM,
+                                 grain=data.get("grain", False))
+    # باقیمانده‌های قبلی همین متریال اول پر می‌شوند، بعد ورق کامل
+    material = data.get("material") or CUT_MATERIAL
+    offcuts = remnants.offer(material, parts, constraints.grain) if remnants else []
+    plan = functools.partial(plan_full_sheets, cid, parts, (stock_w, stock_h), constraints,
+                             optimise_harder, material, offcuts, time.perf_counter(),
+                             export.part_labels(data["items"]))
+    if offcuts:
+        # فقط باقیمانده‌ها (حریصانه، بدون کش)؛ قطعات جا نشده بعد از آن به مسیر عادی ورق کامل می‌روند
+        job = Job([Material(material, offcuts, data["items"], constraints=constraints)])
+        future = solver.submit_job(job)
+        # callback روی نخ مدیریت ProcessPool اجرا می‌شود؛ ادامه کار در صف همان چت
+        future.add_done_callback(lambda f: jobs.submit(cid, plan, f, bounded=False))
+    else:
+        plan()
     
-    # مرتب‌سازی قطعات از بزرگ به کوچک
-    sorted_parts = sorted(parts, key=lambda x: x[0]*x[1], reverse=True)
+    # پاکسازی: هندلر منتظر نتیجه نمی‌ماند
+    session.reset()
+
+# قطعات باقیمانده روی ورق کامل: کش نقشه، شروع گرم، چیدمان سریع یا جستجوی «بهینه‌تر»
+# کلید کش فقط به همین قطعات بستگی دارد، نه به موجودی باقیمانده‌ها
+def plan_full_sheets(cid, parts, stock, constraints, optimise_harder, material, offcuts,
+                     submitted, labels, offcut_future=None):
+    on_offcuts = None
+    if offcut_future is not None:
+        if offcut_future.exception() is None:
+            on_offcuts = offcut_future.result().materials[0]
+        else:
+            log.error(f"Offcut plan failed for {cid}: {offcut_future.exception()}")
+            remnants.release_stocks(offcuts)
+            offcuts = []
+    index = on_offcuts.unplaced if on_offcuts else list(range(len(parts)))
+    rest = [parts[i] for i in index]
+    stock_w, stock_h = stock
+    budget = OPTIMISE_BUDGET if optimise_harder else 0
+    cache_key = None
+    if plan_cache is not None and rest:
+        mode = "optimise" if optimise_harder else "pack"
+        fam = family(stock_w, stock_h, constraints, mode)
+        cache_key = (fingerprint(rest, stock_w, stock_h, constraints, mode), fam)
+        cached = plan_cache.get(cache_key[0], rest)
+        warm = plan_cache.nearest(fam, rest) if cached is None else None
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+        else:
+            # در حالت «بهینه‌تر» نقشه شروع گرم بذر جستجو است و نتیجه همان نوع کش optimise است
+            future = solver.submit(rest, stock_w, stock_h, constraints, budget=budget, warm=warm)
+    else:
+        future = solver.submit(rest, stock_w, stock_h, constraints, budget=budget)
+    future.add_done_callback(lambda f: jobs.submit(cid, deliver_cut_plan, cid, parts, f, material,
+                                                   offcuts, submitted, cache_key, labels,
+                                                   index, on_offcuts, bounded=False))
+
+# تحویل نقشه برش بعد از پایان محاسبه
+# index: اندیس قطعات حل شده روی ورق کامل در parts؛ on_offcuts: نتیجه چیدمان روی باقیمانده‌ها
+def deliver_cut_plan(cid, parts, future, material=None, offcuts=(), submitted=None,
+                     cache_key=None, labels=None, index=None, on_offcuts=None):
+    if submitted is not None:
+        # از ثبت تا پایان حل، شامل انتظار در صف پردازه‌ها
+        CUT_PHASE_SECONDS.observe(time.perf_counter() - submitted, phase="solve")
+    if future.exception() is not None:
+        if remnants and offcuts:
+            remnants.release_stocks(offcuts)
+        log.error(f"Cut plan solver failed for {cid}: {future.exception()}")
+        bot.send_message(cid, "❌ محاسبه برش با مشکل مواجه شد!", reply_markup=main_menu())
+        return
     
-    for pw, ph in sorted_parts:
-        placed = False
-        
-        # سعی در قرار دادن در ورق‌های موجود
-        for bin_idx, bin in enumerate(bins):
-            bin_w, bin_h, bin_items = bin
-            
-            # چک کردن جا در ورق فعلی
-            if pw <= stock_w and ph <= stock_h:
-                # می‌توانید الگوریتم پیشرفته‌تر اینجا پیاده کنید
-                bins[bin_idx][2].append((pw, ph, 0, 0))
-                placed = True
-                break
-        
-        # اگر جا نشد، ورق جدید
-        if not placed:
-            bins.append([stock_w, stock_h, [(pw, ph, 0, 0)]])
+    search_note = ""
+    result = future.result()
+    if isinstance(result, OptimiseResult):
+        opt = result
+        result = opt.best
+        first_sheets = opt.history[0][1] if opt.history else result.sheet_count
+        search_note = (f"• جستجو: {opt.iterations} چیدمان در {opt.elapsed:.1f} ثانیه "
+                       f"({first_sheets} ← {result.sheet_count} ورق، حد پایین {opt.lower_bound})\n")
+        log.info(f"Optimised cut plan for {cid}: history={opt.history}")
+    CUT_PHASE_SECONDS.observe(result.elapsed, phase="pack")
+    if cache_key and result.sheets:
+        try:
+            plan_cache.put(cache_key[0], cache_key[1], [parts[i] for i in index], result)
+        except Exception as e:
+            log.error(f"Plan cache update failed: {e}")
+    stocks = []
+    if on_offcuts is not None and on_offcuts.sheets:
+        # ورق‌های باقیمانده جلوی نقشه؛ اندیس قطعات ورق کامل از زیرلیست به کل قطعات
+        for sheet in result.sheets:
+            for p in sheet.placements:
+                p.index = index[p.index]
+        result = PackResult(on_offcuts.sheets + result.sheets, [index[i] for i in result.unplaced],
+                            result.heuristic, on_offcuts.elapsed + result.elapsed)
+        stocks = on_offcuts.stocks
+        search_note += f"• ورق باقیمانده استفاده شده: {on_offcuts.offcuts_used}\n"
+        cache_key = None   # تصاویر شامل باقیمانده‌ها هستند و کش نمی‌شوند
+    bins = result.sheets
+    log.info(f"Cut plan for {cid}: {len(parts)} parts -> {result.sheet_count} sheets "
+             f"in {result.elapsed*1000:.1f} ms ({result.heuristic})")
+    hold = hold_remnants(cid, [(material, bins, stocks, offcuts)]) if remnants and material else None
     
     # رسم نقشه
     if not bins:
-        bot.send_message(cid, "❌ محاسبه برش با مشکل مواجه شد!")
+        bot.send_message(cid, "❌ هیچ قطعه‌ای در ابعاد ورق جا نمی‌شود!", reply_markup=main_menu())
         return
     
-    fig, axs = plt.subplots(1, len(bins), figsize=(6*len(bins), 6))
-    if len(bins) == 1:
-        axs = [axs]
-    
-    total_part_area = sum(p[0]*p[1] for p in parts)
-    total_sheet_area = len(bins) * stock_w * stock_h
-    waste_percent = 100 * (1 - total_part_area/total_sheet_area) if total_sheet_area > 0 else 0
-    
-    for idx, (bin_w, bin_h, items) in enumerate(bins):
-        ax = axs[idx]
-        
-        # رسم ورق
-        ax.add_patch(Rectangle((0, 0), bin_w, bin_h, fill=None, 
-                              edgecolor='navy', linewidth=3, alpha=0.7))
-        
-        # رسم قطعات
-        for pw, ph, x, y in items:
-            color = '#4ECDC4'  # رنگ ثابت
-            ax.add_patch(Rectangle((x, y), pw, ph, 
-                                  facecolor=color, edgecolor='white', 
-                                  linewidth=2, alpha=0.8))
-            
-            # متن روی قطعه
-            ax.text(x + pw/2, y + ph/2, f"{pw}×{ph}", 
-                   ha='center', va='center', 
-                   color='white', fontweight='bold', fontsize=10)
-        
-        ax.set_xlim(0, bin_w * 1.1)
-        ax.set_ylim(0, bin_h * 1.1)
-        ax.set_aspect('equal')
-        ax.set_title(f"📦 ورق {idx+1}", fontsize=12, fontweight='bold')
-        ax.axis('off')
-    
-    plt.suptitle(f"برش بهینه با CutMaster Pro", fontsize=14, fontweight='bold')
-    plt.tight_layout()
-    
-    # ذخیره و ارسال
-    filename = f"cut_plan_{uuid.uuid4().hex[:8]}.png"
-    plt.savefig(filename, dpi=150, bbox_inches='tight')
-    plt.close()
+    total_part_area = result.part_area
+    total_sheet_area = result.sheet_area
+    waste_percent = result.waste_percent
     
     caption = (
         f"✅ **برش بهینه آماده شد!**\n\n"
         f"📊 **آمار برش:**\n"
         f"• تعداد ورق: {len(bins)}\n"
-        f"• تعداد قطعات: {len(parts)}\n"
-        f"• پرتی: {waste_percent:.1f}%\n"
+        f"• تعداد قطعات: {len(parts) - len(result.unplaced)}\n"
+        f"• پرتی: {waste_percent:.1f}% (با احتساب تیغ {CUT_KERF} و دوربری {CUT_TRIM})\n"
         f"• مساحت قطعات: {total_part_area/10000:.2f} m²\n"
-        f"• مساحت ورق‌ها: {total_sheet_area/10000:.2f} m²\n\n"
+        f"• مساحت ورق‌ها: {total_sheet_area/10000:.2f} m²\n"
+        f"• بازده هر ورق: {' / '.join(f'{s.utilisation*100:.0f}%' for s in bins[:12])}"
+        f"{' …' if len(bins) > 12 else ''}\n"
+        f"{search_note}\n"
         f"🎯 **بهینه‌ترین حالت ممکن!**\n"
         f"برای سفارش چوب و MDF با ما تماس بگیرید."
     )
     
+    # رسم در حافظه (بدون فایل موقت)، هر صفحه چند ورق
     try:
-        with open(filename, 'rb') as photo:
-            bot.send_photo(cid, photo, caption=caption, parse_mode="Markdown")
-        os.remove(filename)
+        images = plan_cache.images(cache_key[0]) if cache_key else None
+        if images is None:
+            with CUT_PHASE_SECONDS.time(phase="render"):
+                images = render_png_pages(bins)
+            if cache_key:
+                try:
+                    plan_cache.put_images(cache_key[0], images)
+                except Exception as e:
+                    log.error(f"Plan cache image update failed: {e}")
+        with CUT_PHASE_SECONDS.time(phase="upload"):
+            send_images(cid, images, caption=caption, parse_mode="Markdown")
     except Exception as e:
         bot.send_message(cid, f"خطا در ایجاد نقشه: {str(e)}")
         log.error(f"Error generating cut plan: {e}")
     
-    # پاکسازی
-    if cid in user_data:
-        del user_data[cid]
-    if cid in user_state:
-        user_state.pop(cid, None)
+    send_exports(cid, bins, parts, labels)
+    
+    if result.unplaced:
+        oversized = ", ".join(f"{parts[i][0]}×{parts[i][1]}" for i in result.unplaced)
+        bot.send_message(cid, f"⚠️ این قطعات بزرگ‌تر از ورق هستند و چیده نشدند:\n{oversized}")
     
+    ask_cut_confirm(cid, hold)
+    bot.send_message(cid, "🛠️ کار دیگری نیاز دارید؟", reply_markup=main_menu())
+
+# باقیمانده‌ها فقط وقتی نقشه واقعاً بریده شد ثبت می‌شوند، نه با هر استعلام
+# تأیید برش با کارکنان است (ADMIN_CHAT_IDS)؛ بدون آن، بات تک‌کاربره فرض می‌شود
+def can_settle(cid):
+    return not ADMIN_CHAT_IDS or cid in ADMIN_CHAT_IDS
+
+def hold_remnants(cid, plans):
+    """plans: [(متریال، ورق‌ها، Stock هر ورق، باقیمانده‌های پیشنهاد شده)]؛ خروجی: token یا None"""
+    if not can_settle(cid):
+        # فقط استعلام: باقیمانده‌های پیشنهاد شده برای سفارش‌های دیگر آزاد می‌شوند
+        remnants.release_stocks([s for *_, offered in plans for s in offered])
+        return None
+    try:
+        return remnants.hold(plans, source=str(cid))
+    except Exception as e:
+        log.error(f"Remnant hold failed for {cid}: {e}")
+        return None
+
+def ask_cut_confirm(cid, token):
+    if not token:
+        return
+    kb = types.InlineKeyboardMarkup()
+    kb.add(types.InlineKeyboardButton("✅ برش زده شد", callback_data=f"cutdone:{token}"))
+    bot.send_message(cid, "♻️ بعد از برش این نقشه در کارگاه بزنید تا باقیمانده‌ها در انبار ثبت شوند:",
+                     reply_markup=kb)
+
+# ارسال تصاویر نقشه (bytes) به صورت آلبوم؛ کپشن فقط روی عکس اول
+# آلبوم تلگرام ۲ تا ۱۰ عکس می‌گیرد، پس تکه تک‌عکسی با send_photo فرستاده می‌شود
+def send_images(cid, images, caption=None, parse_mode=None):
+    for start in range(0, len(images), ALBUM_LIMIT):
+        chunk = images[start:start + ALBUM_LIMIT]
+        first_caption = caption if start == 0 else None
+        if len(chunk) == 1:
+            bot.send_photo(cid, chunk[0], caption=first_caption, parse_mode=parse_mode)
+        else:
+            bot.send_media_group(cid, [
+                types.InputMediaPhoto(img, caption=first_caption if i == 0 else None,
+                                      parse_mode=parse_mode)
+                for i, img in enumerate(chunk)
+            ])
+
+# فایل‌های کارگاه و دستگاه (ترتیب برش، لیست قطعات، برچسب، DXF/G-code)
+# ورق به ورق در فایل موقت نوشته می‌شوند؛ بالای ۱ مگابایت روی دیسک، نه در حافظه
+def send_exports(cid, sheets, parts, labels=None, name="cut", depth=None):
+    if not sheets:
+        return
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+    depth = depth or CNC_DEPTH
+    for fmt in CUT_EXPORTS:
+        options = {}
+        if fmt == "gcode":
+            if depth <= 0:
+                log.warning(f"No cut depth for {name}; G-code skipped (set CNC_DEPTH or material thickness)")
+                continue
+            options = {"tool": CNC_TOOL, "depth": depth}
+        try:
+            with CUT_PHASE_SECONDS.time(phase="export"), \
+                    tempfile.SpooledTemporaryFile(max_size=1 << 20) as out:
+                export.write(fmt, out, sheets, parts, labels, kerf=CUT_KERF, **options)
+                out.seek(0)
+                bot.send_document(cid, out, visible_file_name=f"{safe}.{export.EXPORTERS[fmt][1]}")
+        except Exception as e:
+            log.error(f"Cut plan export {fmt} failed for {cid}: {e}")
+
+# سفارش چند متریالی: هر متریال با موجودی ورق خودش، هم‌زمان حل می‌شود
+def generate_job_plan(cid, content):
+    try:
+        inventory = load_inventory(STOCK_INVENTORY) if STOCK_INVENTORY else None
+        job = load_job(io.BytesIO(content), inventory, kerf=CUT_KERF, trim=CUT_TRIM)
+    except ValueError as e:
+        # پیام ValueErrorهای پارسر سفارش فارسی است
+        bot.send_message(cid, f"❌ فایل سفارش نامعتبر است: {e}")
+        return
+    except (KeyError, TypeError, AttributeError) as e:
+        log.info(f"Malformed job file from {cid}: {e!r}")
+        bot.send_message(cid, "❌ فایل سفارش نامعتبر است: ساختار فایل با نمونه سفارش مطابقت ندارد")
+        return
+    if job.part_count > CUT_MAX_PARTS:
+        bot.send_message(cid, f"❌ حداکثر {CUT_MAX_PARTS} قطعه در هر سفارش قابل محاسبه است")
+        return
+    if job.errors:
+        bot.send_message(cid, "\n".join(
+            f"❌ {name}، خط {err.line}: {err.message} «{err.text}»" for name, err in job.errors[:5]))
+
+    offered = {}
+    if remnants:
+        for m in job.materials:
+            offered[m.name] = remnants.offer(m.name, expand(m.items), m.constraints.grain)
+            m.stocks = offered[m.name] + m.stocks
+
+    bot.send_message(cid, f"⏳ محاسبه {len(job.materials)} متریال، {job.part_count} قطعه...")
+    future = solver.submit_job(job)
+    submitted = time.perf_counter()
+    labels = {m.name: export.part_labels(m.items) for m in job.materials}
+    depths = {m.name: m.thickness for m in job.materials}
+    future.add_done_callback(lambda f: jobs.submit(cid, deliver_job_plan, cid, f, offered,
+                                                   submitted, labels, depths, bounded=False))
+
+def deliver_job_plan(cid, future, offered=None, submitted=None, labels=None, depths=None):
+    offered = offered or {}
+    labels = labels or {}
+    depths = depths or {}
+    if submitted is not None:
+        CUT_PHASE_SECONDS.observe(time.perf_counter() - submitted, phase="job_solve")
+    if future.exception() is not None:
+        if remnants:
+            remnants.release_stocks([s for stocks in offered.values() for s in stocks])
+        log.error(f"Job solver failed for {cid}: {future.exception()}")
+        bot.send_message(cid, "❌ محاسبه برش با مشکل مواجه شد!", reply_markup=main_menu())
+        return
+
+    result = future.result()
+    log.info(f"Job plan for {cid}: {len(result.materials)} materials -> "
+             f"{result.sheet_count} sheets in {result.elapsed*1000:.1f} ms")
+    hold = hold_remnants(cid, [(m.material, m.sheets, m.stocks, offered.get(m.material, ()))
+                               for m in result.materials]) if remnants else None
+    lines = ["✅ **برش سفارش چند متریالی آماده شد!**\n"]
+    for m in result.materials:
+        stock_lines = ", ".join(
+            f"{n} × {w:g}×{h:g}{' (باقیمانده)' if offcut else ''}"
+            for (w, h, offcut), n in m.counts().items())
+        lines.append(f"📦 **{m.material}**: {m.sheet_count} ورق، پرتی {m.waste_percent:.1f}%")
+        if stock_lines:
+            lines.append(f"   • {stock_lines}")
+        if m.unplaced:
+            lines.append(f"   ⚠️ {len(m.unplaced)} قطعه در ورق‌های موجود جا نشد")
+    lines.append(f"\n• جمع ورق‌ها: {result.sheet_count}")
+    lines.append(f"• هزینه ورق: {result.cost:,.0f}")
+    bot.send_message(cid, "\n".join(lines), parse_mode="Markdown")
+
+    for m in result.materials:
+        if not m.sheets:
+            continue
+        try:
+            images = render_png_pages(m.sheets, title=m.material)
+            send_images(cid, images, caption=m.material)
+        except Exception as e:
+            log.error(f"Error rendering job plan for {m.material}: {e}")
+        send_exports(cid, m.sheets, m.parts, labels.get(m.material), name=m.material,
+                     depth=depths.get(m.material))
+
+    ask_cut_confirm(cid, hold)
     bot.send_message(cid, "🛠️ کار دیگری نیاز دارید؟", reply_markup=main_menu())
 
+# صفحه‌ای از کاتالوگ نمونه کارها (از ایندکس، بدون اسکن پوشه)
+def show_gallery_page(cid, category, page):
+    category_name = CATEGORIES.get(category, "پروژه‌ها")
+    items, pages = catalog.page(category, page)
+    
+    if not items:
+        bot.send_message(cid, 
+            f"🖼️ **نمونه‌های {category_name}**\n\n"
+            f"به زودی عکس‌های این بخش اضافه می‌شود.\n"
+            f"برای مشاهده نمونه‌های فعلی، به کانال تلگرام مراجعه کنید یا از دکمه تماس با ما استفاده کنید.",
+            parse_mode="Markdown"
+        )
+        return
+    
+    try:
+        media.send_album(bot, cid, [item["thumb"] for item in items],
+                         caption=f"🖼️ {category_name} - صفحه {page + 1} از {pages}")
+    except Exception as e:
+        log.error(f"Error sending gallery page: {e}")
+    
+    kb = types.InlineKeyboardMarkup(row_width=2)
+    nav = []
+    if page > 0:
+        nav.append(types.InlineKeyboardButton("▶️ قبلی", callback_data=f"galpage:{category}:{page - 1}"))
+    if page + 1 < pages:
+        nav.append(types.InlineKeyboardButton("بعدی ◀️", callback_data=f"galpage:{category}:{page + 1}"))
+    if nav:
+        kb.add(*nav)
+    kb.add(types.InlineKeyboardButton("📞 مشاوره و سفارش", callback_data="contact_from_about"))
+    bot.send_message(cid, f"📄 صفحه {page + 1} از {pages}", reply_markup=kb)
+
 # هندلر Callback Query
 @bot.callback_query_handler(func=lambda call: True)
+@timed("callback")
 def callback_handler(call):
     cid = call.message.chat.id
     
-    if call.data.startswith("gallery_"):
-        category = call.data.replace("gallery_", "")
-        
-        categories = {
-            "kitchen": "کابینت آشپزخانه",
-            "wardrobe": "کمد دیواری",
-            "bedroom": "سرویس خواب",
-            "table": "میز و کنسول"
-        }
+    if call.data.startswith("gallery_") or call.data.startswith("galpage:"):
+        # gallery_kitchen -> صفحه اول، galpage:kitchen:2 -> صفحه سوم
+        if call.data.startswith("gallery_"):
+            category, page = call.data.replace("gallery_", ""), 0
+        else:
+            _, category, page = call.data.split(":")
+            page = int(page)
         
-        category_name = categories.get(category, "پروژه‌ها")
+        category_name = CATEGORIES.get(category, "پروژه‌ها")
         
         bot.answer_callback_query(call.id, f"در حال بارگیری نمونه‌های {category_name}...")
-        
-        # فعلاً پیام نمونه
-        bot.send_message(cid, 
-            f"🖼️ **نمونه‌های {category_name}**\n\n"
-            f"به زودی عکس‌های این بخش اضافه می‌شود.\n"
-            f"برای مشاهده نمونه‌های فعلی، به کانال تلگرام مراجعه کنید یا از دکمه تماس با ما استفاده کنید.",
-            parse_mode="Markdown"
-        )
+        show_gallery_page(cid, category, page)
+    
+    elif call.data.startswith("cutdone:"):
+        ids = remnants.confirm(call.data.split(":", 1)[1]) if remnants and can_settle(cid) else None
+        if ids is None:
+            bot.answer_callback_query(call.id, "این نقشه قبلاً ثبت شده یا منقضی شده است")
+        else:
+            bot.answer_callback_query(call.id, "✅ ثبت شد")
+            bot.edit_message_text(f"✅ برش ثبت شد؛ {len(ids)} باقیمانده به انبار اضافه شد",
+                                  cid, call.message.message_id)
     
     elif call.data == "contact_from_about":
         contact(call.message)
@@ -529,10 +1004,31 @@ def callback_handler(call):
 # Webhook
 app = Flask(__name__)
 
+def update_chat_id(update):
+    if update.message:
+        return update.message.chat.id
+    if update.callback_query and update.callback_query.message:
+        return update.callback_query.message.chat.id
+    return update.update_id
+
 @app.route(f"/{TELEGRAM_TOKEN}", methods=["POST"])
+@timed("webhook")
 def webhook():
     update = types.Update.de_json(request.get_data().decode("utf-8"))
-    bot.process_new_updates([update])
+    # فقط ثبت در صف؛ پردازش در نخ‌های پس‌زمینه به ترتیب هر چت
+    try:
+        if not jobs.submit(update_chat_id(update), bot.process_new_updates, [update],
+                           job_id=update.update_id):
+            log.info(f"Duplicate update {update.update_id} ignored")
+    except queue.Full:
+        # صف این چت پر است؛ پیام کاربر رد و مؤدبانه خبر داده می‌شود (200 تا تلگرام دوباره نفرستد)
+        log.warning(f"Job queue full, update {update.update_id} rejected")
+        if update.message or update.callback_query:
+            try:
+                bot.send_message(update_chat_id(update),
+                                 "⏳ سرور در حال حاضر شلوغ است، لطفاً چند لحظه دیگر دوباره تلاش کنید.")
+            except Exception as e:
+                log.error(f"Busy notice failed: {e}")
     return "ok", 200
 
 @app.route("/")
@@ -541,7 +1037,33 @@ def home():
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "healthy", "service": "najjar_bot"}), 200
+    return jsonify({"status": "healthy", "service": "najjar_bot", "warm": warmed_up.is_set()}), 200
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# گرم کردن زیرسیستم‌های سنگین در پس‌زمینه؛ /health بدون انتظار برای آن‌ها پاسخ می‌دهد
+warmed_up = threading.Event()
+
+def warm_up():
+    t0 = time.perf_counter()
+    try:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+        get_client()
+        solver.submit([], 1, 1).result()  # ساخت پردازه‌های حل برش
+        catalog.sync()  # فقط عکس‌های جدید بندانگشتی می‌گیرند
+        if remnants:
+            remnants.prune(REMNANT_MAX_AGE)
+        if transport is not None:
+            transport.start()
+    except Exception as e:
+        log.warning(f"Warm-up incomplete: {e}")
+    warmed_up.set()
+    log.info(f"Warm-up finished in {time.perf_counter() - t0:.2f}s")
+
+if os.getenv("WARMUP", "1") == "1":
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
 if __name__ == "__main__":
     log.info("🚀 بات نجاری شروع به کار کرد...")
@@ -0,0 +1,54 @@
+import importlib.util
+import socket
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# ماژول‌های core از ریشه مخزن ایمپورت می‌شوند
+sys.path.insert(0, str(ROOT))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def bot(tmp_path_factory):
+    """
+    بات واقعی درون همین پروسه، با پایگاه‌های داده موقت
+    پورت‌های stub تلگرام و OpenAI از قبل انتخاب می‌شوند تا آزمون‌ها (مثل load_test) روی همان‌ها گوش دهند
+    """
+    workdir = tmp_path_factory.mktemp("bot")
+    tg_port, oa_port = free_port(), free_port()
+    mp = pytest.MonkeyPatch()
+    for key, value in {
+        "TELEGRAM_TOKEN": "1000:loadtest",
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{tg_port}",
+        "ASYNC_TRANSPORT": "1",
+        "OPENAI_API_KEY": "sk-test",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{oa_port}/v1",
+        "SESSION_STORE": str(workdir / "sessions.db"),
+        "JOB_DEDUP_DB": str(workdir / "dedup.db"),
+        "REMNANT_DB": str(workdir / "remnants.db"),
+        "PLAN_CACHE": str(workdir / "plan_cache.db"),
+        "ORDER_DB": str(workdir / "orders.db"),
+        "MEDIA_INDEX": str(workdir / "file_ids.json"),
+        "WHATSAPP_TOKEN": "",
+        "SOLVER_WORKERS": "0",
+        "WARMUP": "0",
+    }.items():
+        mp.setenv(key, value)
+    # مسیر تصاویر نسبت به ریشه مخزن است
+    mp.chdir(ROOT)
+    spec = importlib.util.spec_from_file_location("najjar_bot", ROOT / "najjar-bot.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.warm_up()
+    yield SimpleNamespace(module=module, app=module.app, tg_port=tg_port, oa_port=oa_port)
+    mp.undo()
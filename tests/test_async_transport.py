@@ -0,0 +1,53 @@
+import time
+from collections import Counter
+
+import pytest
+
+from core.async_transport import AsyncTransport
+from tools.load_test import ANSWER, OpenAIStub, serve
+
+
+@pytest.fixture
+def stub(request):
+    # latency: کل زمان stream؛ برای تست بستن زودهنگام طولانی‌تر
+    server = serve(OpenAIStub, 0, models=Counter(), latency=getattr(request, "param", 0.05))
+    server.handle_error = lambda *args: None   # BrokenPipe بعد از بستن زودهنگام stream عادی است
+
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+@pytest.fixture
+def transport():
+    t = AsyncTransport("0:test")
+    yield t
+    t.close()
+
+
+def open_stream(transport, url):
+    client = transport.openai(api_key="test", base_url=url)
+    return transport.iterate(lambda: client.chat.completions.create(
+        model="stub", messages=[{"role": "user", "content": "سلام"}], stream=True))
+
+
+async def _pending_tasks():
+    import asyncio
+    return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+
+def test_stream_is_delivered_in_order(stub, transport):
+    text = "".join(chunk.choices[0].delta.content or "" for chunk in open_stream(transport, stub))
+    assert text.split() == ANSWER
+    assert transport.run(_pending_tasks(), 5) == []
+
+
+@pytest.mark.parametrize("stub", [3.0], indirect=True)
+def test_early_close_cancels_pump(stub, transport):
+    stream = open_stream(transport, stub)
+    first = next(stream)
+    assert first.choices[0].delta.content.strip() == ANSWER[0]
+    stream.close()
+    deadline = time.monotonic() + 0.5
+    while transport.run(_pending_tasks(), 5) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert transport.run(_pending_tasks(), 5) == []
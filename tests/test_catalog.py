@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from core.catalog import Catalog
+
+
+def test_concurrent_sync_builds_thumbnails_once(tmp_path):
+    for name in ("kitchen_a.jpg", "wardrobe_b.png"):
+        Image.new("RGB", (1200, 900), "white").save(tmp_path / name)
+    catalogs = [Catalog(tmp_path) for _ in range(3)]
+    with ThreadPoolExecutor(3) as pool:
+        updated = list(pool.map(lambda c: c.sync(workers=1), catalogs))
+    # فقط یکی از «workerها» کار را انجام داده و بقیه چیزی برای به‌روزرسانی ندیده‌اند
+    assert sorted(updated) == [0, 0, 2]
+    items, pages = catalogs[0].page("kitchen")
+    assert pages == 1 and items[0]["width"] == 1200
+    assert items[0]["thumb"].exists()
@@ -0,0 +1,38 @@
+from core.conversation_memory import ConversationMemory
+
+
+def test_summary_is_deferred_and_context_kept():
+    deferred = []
+    calls = []
+
+    def summarise(summary, turns):
+        calls.append(len(turns))
+        return "خلاصه"
+
+    memory = ConversationMemory(max_turns=2, summarise=summarise, summarise_every=2,
+                                defer=lambda fn, *args: deferred.append((fn, args)))
+    for i in range(4):
+        memory.add(1, "user", f"پیام {i}")
+    # خلاصه‌سازی در مسیر add اجرا نشده؛ پیام‌های بیرون‌افتاده هنوز در زمینه هستند
+    assert calls == [] and len(deferred) == 1
+    assert "پیام 0" in memory.messages(1)[0]["content"]
+
+    memory.add(1, "user", "پیام 4")
+    assert len(deferred) == 1   # تا پایان خلاصه قبلی، کار جدیدی صف نمی‌شود
+
+    fn, args = deferred.pop()
+    fn(*args)
+    assert calls == [3]
+    context = memory.messages(1)
+    assert context[0]["content"].endswith("خلاصه")
+    assert [m["content"] for m in context[1:]] == ["پیام 3", "پیام 4"]
+
+
+def test_failed_summary_falls_back_to_extractive():
+    def summarise(summary, turns):
+        raise RuntimeError("busy")
+
+    memory = ConversationMemory(max_turns=1, summarise=summarise, summarise_every=1)
+    memory.add(1, "user", "اول")
+    memory.add(1, "user", "دوم")
+    assert "کاربر: اول" in memory.messages(1)[0]["content"]
@@ -0,0 +1,74 @@
+import io
+
+import pytest
+
+from core.cutlist import CutItem, expand, group, parse_csv, parse_line, parse_text
+from core.export import part_labels
+
+
+@pytest.mark.parametrize("text, item", [
+    ("60x40", CutItem(60, 40)),
+    ("60x40 x12", CutItem(60, 40, qty=12)),
+    ("60×40×12", CutItem(60, 40, qty=12)),
+    ("60*40 12 ر", CutItem(60, 40, True, 12)),
+    ("۶۰٫۵x۴۰ x۳ درب", CutItem(60.5, 40, qty=3, label="درب")),
+    ("60x40 x2 2nd shelf", CutItem(60, 40, qty=2, label="2nd shelf")),
+    ("60,40,2,g,قفسه", CutItem(60, 40, True, 2, "قفسه")),
+    ("60;40", CutItem(60, 40)),
+])
+def test_parse_line(text, item):
+    assert parse_line(text) == item
+
+
+@pytest.mark.parametrize("text", ["", "   ", "# توضیح"])
+def test_parse_line_skips_blank_and_comments(text):
+    assert parse_line(text) is None
+
+
+@pytest.mark.parametrize("text, message", [
+    ("60x40 x1.5", "تعداد باید عدد صحیح باشد"),
+    ("60x40 2.5", "تعداد باید عدد صحیح باشد"),
+    ("60,40,1.5", "تعداد باید عدد صحیح باشد"),
+    ("60,abc", "ارتفاع باید عدد باشد"),
+    ("nan,40", "عرض باید عدد باشد"),
+    ("60,", "عرض و ارتفاع لازم است"),
+    ("0x40", "ابعاد باید بزرگ‌تر از صفر باشد"),
+    ("60x40 x0", "تعداد باید بین"),
+    ("سلام", "فرمت ابعاد نامعتبر"),
+])
+def test_parse_line_errors_are_persian(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_line(text)
+
+
+def test_parse_text_merges_and_reports_lines():
+    cut = parse_text("60x40 x2\nخراب\n60x40\n30x20 ر")
+    assert cut.count == 4
+    assert sorted(cut.items) == [CutItem(30, 20, True, 1), CutItem(60, 40, False, 3)]
+    assert [(e.line, e.text) for e in cut.errors] == [(2, "خراب")]
+
+
+def test_parse_csv_keeps_quoted_commas():
+    data = 'عرض,ارتفاع,تعداد,رگه,برچسب\r\n60,40,2,,"درب, چپ"\r\n70,x,1\r\n'
+    cut = parse_csv(io.BytesIO(data.encode("utf-8-sig")))
+    assert cut.items == [CutItem(60, 40, False, 2, "درب, چپ")]
+    assert [(e.line, e.message) for e in cut.errors] == [(3, "ارتفاع باید عدد باشد")]
+
+
+def test_expand():
+    parts = expand([CutItem(60, 40, True, 2)])
+    assert [(p.w, p.h, p.grain) for p in parts] == [(60, 40, True)] * 2
+
+
+def test_same_size_with_different_labels_is_not_merged():
+    cut = parse_text("60x40 x2 درب\n60x40 طبقه\n60x40 درب\n60x40")
+    assert cut.count == 5
+    assert cut.items == [CutItem(60, 40, False, 3, "درب"), CutItem(60, 40, False, 1, "طبقه"),
+                         CutItem(60, 40, False, 1, "")]
+
+
+def test_group_keeps_every_label_in_expand_order():
+    items = group([[60, 40, False, 1, "درب"], [60, 40, False, 2, "طبقه"], [60, 40, False, 1, "درب"]])
+    assert items == [CutItem(60, 40, False, 2, "درب"), CutItem(60, 40, False, 2, "طبقه")]
+    assert part_labels(items) == ["درب", "درب", "طبقه", "طبقه"]
+    assert len(expand(items)) == 4
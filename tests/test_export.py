@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from core import export
+from core.packing import Placement, Sheet
+
+EPS = 1e-6
+
+
+def _random_layout(rng, x, y, w, h, kerf, depth, out):
+    # چیدمان گیوتینی تصادفی؛ فاصله بین دو نیمه گاهی کمتر از ضخامت تیغ است
+    if depth == 0 or min(w, h) < 8 or rng.random() < 0.2:
+        out.append(Placement(len(out), x, y, w * rng.uniform(0.6, 1), h * rng.uniform(0.6, 1)))
+        return
+    vertical = rng.random() < 0.5
+    size = w if vertical else h
+    first = size * rng.uniform(0.3, 0.7)
+    gap = rng.choice((0.0, kerf / 2, kerf, 2 * kerf))
+    second = size - first - gap
+    if vertical:
+        _random_layout(rng, x, y, first, h, kerf, depth - 1, out)
+        if second > 0:
+            _random_layout(rng, x + first + gap, y, second, h, kerf, depth - 1, out)
+    else:
+        _random_layout(rng, x, y, w, first, kerf, depth - 1, out)
+        if second > 0:
+            _random_layout(rng, x, y + first + gap, w, second, kerf, depth - 1, out)
+
+
+def _hits(cut, kerf, p):
+    # شکاف تیغ (pos تا pos+kerf) روی طول برش با داخل قطعه همپوشانی دارد؟
+    a, b = (p.x, p.x + p.w) if cut.vertical else (p.y, p.y + p.h)
+    lo, hi = (p.y, p.y + p.h) if cut.vertical else (p.x, p.x + p.w)
+    across = cut.pos < b - EPS and cut.pos + kerf > a + EPS if kerf else a + EPS < cut.pos < b - EPS
+    return across and cut.start < hi - EPS and lo < cut.end - EPS
+
+
+@pytest.mark.parametrize("kerf", [0.0, 0.3, 0.4])
+def test_saw_cuts_never_cross_a_part(kerf):
+    rng = random.Random(kerf)
+    for _ in range(300):
+        placements = []
+        _random_layout(rng, 0.0, 0.0, 183.0, 366.0, kerf, 6, placements)
+        sheet = Sheet(183.0, 366.0, placements)
+        plan = export.saw_plan(sheet, kerf)
+        for cut in plan.cuts:
+            assert not any(_hits(cut, kerf, p) for p in placements), cut
+
+
+def test_parts_closer_than_kerf_stay_in_one_block():
+    parts = [Placement(0, 0, 0, 10, 10), Placement(1, 10.2, 0, 9.8, 10), Placement(2, 22, 0, 8, 10)]
+    blocks = export._blocks(parts, True, kerf=0.4)
+    assert [len(group) for _, _, group in blocks] == [2, 1]
+
+
+def test_pdf_labels_replace_persian_with_number_and_size():
+    sheet = Sheet(100, 100, [Placement(0, 0, 0, 60, 40)])
+    pdf = b"".join(export.labels_pdf([sheet], [(60, 40)], ["درب کابینت"]))
+    assert b"(#1  60 x 40) Tj" in pdf and b"?" not in pdf
+
+
+def test_gcode_labels_cannot_escape_the_comment():
+    sheet = Sheet(100, 100, [Placement(0, 0, 0, 60, 40), Placement(1, 0, 50, 20, 20)])
+    text = "".join(export.gcode([sheet], [(60, 40), (20, 20)], ["door) G0 Z-50 (", "درب"],
+                                tool=0.6, depth=18))
+    assert "(part 1: door G0 Z-50)" in text and "(part 2)" in text
+    # هر خط یا کامنت کامل است یا فرمان بدون پرانتز
+    for line in text.splitlines():
+        assert line.count("(") == line.count(")") <= 1
+        assert "(" not in line or (line.startswith("(") and line.endswith(")"))
+
+
+def test_gcode_needs_tool_and_depth():
+    sheet = Sheet(100, 100, [Placement(0, 0, 0, 60, 40)])
+    with pytest.raises(TypeError):
+        list(export.gcode([sheet], [(60, 40)], kerf=0.4))
+    with pytest.raises(ValueError):
+        list(export.gcode([sheet], [(60, 40)], tool=0.6, depth=0))
@@ -0,0 +1,41 @@
+import pytest
+
+from core.conversation_memory import ConversationMemory
+from core.h_agent import H_AGENT_BUSY_MSG, HAgent
+from core.rate_limit import SHED, Admission
+from core.response_cache import ResponseCache
+
+
+class ShedAll:
+    def admit(self, cid):
+        return Admission(SHED)
+
+    def release(self):
+        raise AssertionError("shed requests hold no slot")
+
+
+@pytest.fixture
+def agent():
+    return HAgent(cache=ResponseCache(similarity=0), memory=ConversationMemory(), limiter=ShedAll())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_shed_miss_is_counted_once(agent, stream):
+    ask = (lambda *a: "".join(agent.stream_response(*a))) if stream else agent.generate_response
+    assert ask("قیمت ام دی اف", 1) == H_AGENT_BUSY_MSG
+    assert (agent.cache.hits, agent.cache.misses) == (0, 1)
+
+
+def test_shed_with_history_falls_back_to_cache(agent):
+    agent.cache.put("قیمت ام دی اف", "متری ۵۰۰")
+    agent.memory.add(1, "user", "سلام")
+    agent.memory.add(1, "assistant", "سلام، بفرمایید")
+    # با زمینه گفتگو جستجوی پیش از پذیرش انجام نمی‌شود؛ زیر بار کش تنها جواب است
+    assert agent.generate_response("قیمت ام دی اف", 1) == "متری ۵۰۰"
+    assert (agent.cache.hits, agent.cache.misses) == (1, 0)
+
+
+def test_cache_hit_skips_admission(agent):
+    agent.cache.put("قیمت ام دی اف", "متری ۵۰۰")
+    assert agent.generate_response("قیمت ام دی اف", 1) == "متری ۵۰۰"
+    assert agent.cache.hits == 1
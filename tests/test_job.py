@@ -0,0 +1,58 @@
+import io
+import json
+
+import pytest
+
+from core.job import Job, Material, Stock, load_job, solve_material
+from core.solver_pool import SolverPool
+
+
+def _job(data, **kw):
+    return load_job(io.BytesIO(json.dumps(data, ensure_ascii=False).encode()), **kw)
+
+
+def test_cheapest_sheet_that_finishes_the_material_wins():
+    m = Material("MDF 16", [Stock(183, 366, cost=1000), Stock(100, 100, cost=300)],
+                 [(40, 40, False, 4)])
+    result = solve_material(m)
+    assert [s.w for s in result.stocks] == [100] and not result.unplaced
+
+
+def test_free_offcut_first_then_stock_respects_quantity():
+    offcut = Stock(60, 60, qty=1, offcut=True, label="remnant-1")
+    m = Material("MDF 16", [offcut, Stock(100, 100, qty=2, cost=300)], [(50, 50, False, 6)])
+    result = solve_material(m)
+    assert result.stocks[0] == offcut and result.offcuts_used == 1
+    # باقیمانده یکی جا می‌دهد، دو ورق 100×100 هر کدام چهار تا؛ بیشتر از موجودی برداشته نمی‌شود
+    assert [s.w for s in result.stocks] == [60, 100, 100] and not result.unplaced
+    short = solve_material(Material("MDF 16", [Stock(100, 100, qty=1)], [(50, 50, False, 6)]))
+    assert short.sheet_count == 1 and len(short.unplaced) == 2
+
+
+def test_materials_use_inventory_and_collect_line_errors():
+    job = _job({"materials": [{"name": "MDF 16", "thickness": 16,
+                               "parts": ["60x40 x2", "۳۰×۲۰ ر", "سلام"]}]},
+               inventory={"MDF 16": [Stock(183, 366)]})
+    [m] = job.materials
+    assert m.stocks == [Stock(183, 366)] and m.thickness == 16 and m.part_count == 3
+    assert [(name, e.line) for name, e in job.errors] == [("MDF 16", 3)]
+
+
+@pytest.mark.parametrize("raw, message", [
+    (b"{not json", "فایل JSON قابل خواندن نیست"),
+    (b"\xff\xfe", "فایل JSON قابل خواندن نیست"),
+    (b"[]", "فایل سفارش باید شیء JSON"),
+    (b'{"materials": []}', "هیچ متریالی در سفارش نیست"),
+    ('{"materials": [{"name": "هایگلاس", "parts": ["60x40"]}]}'.encode(), "برای «هایگلاس» ورقی تعریف نشده است"),
+    (b'{"materials": [{"stocks": [{"w": 0, "h": 366}]}]}', "ابعاد یا تعداد ورق نامعتبر"),
+    (b'{"materials": [{"stocks": [{"w": "abc", "h": 366}]}]}', "مقدار «w» باید عدد باشد"),
+    (b'{"materials": [{"stocks": [[183, 366]], "thickness": "x"}]}', "مقدار «thickness» باید عدد باشد"),
+])
+def test_invalid_job_files_raise_persian_value_errors(raw, message):
+    with pytest.raises(ValueError, match=message):
+        load_job(io.BytesIO(raw))
+
+
+def test_empty_job_resolves():
+    future = SolverPool(workers=0).submit_job(Job([]))
+    assert future.done() and future.result().materials == []
@@ -0,0 +1,46 @@
+import queue
+import threading
+
+import pytest
+
+from core.job_queue import JobQueue
+
+
+def test_jobs_of_one_key_run_in_order():
+    jobs = JobQueue(workers=3)
+    seen = []
+    for i in range(20):
+        jobs.submit("chat", seen.append, i)
+    jobs.join()
+    jobs.shutdown()
+    assert seen == list(range(20))
+
+
+def test_duplicate_job_id_is_dropped():
+    jobs = JobQueue(workers=1)
+    assert jobs.submit(1, lambda: None, job_id=42)
+    assert not jobs.submit(1, lambda: None, job_id=42)
+    jobs.join()
+    jobs.shutdown()
+    assert jobs.duplicates == 1
+
+
+def test_full_queue_rejects_and_keeps_job_id():
+    jobs = JobQueue(workers=1, maxsize=2)
+    gate = threading.Event()
+    jobs.submit(1, gate.wait)
+    while jobs.depth:   # نخ worker اولین کار را برداشته و منتظر است
+        pass
+    jobs.submit(1, lambda: None)
+    jobs.submit(1, lambda: None)
+    with pytest.raises(queue.Full):
+        jobs.submit(1, lambda: None, job_id=7)
+    assert jobs.rejected == 1
+    # تحویل نتیجه محاسبه رد نمی‌شود
+    assert jobs.submit(1, lambda: None, bounded=False)
+    gate.set()
+    jobs.join()
+    # update رد شده دوباره پذیرفته می‌شود
+    assert jobs.submit(1, lambda: None, job_id=7)
+    jobs.join()
+    jobs.shutdown()
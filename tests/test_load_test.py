@@ -0,0 +1,41 @@
+import importlib.util
+import json
+import sys
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from conftest import ROOT
+
+
+@pytest.fixture(scope="module")
+def load_test():
+    spec = importlib.util.spec_from_file_location("load_test", ROOT / "tools" / "load_test.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def bot_url(bot):
+    server = make_server("127.0.0.1", 0, bot.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_smoke_run_against_in_process_bot(load_test, bot, bot_url, monkeypatch, capsys):
+    # همه سناریوها یک دور کوتاه؛ هر تغییر در _params یا _MULTIPART_FIELD همین‌جا می‌شکند
+    monkeypatch.setattr(sys, "argv", [
+        "load_test.py", "--url", bot_url, "--chats", "2", "--duration", "3", "--ramp", "0.2",
+        "--think", "0.05", "--openai-latency", "0.05", "--timeout", "10", "--json",
+        "--telegram-port", str(bot.tg_port), "--openai-port", str(bot.oa_port),
+    ])
+    load_test.main()
+    [result] = json.loads(capsys.readouterr().out)
+    steps = {row["step"]: row for row in result["steps"]}
+    assert steps["webhook"]["count"] > 0
+    assert all(row["errors"] == 0 for row in result["steps"]), result["steps"]
+    assert any(step != "webhook" and row["count"] for step, row in steps.items())
+    assert result["telegram_calls"].get("sendMessage", 0) > 0
@@ -0,0 +1,57 @@
+import json
+from types import SimpleNamespace
+
+from core.media_cache import MediaCache
+
+
+def _image(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_workers_merge_index_instead_of_overwriting(tmp_path):
+    index = tmp_path / "ids.json"
+    a, b = MediaCache(index), MediaCache(index)
+    p1, p2 = _image(tmp_path, "1.jpg", b"one"), _image(tmp_path, "2.jpg", b"two")
+    assert b.file_id(p1) is None
+    a.remember(p1, "id-1")
+    b.remember(p2, "id-2")
+    stored = json.loads(index.read_text(encoding="utf-8"))
+    assert {e["file_id"] for e in stored.values()} == {"id-1", "id-2"}
+    # file_idی که worker دیگر گرفته، بدون آپلود دوباره استفاده می‌شود
+    assert b.file_id(p1) == "id-1"
+    assert a.file_id(p2) == "id-2"
+
+    b.forget(p1)
+    assert str(p1) not in json.loads(index.read_text(encoding="utf-8"))
+    assert MediaCache(index).file_id(p2) == "id-2"
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+        self.sent = 0
+
+    def _message(self):
+        self.sent += 1
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"fid-{self.sent}")])
+
+    def send_photo(self, cid, photo, **kwargs):
+        self.calls.append(("photo", 1))
+        return self._message()
+
+    def send_media_group(self, cid, media):
+        assert 2 <= len(media) <= 10
+        self.calls.append(("group", len(media)))
+        return [self._message() for _ in media]
+
+
+def test_album_with_single_image_tail(tmp_path):
+    paths = [_image(tmp_path, f"{i}.jpg", bytes([i])) for i in range(11)]
+    cache = MediaCache(tmp_path / "ids.json")
+    bot = FakeBot()
+    assert len(cache.send_album(bot, 1, paths, caption="گالری")) == 11
+    assert bot.calls == [("group", 10), ("photo", 1)]
+    assert cache.uploads == 11
+    assert all(cache.file_id(p) for p in paths)
@@ -0,0 +1,75 @@
+import re
+
+import pytest
+
+from core import metrics
+
+
+def test_counter_renders_help_type_and_labels():
+    reg = metrics.Registry()
+    c = reg.counter("jobs_total", "Jobs by outcome", ("result",))
+    c.inc(result="ok")
+    c.inc(2, result="ok")
+    c.inc(result="failed")
+    lines = reg.render().splitlines()
+    assert lines[:2] == ["# HELP jobs_total Jobs by outcome", "# TYPE jobs_total counter"]
+    assert 'jobs_total{result="ok"} 3' in lines
+    assert 'jobs_total{result="failed"} 1' in lines
+
+
+def test_label_values_are_escaped():
+    reg = metrics.Registry()
+    reg.counter("weird_total", "", ("name",)).inc(name='a"b\\c\nd')
+    assert 'weird_total{name="a\\"b\\\\c\\nd"} 1' in reg.render().splitlines()
+
+
+def test_labels_must_match_declaration():
+    c = metrics.Registry().counter("x_total", "", ("a",))
+    with pytest.raises(ValueError):
+        c.inc(b="1")
+
+
+def test_histogram_buckets_are_cumulative():
+    reg = metrics.Registry()
+    h = reg.histogram("latency_seconds", "Latency", ("handler",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, handler="cut")
+    lines = reg.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert lines[2:] == [
+        'latency_seconds_bucket{handler="cut",le="0.1"} 2',
+        'latency_seconds_bucket{handler="cut",le="1.0"} 3',
+        'latency_seconds_bucket{handler="cut",le="+Inf"} 4',
+        'latency_seconds_sum{handler="cut"} 3.65',
+        'latency_seconds_count{handler="cut"} 4',
+    ]
+
+
+def test_fn_gauge_is_read_at_scrape_and_failure_is_isolated():
+    reg = metrics.Registry()
+    depth = {"n": 3}
+    reg.gauge("queue_depth", "Depth", fn=lambda: depth["n"])
+    reg.gauge("broken", "Broken", fn=lambda: 1 / 0)
+    reg.gauge("by_kind", "By kind", ("kind",), fn=lambda: {"a": 1, "b": 2})
+    depth["n"] = 7
+    lines = reg.render().splitlines()
+    assert "queue_depth 7" in lines
+    assert any(line.startswith("# broken unavailable:") for line in lines)
+    assert 'by_kind{kind="a"} 1' in lines and 'by_kind{kind="b"} 2' in lines
+
+
+def test_metrics_endpoint_serves_exposition_format(bot):
+    bot.module.HANDLER_SECONDS.observe(0.02, handler="test", state="idle")
+    r = bot.app.test_client().get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = r.get_data(as_text=True)
+    # هیچ متریکی نباید هنگام scrape خطا بدهد
+    assert "unavailable" not in body
+    sample = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_]\w*="(\\.|[^"\\])*",?)*\})? \S+$')
+    for line in body.splitlines():
+        assert line.startswith("# HELP ") or line.startswith("# TYPE ") or sample.match(line), line
+    assert re.search(r"^job_queue_depth \d+$", body, re.M)
+    assert 'job_queue_jobs_total{result="processed"}' in body
+    assert 'bot_handler_seconds_bucket{handler="test",state="idle",le="+Inf"}' in body
+    assert 'bot_handler_seconds_count{handler="test",state="idle"}' in body
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from core import optimizer
+from core.optimizer import energy, optimise
+from core.packing import HEURISTICS, SORT_KEYS, CutConstraints, pack
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_never_worse_than_any_seed_heuristic(seed):
+    rng = random.Random(seed)
+    parts = [(rng.randint(10, 90), rng.randint(10, 90)) for _ in range(40)]
+    constraints = CutConstraints(kerf=0.4, trim=1.0)
+    result = optimise(parts, 183, 366, constraints=constraints, budget=0.3, seed=seed)
+    seeds = [pack(parts, 183, 366, heuristic=h, sort_key=k, constraints=constraints)
+             for h in HEURISTICS for k in SORT_KEYS]
+    assert energy(result.best) <= min(energy(r) for r in seeds)
+    assert result.best.sheet_count >= result.lower_bound
+    # روند بهبود فقط بهتر می‌شود
+    sheets = [h[1] for h in result.history]
+    assert sheets == sorted(sheets, reverse=True)
+
+
+def test_warm_start_is_first_candidate_and_annealing_seed(monkeypatch):
+    # هر ورق 100×100 فقط یک قطعه 60×60 می‌گیرد ولی حد پایین 3 است، پس تبرید اجرا می‌شود؛
+    # همه چیدمان‌ها هم‌انرژی‌اند، پس نتیجه به زمان اجرا بستگی ندارد
+    parts = [(60, 60)] * 7
+    warm = pack(parts, 100, 100, order=[6, 5, 4, 3, 2, 1, 0])
+    warm.heuristic = "warm-start"
+    warm_order = [p.index for s in warm.sheets for p in s.placements]
+    orders = []
+
+    def recording_pack(*args, **kwargs):
+        if kwargs.get("order") is not None:
+            orders.append(list(kwargs["order"]))
+        return pack(*args, **kwargs)
+
+    monkeypatch.setattr(optimizer, "pack", recording_pack)
+    result = optimise(parts, 100, 100, budget=0.2, seed=0, start=warm)
+    assert result.history[0][1] == warm.sheet_count
+    # برابر با بهترین: نقشه شروع گرم نگه داشته می‌شود
+    assert result.best is warm
+    assert orders[0] == warm_order
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.orders import SENDING, OrderStore
+
+
+def test_claim_never_hands_an_order_to_two_workers(tmp_path):
+    path = str(tmp_path / "orders.db")
+    first = OrderStore(path)
+    for i in range(40):
+        first.create(i, "علی", "09121234567", f"سفارش {i}")
+    # هر «worker» اتصال جدای خودش را دارد
+    stores = [first] + [OrderStore(path) for _ in range(3)]
+
+    def drain(store):
+        got = []
+        while True:
+            batch = store.claim(3)
+            if not batch:
+                return got
+            got.extend(o.id for o in batch)
+
+    with ThreadPoolExecutor(4) as pool:
+        claimed = [i for ids in pool.map(drain, stores) for i in ids]
+    assert sorted(claimed) == sorted(set(claimed)) and len(claimed) == 40
+
+
+def test_claim_oldest_first_and_reclaims_after_ttl(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db"), claim_ttl=0.2)
+    made = [store.create(1, "علی", "0912", f"سفارش {i}").tracking for i in range(3)]
+    batch = store.claim(2)
+    assert [o.tracking for o in batch] == made[:2]
+    assert [o.tracking for o in store.claim(5)] == made[2:]
+    assert store.claim(5) == [] and store.get(made[0]).status == SENDING
+    time.sleep(0.3)
+    # worker کرش کرده: بعد از claim_ttl دوباره در صف
+    assert [o.tracking for o in store.claim(5)] == made
+
+
+def test_by_phone_without_digits_finds_nothing(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db"))
+    store.create(1, "علی", "", "بدون تلفن")
+    store.create(2, "رضا", "+98 912 123 4567", "سفارش")
+    assert store.by_phone("ABC-XYZ") == []
+    assert [o.chat_id for o in store.by_phone("۰۹۱۲۱۲۳۴۵۶۷")] == [2]
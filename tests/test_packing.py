@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from core.packing import HEURISTICS, CutConstraints, Part, pack
+
+EPS = 1e-6
+
+
+def _overlap(a, b):
+    return (a.x < b.x + b.w - EPS and b.x < a.x + a.w - EPS
+            and a.y < b.y + b.h - EPS and b.y < a.y + a.h - EPS)
+
+
+def _parts(seed, n=120):
+    rng = random.Random(seed)
+    return [(rng.randint(5, 120), rng.randint(5, 120)) for _ in range(n)]
+
+
+@pytest.mark.parametrize("heuristic", sorted(HEURISTICS))
+def test_every_part_placed_once_in_bounds_without_overlap(heuristic):
+    parts = _parts(heuristic) + [(400, 50)]   # آخری در هیچ جهتی در ورق جا نمی‌شود
+    result = pack(parts, 183, 366, heuristic=heuristic)
+    placed = [p.index for s in result.sheets for p in s.placements]
+    assert sorted(placed + result.unplaced) == list(range(len(parts)))
+    assert result.unplaced == [len(parts) - 1]
+    for sheet in result.sheets:
+        for i, p in enumerate(sheet.placements):
+            assert 0 <= p.x and p.x + p.w <= 183 + EPS and 0 <= p.y and p.y + p.h <= 366 + EPS
+            w, h = parts[p.index]
+            assert (p.w, p.h) == ((h, w) if p.rotated else (w, h))
+            assert not any(_overlap(p, q) for q in sheet.placements[i + 1:])
+
+
+def _layout(result):
+    return [[(p.index, p.x, p.y, p.rotated) for p in s.placements] for s in result.sheets]
+
+
+@pytest.mark.parametrize("heuristic", sorted(HEURISTICS))
+def test_output_is_deterministic(heuristic):
+    parts = _parts(7)
+    first = pack(parts, 183, 366, heuristic=heuristic)
+    assert _layout(first) == _layout(pack(list(parts), 183, 366, heuristic=heuristic))
+    assert first.heuristic == heuristic
+
+
+def test_max_sheets_leaves_rest_unplaced():
+    result = pack([(100, 100)] * 5, 100, 100, max_sheets=2)
+    assert result.sheet_count == 2 and len(result.unplaced) == 3
+
+
+def _gap(a, b):
+    # فاصله دو قطعه روی محوری که از هم جدا هستند (منفی: همپوشانی)
+    return max(b.x - (a.x + a.w), a.x - (b.x + b.w), b.y - (a.y + a.h), a.y - (b.y + b.h))
+
+
+@pytest.mark.parametrize("heuristic", sorted(HEURISTICS))
+def test_kerf_between_neighbours_and_trim_at_edges(heuristic):
+    constraints = CutConstraints(kerf=0.4, trim=1.5)
+    result = pack(_parts(3), 183, 366, heuristic=heuristic, constraints=constraints)
+    for sheet in result.sheets:
+        for i, p in enumerate(sheet.placements):
+            assert p.x >= 1.5 - EPS and p.y >= 1.5 - EPS
+            assert p.x + p.w <= 183 - 1.5 + EPS and p.y + p.h <= 366 - 1.5 + EPS
+            for q in sheet.placements[i + 1:]:
+                assert _gap(p, q) >= 0.4 - EPS
+
+
+def test_part_exactly_usable_size_fits_without_trailing_kerf():
+    # دو قطعه 90 با تیغ 0.4 و دوربری 1 در عرض 182.4 جا می‌شوند
+    result = pack([(90, 50), (90, 50)], 182.4, 60, constraints=CutConstraints(kerf=0.4, trim=1),
+                  allow_rotation=False)
+    assert result.sheet_count == 1
+
+
+@pytest.mark.parametrize("heuristic", sorted(HEURISTICS))
+def test_grain_locked_parts_never_rotate(heuristic):
+    rng = random.Random(heuristic)
+    parts = [Part(rng.randint(5, 60), rng.randint(61, 150), grain=i % 2 == 0) for i in range(80)]
+    result = pack(parts, 183, 366, heuristic=heuristic)
+    placed = [p for s in result.sheets for p in s.placements]
+    assert not any(p.rotated for p in placed if parts[p.index].grain)
+    # بدون قفل رگه چرخش واقعاً استفاده می‌شود، پس آزمون بالا بی‌اثر نیست
+    assert any(p.rotated for p in placed)
+    whole = pack(parts, 183, 366, heuristic=heuristic, constraints=CutConstraints(grain=True))
+    assert not any(p.rotated for s in whole.sheets for p in s.placements)
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from core.packing import CutConstraints, pack
+
+pytest.importorskip("numpy")
+
+EPS = 1e-6
+
+
+def _overlap(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw - EPS and bx < ax + aw - EPS and ay < by + bh - EPS and by < ay + ah - EPS
+
+
+def _check(result, n, stock_w, stock_h, constraints):
+    use_w, use_h = constraints.usable(stock_w, stock_h)
+    lo = constraints.trim
+    placed = [p.index for s in result.sheets for p in s.placements]
+    assert sorted(placed + result.unplaced) == list(range(n))
+    for sheet in result.sheets:
+        rects = [(p.x, p.y, p.w, p.h) for p in sheet.placements]
+        for x, y, w, h in rects + sheet.free:
+            assert lo - EPS <= x and x + w <= lo + use_w + EPS
+            assert lo - EPS <= y and y + h <= lo + use_h + EPS
+        for i, a in enumerate(rects):
+            assert not any(_overlap(a, b) for b in rects[i + 1:])
+        # فضای خالی گزارش شده (برای باقیمانده‌ها و کش) واقعاً خالی است
+        for f in sheet.free:
+            assert not any(_overlap(f, r) for r in rects), f
+
+
+@pytest.mark.parametrize("heuristic", ["maxrects-bssf", "maxrects-baf", "maxrects-bl"])
+def test_numpy_kernel_matches_python_kernel_guarantees(heuristic):
+    rng = random.Random(heuristic)
+    parts = [(rng.randint(5, 90), rng.randint(5, 90)) for _ in range(1500)]
+    constraints = CutConstraints(kerf=0.4, trim=1.0)
+    results = {k: pack(parts, 183, 366, heuristic=heuristic, constraints=constraints, kernel=k)
+               for k in ("python", "numpy")}
+    for result in results.values():
+        _check(result, len(parts), 183, 366, constraints)
+    # همان قاعده انتخاب: اولین ورق ممکن، بعد بهترین امتیاز
+    assert results["numpy"].sheet_count == results["python"].sheet_count
@@ -0,0 +1,75 @@
+import random
+
+from core.cutlist import expand
+from core.packing import CutConstraints, pack
+from core.plan_cache import PlanCache, family, fingerprint
+
+C = CutConstraints(kerf=0.4, trim=1.0)
+
+
+def _parts(seed, n=30):
+    rng = random.Random(seed)
+    return [(rng.choice((30, 45, 60)), rng.choice((20, 40, 70))) for _ in range(n)]
+
+
+def _check_indices(result, parts):
+    # هر اندیس به قطعه‌ای با همان ابعاد (با توجه به چرخش) اشاره می‌کند، هر قطعه یک بار
+    placed = [p for s in result.sheets for p in s.placements]
+    assert sorted(p.index for p in placed) + sorted(result.unplaced) == sorted(range(len(parts)))
+    for p in placed:
+        w, h = parts[p.index][:2]
+        assert (p.w, p.h) == ((h, w) if p.rotated else (w, h))
+
+
+def test_fingerprint_ignores_order_and_labels():
+    items_a = [(60, 40, False, 3, "درب"), (30, 20, False, 2, "طبقه")]
+    items_b = [(30, 20, False, 2, "shelf"), (60, 40, False, 3, "door")]
+    assert fingerprint(expand(items_a), 183, 366, C) == fingerprint(expand(items_b), 183, 366, C)
+    parts = _parts(1)
+    shuffled = parts[:]
+    random.Random(2).shuffle(shuffled)
+    assert fingerprint(parts, 183, 366, C) == fingerprint(shuffled, 183, 366, C)
+    assert fingerprint(parts, 183, 366, C) != fingerprint(parts[1:], 183, 366, C)
+    assert fingerprint(parts, 183, 366, C) != fingerprint(parts, 183, 366, C, "optimise")
+
+
+def test_cached_plan_is_remapped_to_the_new_part_order(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.db"))
+    parts = _parts(3)
+    key, fam = fingerprint(parts, 183, 366, C), family(183, 366, C)
+    cache.put(key, fam, parts, pack(parts, 183, 366, constraints=C))
+    shuffled = parts[:]
+    random.Random(4).shuffle(shuffled)
+    hit = cache.get(key, shuffled)
+    assert hit is not None
+    _check_indices(hit, shuffled)
+
+
+def test_warm_start_reports_only_new_parts(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.db"))
+    parts = _parts(5)
+    fam = family(183, 366, C)
+    cache.put(fingerprint(parts, 183, 366, C), fam, parts, pack(parts, 183, 366, constraints=C))
+    grown = list(reversed(parts)) + [(25, 15)]
+    start, add = cache.nearest(fam, grown)
+    assert add == [len(grown) - 1]
+    placed = [p for s in start for p in s.placements]
+    assert sorted(p.index for p in placed) == list(range(len(parts)))
+    for p in placed:
+        w, h = grown[p.index]
+        assert (p.w, p.h) == ((h, w) if p.rotated else (w, h))
+
+
+def test_eviction_keeps_total_size_under_limit(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.db"), max_bytes=6000)
+    fam = family(183, 366, C)
+    keys = []
+    for seed in range(10):
+        parts = _parts(seed)
+        keys.append(fingerprint(parts, 183, 366, C))
+        cache.put(keys[-1], fam, parts, pack(parts, 183, 366, constraints=C))
+        assert cache.stats()["bytes"] <= 6000
+    # کم‌استفاده‌ترین‌ها (قدیمی‌ترها) حذف شده‌اند، آخرین نقشه مانده است
+    assert 0 < cache.stats()["plans"] < 10
+    assert cache.get(keys[-1], _parts(9)) is not None
+    assert cache.get(keys[0], _parts(0)) is None
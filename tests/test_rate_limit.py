@@ -0,0 +1,47 @@
+from core.rate_limit import CHAT_LIMITED, CHEAP, FULL, SHED, SHORT, AdmissionControl
+
+
+def test_background_admission_uses_cheap_model_and_inflight():
+    limiter = AdmissionControl(max_inflight=2, cheap_model="mini")
+    admission = limiter.admit(None)
+    assert admission.decision == CHEAP and admission.model == "mini"
+    assert limiter.inflight == 1
+    limiter.release()
+    assert limiter.inflight == 0
+
+
+def test_background_admission_yields_under_load():
+    limiter = AdmissionControl(max_inflight=4, short_at=0.5)
+    limiter.admit(1)
+    limiter.admit(2)
+    # بار 0.5: پیام کاربر هنوز پذیرفته می‌شود ولی کار پس‌زمینه نه
+    assert limiter.admit(None).decision == SHED
+    assert limiter.admit(3).allowed
+
+
+def test_shed_message_refunds_chat_token():
+    limiter = AdmissionControl(chat_burst=2, max_inflight=1)
+    assert limiter.admit(1).allowed
+    # ظرفیت هم‌زمان پر: پیام‌های چت 2 رد می‌شوند ولی سهمش مصرف نمی‌شود
+    assert [limiter.admit(2).decision for _ in range(3)] == [SHED] * 3
+    limiter.release()
+    assert limiter.admit(2).allowed
+
+
+def test_chat_bucket_limits_one_chat_only():
+    limiter = AdmissionControl(chat_burst=2, max_inflight=100)
+    decisions = [limiter.admit(1).decision for _ in range(3)]
+    assert decisions[:2] == [FULL, FULL] and decisions[2] == CHAT_LIMITED
+    assert limiter.admit(1).retry_after > 0
+    assert limiter.admit(2).decision == FULL
+
+
+def test_degrades_with_load_before_shedding():
+    limiter = AdmissionControl(chat_burst=20, global_burst=1000, max_inflight=10,
+                               cheap_at=0.3, short_at=0.6, model="big", cheap_model="mini",
+                               short_tokens=100)
+    decisions = [limiter.admit(1) for _ in range(10)]
+    assert decisions[0].model == "big"
+    assert {a.decision for a in decisions[3:6]} == {CHEAP}
+    assert decisions[-1].decision == SHORT and decisions[-1].max_tokens == 100
+    assert limiter.admit(1).decision == SHED
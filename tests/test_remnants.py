@@ -0,0 +1,38 @@
+from core.job import Stock
+from core.packing import Sheet
+from core.remnants import RemnantStore
+
+
+def _store(tmp_path, **kw):
+    return RemnantStore(str(tmp_path / "remnants.db"), **kw)
+
+
+def test_hold_records_nothing_until_confirmed(tmp_path):
+    store = _store(tmp_path, resolution=0.4)
+    store.add("MDF 16", [(100, 80)])
+    offered = store.offer("MDF 16", [(30, 30)])
+    sheet = Sheet(183, 366, free=[(0, 300, 180, 66.3)])
+    token = store.hold([("MDF 16", [sheet], [offered[0]], offered)])
+    # تا تأیید برش: باقیمانده جدیدی ثبت نشده و باقیمانده مصرفی به سفارش دیگری داده نمی‌شود
+    assert store.count("MDF 16") == 1
+    assert store.offer("MDF 16", [(30, 30)]) == []
+    assert len(store.confirm(token)) == 1
+    assert store.confirm(token) is None
+    # باقیمانده مصرفی حذف شده و فقط فضای خالی ورق، رو به پایین به مضرب ضخامت تیغ، مانده است
+    [stock] = store.reserve("MDF 16", 1, 1)
+    assert (stock.w, stock.h) == (180, 66.0)
+
+
+def test_unused_offers_are_released_and_materials_stay_apart(tmp_path):
+    store = _store(tmp_path)
+    store.add("MDF 16", [(100, 80)])
+    store.add("MDF 18", [(100, 80)])
+    offered = store.offer("MDF 16", [(30, 30)])
+    assert store.hold([("MDF 16", [], [Stock(183, 366)], offered)]) is None
+    assert len(store.offer("MDF 16", [(30, 30)])) == 1
+    assert store.count("MDF 18") == 1
+
+
+def test_settle_skips_sizes_below_resolution(tmp_path):
+    store = _store(tmp_path, resolution=0.4)
+    assert store.add("MDF 16", [(0.3, 50), (50, 50)]) and store.count() == 1
@@ -0,0 +1,53 @@
+from core.response_cache import ResponseCache, normalise, trigrams
+
+BASE = "قیمت کابینت آشپزخانه ممبران هر متر چند است"
+
+
+def _jaccard(a, b):
+    a, b = trigrams(normalise(a)), trigrams(normalise(b))
+    return len(a & b) / len(a | b)
+
+
+def test_normalise_unifies_persian_variants():
+    # ی و ک عربی، ارقام فارسی/عربی، نیم‌فاصله، اعراب و کشیده
+    assert normalise("كابينت") == normalise("کابینت") == "کابینت"
+    assert normalise("۱۸۳x۳۶۶") == normalise("١٨٣x٣٦٦") == "183x366"
+    assert normalise("می‌خواهم") == normalise("می خواهم")
+    assert normalise("كـابـيـنـتٌ!") == "کابینت"
+    assert normalise("  سلام   \n  خوبی؟ ") == "سلام خوبی"
+
+
+def test_exact_hit_after_normalisation(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.db"))
+    cache.put("قيمت كابينت ممبران؟", "متری ۴ میلیون")
+    assert cache.get("قیمت کابینت ممبران") == "متری ۴ میلیون"
+    assert cache.stats()["hits"] == 1
+
+
+def test_similarity_threshold(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.db"), similarity=0.85)
+    cache.put(BASE, "پاسخ")
+    near = "قیمت کابینت آشپزخانه ممبران هر متری چند است"
+    far = "قیمت کابینت آشپزخانه ممبران هر متر چنده"
+    assert _jaccard(BASE, near) >= 0.85 > _jaccard(BASE, far) > 0.8
+    assert cache.get(near) == "پاسخ"
+    assert cache.get(far) is None
+    assert cache.get("قیمت کابینت آشپزخانه هایگلاس هر متر چند است") is None
+    stats = cache.stats()
+    assert (stats["similar_hits"], stats["misses"]) == (1, 2)
+
+
+def test_memory_only_cache_matches_exactly():
+    cache = ResponseCache()
+    cache.put(BASE, "پاسخ")
+    assert cache.get("قیمت کابینت آشپزخانه ممبران هر متری چند است") is None
+    assert cache.get(BASE) == "پاسخ"
+
+
+def test_entries_survive_restart_and_expire(tmp_path):
+    path = str(tmp_path / "responses.db")
+    ResponseCache(path=path).put(BASE, "پاسخ")
+    assert ResponseCache(path=path).get(BASE) == "پاسخ"
+    expired = ResponseCache(path=path, ttl=-1)
+    expired.put("سلام", "درود")
+    assert expired.get("سلام") is None
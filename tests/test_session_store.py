@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from core.session_store import MemorySessionStore, Session, SqliteSessionStore, open_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kw):
+        if request.param == "memory":
+            return MemorySessionStore(**kw)
+        return SqliteSessionStore(str(tmp_path / "sessions.db"), **kw)
+    return make
+
+
+def test_round_trip_keeps_state_and_persian_data(make_store):
+    store = make_store()
+    store.save(Session(7, "cut_parts", {"stock": [183, 366], "items": [[60, 40, False, 2, "درب"]]}))
+    session = store.load(7)
+    assert session.state == "cut_parts"
+    assert session.data == {"stock": [183, 366], "items": [[60, 40, False, 2, "درب"]]}
+    # جلسه خالی ذخیره نمی‌شود و قبلی پاک می‌شود
+    session.reset()
+    store.save(session)
+    assert len(store) == 0 and store.load(7).state is None
+
+
+def test_expired_sessions_are_not_loaded(make_store):
+    store = make_store(ttl=0.05)
+    store.save(Session(1, "order_name"))
+    assert store.load(1).state == "order_name"
+    time.sleep(0.1)
+    assert store.load(1).state is None and store.load(1).data == {}
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_size=2)
+    for cid in (1, 2):
+        store.save(Session(cid, "s"))
+    store.load(1)                    # 1 تازه استفاده شده
+    store.save(Session(3, "s"))
+    assert len(store) == 2
+    assert store.load(2).state is None and store.load(1).state == "s" and store.load(3).state == "s"
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SqliteSessionStore(path), SqliteSessionStore(path)
+    first.save(Session(5, "order_phone", {"name": "علی"}))
+    assert second.load(5).data == {"name": "علی"}
+    second.clear(5)
+    assert first.load(5).state is None
+
+
+def test_open_store_picks_backend(tmp_path):
+    assert isinstance(open_store(""), MemorySessionStore)
+    assert isinstance(open_store("memory"), MemorySessionStore)
+    assert isinstance(open_store(str(tmp_path / "s.db")), SqliteSessionStore)
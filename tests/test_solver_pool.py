@@ -0,0 +1,26 @@
+from core.optimizer import OptimiseResult, optimise
+from core.packing import NO_CONSTRAINTS, pack
+from core.solver_pool import SolverPool, _run_warm
+
+PARTS = [(50, 50)] * 4
+
+
+def test_warm_start_at_lower_bound_skips_fresh_pack():
+    start = pack(PARTS[:3], 100, 100).sheets
+    result = _run_warm(PARTS, 100, 100, NO_CONSTRAINTS, start, [3])
+    assert result.heuristic == "warm-start" and result.sheet_count == 1
+
+
+def test_optimise_keeps_warm_seed_when_nothing_beats_it():
+    warm = pack(PARTS, 100, 100)
+    warm.heuristic = "warm-start"
+    result = optimise(PARTS, 100, 100, budget=0.2, seed=1, start=warm)
+    assert result.best is warm and result.iterations >= 1
+
+
+def test_optimise_mode_uses_warm_layout_as_seed():
+    pool = SolverPool(workers=0)
+    start = pack(PARTS[:3], 100, 100).sheets
+    result = pool.submit(PARTS, 100, 100, budget=0.2, warm=(start, [3])).result()
+    assert isinstance(result, OptimiseResult)
+    assert result.best.heuristic == "warm-start" and not result.best.unplaced
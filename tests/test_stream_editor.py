@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core import stream_editor
+from core.stream_editor import CURSOR, TELEGRAM_TEXT_LIMIT, StreamingMessage, stream_to_chat
+
+
+class FakeBot:
+    def __init__(self, bad_markdown=False):
+        self.calls = []
+        self.bad_markdown = bad_markdown
+        self._ids = 0
+
+    def send_message(self, cid, text, parse_mode=None):
+        self._check(text, parse_mode)
+        self._ids += 1
+        self.calls.append(("send", self._ids, text, parse_mode))
+        return SimpleNamespace(message_id=self._ids)
+
+    def edit_message_text(self, text, cid, message_id, parse_mode=None):
+        self._check(text, parse_mode)
+        self.calls.append(("edit", message_id, text, parse_mode))
+
+    def _check(self, text, parse_mode):
+        assert len(text) <= TELEGRAM_TEXT_LIMIT
+        if parse_mode and self.bad_markdown:
+            raise RuntimeError("can't parse entities")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(stream_editor, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_edits_are_throttled_and_final_flush_uses_markdown(clock):
+    bot = FakeBot()
+    message = StreamingMessage(bot, 1, min_interval=1.0, min_chars=5)
+    message.feed("سلام")
+    for _ in range(10):
+        clock[0] += 0.15
+        message.feed(" دنیا")
+    # اولین تکه فوراً، بعد حداکثر یک ویرایش در هر ثانیه
+    assert [c[0] for c in bot.calls] == ["send", "edit"]
+    assert bot.calls[0][2] == "سلام" + CURSOR and bot.calls[0][3] is None
+    message.finish()
+    kind, mid, text, mode = bot.calls[-1]
+    assert (kind, mid, mode) == ("edit", 1, "Markdown")
+    assert text == "سلام" + " دنیا" * 10
+
+
+def test_small_changes_wait_for_min_chars(clock):
+    bot = FakeBot()
+    message = StreamingMessage(bot, 1, min_interval=0, min_chars=20)
+    message.feed("شروع")
+    message.feed("ab")
+    assert len(bot.calls) == 1
+    message.feed("x" * 20)
+    assert bot.calls[-1][0] == "edit"
+
+
+def test_long_answers_split_into_messages_at_newlines(clock):
+    bot = FakeBot()
+    line = "خط " * 30 + "\n"
+    chunks = [line] * 200
+    message = stream_to_chat(bot, 1, chunks, min_interval=0, min_chars=1)
+    sent = [c for c in bot.calls if c[0] == "send"]
+    assert len(sent) > 1
+    # متن نهایی هر پیام با Markdown؛ بدون گم شدن یا تکرار متن
+    finals = {}
+    for kind, mid, text, mode in bot.calls:
+        if mode == "Markdown":
+            finals[mid] = text
+    assert len(finals) == len(sent)
+    assert "\n".join(finals[m] for m in sorted(finals)) == "".join(chunks)
+    assert all(not t.endswith(CURSOR) for t in finals.values())
+    assert message.text == finals[max(finals)]
+
+
+def test_invalid_markdown_falls_back_to_plain_text(clock):
+    bot = FakeBot(bad_markdown=True)
+    stream_to_chat(bot, 1, ["*نیمه", "کاره"])
+    assert bot.calls[-1][2:] == ("*نیمه" + "کاره", None)
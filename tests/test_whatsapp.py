@@ -0,0 +1,89 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.orders import FAILED, PENDING, SENT, OrderStore
+from core.whatsapp import WhatsAppDispatcher
+
+
+class GraphStub(BaseHTTPRequestHandler):
+    statuses = []   # وضعیت پاسخ هر درخواست به ترتیب
+    bodies = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        GraphStub.bodies.append((self.path, self.headers["Authorization"], body))
+        status = GraphStub.statuses.pop(0) if GraphStub.statuses else 200
+        payload = {"messages": [{"id": f"wamid.{len(GraphStub.bodies)}"}]} if status == 200 else {}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def graph():
+    GraphStub.statuses, GraphStub.bodies = [], []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphStub)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _setup(tmp_path, graph, statuses, **kw):
+    store = OrderStore(str(tmp_path / "orders.db"))
+    order = store.create(1, "علی", "09121234567", "کابینت")
+    GraphStub.statuses = list(statuses)
+    dispatcher = WhatsAppDispatcher(store, "secret", "123", to="989120000000", api_url=graph,
+                                    rate=1000, **kw)
+    return store, order, dispatcher
+
+
+def _row(store, order):
+    return store._db.execute("SELECT status, attempts, next_try, message_id FROM orders WHERE id = ?",
+                             (order.id,)).fetchone()
+
+
+def test_ok_marks_sent(tmp_path, graph):
+    store, order, dispatcher = _setup(tmp_path, graph, [200])
+    assert dispatcher.run_once() is False
+    status, attempts, _, message_id = _row(store, order)
+    assert (status, attempts, message_id) == (SENT, 1, "wamid.1")
+    path, auth, body = GraphStub.bodies[0]
+    assert path == "/123/messages" and auth == "Bearer secret"
+    assert body["to"] == "989120000000" and order.tracking in body["text"]["body"]
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_throttled_or_server_error_retries_with_backoff(tmp_path, graph, status):
+    store, order, dispatcher = _setup(tmp_path, graph, [status])
+    dispatcher.run_once()
+    state, attempts, next_try, _ = _row(store, order)
+    assert (state, attempts) == (PENDING, 1) and dispatcher.retried == 1
+    # تا پایان تأخیر دوباره برداشته نمی‌شود
+    assert next_try > order.created + 4 and store.claim() == []
+
+
+def test_client_error_fails_permanently(tmp_path, graph):
+    store, order, dispatcher = _setup(tmp_path, graph, [400])
+    dispatcher.run_once()
+    assert _row(store, order)[0] == FAILED and dispatcher.failed == 1 and dispatcher.retried == 0
+
+
+def test_gives_up_after_max_attempts(tmp_path, graph):
+    store, order, dispatcher = _setup(tmp_path, graph, [503, 503], max_attempts=2)
+    dispatcher.run_once()
+    assert _row(store, order)[0] == PENDING
+    # تأخیر تمام شده
+    store._db.execute("UPDATE orders SET next_try = 0 WHERE id = ?", (order.id,))
+    dispatcher.run_once()
+    state, attempts, _, _ = _row(store, order)
+    assert (state, attempts) == (FAILED, 2) and dispatcher.failed == 1 and len(GraphStub.bodies) == 2
@@ -0,0 +1,218 @@
+"""
+بنچمارک سرعت و بازده موتور برش
+
+برای هر نمونه (۱۰ تا ۱۰٬۰۰۰ قطعه) زمان اجرا، اوج حافظه، تعداد ورق، حد پایین و درصد پرتی
+گزارش می‌شود. خروجی JSON را می‌توان به عنوان مبنا ذخیره کرد و اجرای بعدی را با آن مقایسه کرد؛
+اگر تعداد ورق بیشتر شود یا زمان از حد مجاز کندتر شود، خروج با کد ۱.
+
+مجموعه نمونه‌ها:
+- tools/instances/*.json: نمونه‌های ثابت همراه مخزن (کلاس‌های Berkey-Wang و کابینت)
+- bw1..bw6 و cabinet با --sizes: تولید تصادفی با seed ثابت (تکرارپذیر)
+
+اجرا از ریشه پروژه:
+    python tools/cut_bench.py
+    python tools/cut_bench.py --sizes 10 100 1000 10000 --json > baseline.json
+    python tools/cut_bench.py --baseline baseline.json --time-tolerance 1.5
+    python tools/cut_bench.py --heuristic guillotine-sas --optimise 2
+    python tools/cut_bench.py --sizes 5000 --classes bw5 --kernel numpy
+    python tools/cut_bench.py --generate      # بازسازی فایل‌های tools/instances
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.optimizer import lower_bound, optimise  # noqa: E402
+from core.packing import CutConstraints, pack  # noqa: E402
+
+INSTANCE_DIR = os.path.join(ROOT, "tools", "instances")
+BUNDLED_SIZES = (10, 100, 1000)
+
+# کلاس‌های Berkey & Wang (1987): (ابعاد ورق، بازه ابعاد قطعات)
+BERKEY_WANG = {
+    "bw1": (10, (1, 10)),
+    "bw2": (30, (1, 10)),
+    "bw3": (40, (1, 35)),
+    "bw4": (100, (1, 35)),
+    "bw5": (100, (1, 100)),
+    "bw6": (300, (1, 100)),
+}
+
+# قطعات رایج کابینت روی ورق ۱۸۳×۳۶۶ (سانتی‌متر): بدنه، طبقه، درب، کشو
+CABINET_PARTS = [
+    (72, 56), (72, 56), (56, 56), (56, 10), (72, 40), (72, 30),
+    (60, 40), (40, 20), (45, 56), (90, 56), (200, 60), (35, 35),
+]
+
+
+def berkey_wang(cls, n, seed):
+    size, (lo, hi) = BERKEY_WANG[cls]
+    rng = random.Random(f"{cls}-{n}-{seed}")
+    parts = [(rng.randint(lo, hi), rng.randint(lo, hi)) for _ in range(n)]
+    return {"name": f"{cls}-{n}", "stock": [size, size], "parts": parts}
+
+
+def cabinet(n, seed):
+    rng = random.Random(f"cabinet-{n}-{seed}")
+    parts = [rng.choice(CABINET_PARTS) for _ in range(n)]
+    return {"name": f"cabinet-{n}", "stock": [183, 366], "parts": parts,
+            "kerf": 0.4, "trim": 1.0}
+
+
+def generate(classes, sizes, seed):
+    for n in sizes:
+        for cls in classes:
+            yield cabinet(n, seed) if cls == "cabinet" else berkey_wang(cls, n, seed)
+
+
+def _grouped(parts):
+    # ذخیره فشرده: [w, h, تعداد]
+    counts = {}
+    for p in parts:
+        counts[tuple(p)] = counts.get(tuple(p), 0) + 1
+    return [[w, h, q] for (w, h), q in sorted(counts.items())]
+
+
+def write_bundled(seed):
+    os.makedirs(INSTANCE_DIR, exist_ok=True)
+    for inst in generate(list(BERKEY_WANG) + ["cabinet"], BUNDLED_SIZES, seed):
+        data = dict(inst, parts=_grouped(inst["parts"]))
+        with open(os.path.join(INSTANCE_DIR, f"{inst['name']}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+            f.write("\n")
+        print(f"wrote {inst['name']}")
+
+
+def load_bundled():
+    for name in sorted(os.listdir(INSTANCE_DIR)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(INSTANCE_DIR, name), encoding="utf-8") as f:
+            data = json.load(f)
+        data["parts"] = [(w, h) for w, h, q in data["parts"] for _ in range(q)]
+        yield data
+
+
+def run(inst, heuristic, budget, seed, render, kernel="python"):
+    parts = inst["parts"]
+    stock_w, stock_h = inst["stock"]
+    constraints = CutConstraints(kerf=inst.get("kerf", 0.0), trim=inst.get("trim", 0.0))
+
+    def solve():
+        if budget:
+            return optimise(parts, stock_w, stock_h, constraints=constraints,
+                            budget=budget, seed=seed).best
+        return pack(parts, stock_w, stock_h, heuristic=heuristic, constraints=constraints,
+                    kernel=kernel)
+
+    # زمان بدون tracemalloc (سربار آن زمان را چند برابر می‌کند)، حافظه در اجرای جدا
+    gc.collect()
+    t0 = time.perf_counter()
+    result = solve()
+    wall = time.perf_counter() - t0
+
+    render_ms = None
+    if render:
+        from core.renderer import render_png_pages
+        t0 = time.perf_counter()
+        render_png_pages(result.sheets)
+        render_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    peak_kb = None
+    if not budget:
+        gc.collect()
+        tracemalloc.start()
+        solve()
+        peak_kb = round(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+
+    return {
+        "instance": inst["name"],
+        "parts": len(parts),
+        "heuristic": "optimise" if budget else heuristic,
+        "wall_ms": round(wall * 1000, 1),
+        "peak_kb": peak_kb,
+        "render_ms": render_ms,
+        "sheets": result.sheet_count,
+        "lower_bound": lower_bound(parts, stock_w, stock_h, constraints),
+        "unplaced": len(result.unplaced),
+        "waste_percent": round(result.waste_percent, 2),
+    }
+
+
+def compare(results, baseline, time_tolerance):
+    # رگرسیون: ورق بیشتر یا کندتر از time_tolerance برابر مبنا (زیر ۵ میلی‌ثانیه نادیده)
+    base = {(r["instance"], r["heuristic"]): r for r in baseline}
+    problems = []
+    for r in results:
+        b = base.get((r["instance"], r["heuristic"]))
+        if b is None:
+            continue
+        if r["sheets"] > b["sheets"] or r["unplaced"] > b["unplaced"]:
+            problems.append(f"{r['instance']}: sheets {b['sheets']} -> {r['sheets']}")
+        if r["wall_ms"] > max(5.0, b["wall_ms"] * time_tolerance):
+            problems.append(f"{r['instance']}: time {b['wall_ms']}ms -> {r['wall_ms']}ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", type=int,
+                        help="تولید نمونه‌های تصادفی با این تعداد قطعه به جای فایل‌های همراه")
+    parser.add_argument("--classes", nargs="*", default=list(BERKEY_WANG) + ["cabinet"])
+    parser.add_argument("--filter", help="فقط نمونه‌هایی که نامشان شامل این متن است")
+    parser.add_argument("--heuristic", default="maxrects-bssf")
+    parser.add_argument("--optimise", type=float, default=0, help="بودجه جستجو (ثانیه)")
+    parser.add_argument("--kernel", default="python", choices=("python", "numpy"))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--render", action="store_true", help="زمان رسم PNG هم اندازه‌گیری شود")
+    parser.add_argument("--json", action="store_true", help="خروجی JSON")
+    parser.add_argument("--baseline", help="فایل JSON اجرای قبلی برای مقایسه")
+    parser.add_argument("--time-tolerance", type=float, default=1.5)
+    parser.add_argument("--generate", action="store_true", help="بازسازی نمونه‌های همراه")
+    args = parser.parse_args()
+
+    if args.generate:
+        write_bundled(args.seed)
+        return
+
+    if args.sizes:
+        instances = generate(args.classes, args.sizes, args.seed)
+    else:
+        instances = load_bundled()
+
+    results = []
+    for inst in instances:
+        if args.filter and args.filter not in inst["name"]:
+            continue
+        r = run(inst, args.heuristic, args.optimise, args.seed, args.render, args.kernel)
+        results.append(r)
+        if not args.json:
+            extra = f"  render {r['render_ms']:.0f}ms" if r["render_ms"] is not None else ""
+            mem = f"{r['peak_kb']:>7} KB" if r["peak_kb"] is not None else "       -  "
+            print(f"{r['instance']:<16} {r['parts']:>6} parts  {r['wall_ms']:>9.1f} ms  {mem}  "
+                  f"{r['sheets']:>5} sheets (lb {r['lower_bound']})  waste {r['waste_percent']:5.1f}%"
+                  f"{extra}")
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.time_tolerance)
+        for p in problems:
+            print(f"REGRESSION {p}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
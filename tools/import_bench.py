@@ -0,0 +1,111 @@
+"""
+بنچمارک زمان ایمپورت ماژول‌های بات
+
+هر ماژول در یک پردازه تازه با `python -X importtime` ایمپورت می‌شود و هزینه تجمعی
+ماژول‌های سطح بالا (میکروثانیه) گزارش می‌شود.
+
+اجرا از ریشه پروژه:
+    python tools/import_bench.py
+    python tools/import_bench.py --json
+    python tools/import_bench.py flask telebot openai
+    python tools/import_bench.py --bot      # کل فایل بات تا آماده شدن اپ Flask
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "flask",
+    "telebot",
+    "requests",
+    "httpx",
+    "openai",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_agg",
+    "matplotlib.pyplot",
+    "core.h_agent",
+    "core.packing",
+    "core.optimizer",
+    "core.solver_pool",
+    "core.renderer",
+    "core.async_transport",
+]
+
+
+BOT_SCRIPT = "najjar-bot.py"
+
+
+def measure(module, code=None):
+    # یک پردازه تازه تا کش ایمپورت پردازه قبلی روی نتیجه اثر نگذارد
+    env = dict(os.environ, WARMUP="0")
+    env.setdefault("TELEGRAM_TOKEN", "0:bench")
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code or f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env=env,
+    )
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        return {"module": module, "ok": False, "error": proc.stderr.strip().splitlines()[-1:]}
+
+    cumulative = 0
+    heaviest = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cum_us, name = line.split("|")
+            cum = int(cum_us.strip())
+        except ValueError:
+            continue
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if code is not None and depth == 0:
+            # اسکریپت: مجموع همه ایمپورت‌های سطح بالا
+            cumulative += cum
+            heaviest.append((cum, name.strip()))
+        elif depth == 0 and name.strip() == module:
+            cumulative = cum
+        elif depth == 1:
+            heaviest.append((cum, name.strip()))
+    heaviest.sort(reverse=True)
+    return {
+        "module": module,
+        "ok": True,
+        "cumulative_ms": round(cumulative / 1000, 1),
+        "process_ms": round(wall * 1000, 1),
+        "top_deps": [{"module": n, "ms": round(c / 1000, 1)} for c, n in heaviest[:5]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--json", action="store_true", help="خروجی JSON")
+    parser.add_argument("--bot", action="store_true", help="اندازه‌گیری کل فایل بات")
+    args = parser.parse_args()
+
+    results = [measure(m) for m in args.modules]
+    if args.bot:
+        code = f"import runpy; runpy.run_path({BOT_SCRIPT!r})"
+        results.append(measure(BOT_SCRIPT, code))
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    for r in sorted(results, key=lambda r: -r.get("cumulative_ms", -1)):
+        if not r["ok"]:
+            print(f"{r['module']:<36} FAILED {' '.join(r['error'])}")
+            continue
+        deps = ", ".join(f"{d['module']} {d['ms']}ms" for d in r["top_deps"][:3])
+        print(f"{r['module']:<36} {r['cumulative_ms']:>8.1f} ms  (process {r['process_ms']:.0f} ms)  {deps}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+"""
+آزمون بار وبهوک با ترافیک مصنوعی تلگرام
+
+چند صد چت مجازی هم‌زمان Updateهای واقعی را به مسیر webhook می‌فرستند: منو و نمونه کارها،
+ویزارد ثبت سفارش، برش بهینه و چت هوش مصنوعی. تلگرام و OpenAI با سرورهای stub محلی
+جایگزین می‌شوند؛ زمان هر مرحله از ارسال Update تا رسیدن اولین پاسخ بات به stub تلگرام است.
+
+برای هر پیکربندی گونیکورن (worker×thread) بات در پردازه جدا با پایگاه‌داده‌های موقت اجرا
+و به تفکیک هر مرحله توان عملیاتی، صدک‌های تأخیر و نرخ خطا گزارش می‌شود.
+
+اجرا از ریشه پروژه:
+    python tools/load_test.py --chats 200 --duration 60 --configs 1x8 2x8 4x4
+    python tools/load_test.py --mix menu=1 ai=3 --openai-latency 1.5
+    python tools/load_test.py --url http://127.0.0.1:5000 --telegram-port 8081 --openai-port 8082
+        (بات از قبل اجرا شده با TELEGRAM_TOKEN=1000:loadtest و آدرس stubها؛ بدون گونیکورن)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from urllib.parse import parse_qsl, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "1000:loadtest"
+FIRST_CHAT = 10_000_000
+
+# --- stub تلگرام ---
+
+_MULTIPART_FIELD = re.compile(rb'name="([^"]+)"\r\n\r\n([^\r]*)\r\n')
+
+
+class Replies:
+    """پیام‌های خروجی بات به تفکیک چت؛ چت مجازی منتظر اولین پاسخ بعد از Update خودش می‌ماند"""
+
+    def __init__(self):
+        self.methods = Counter()
+        self._waiters = {}
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def expect(self, chat_id, loop):
+        future = loop.create_future()
+        with self._lock:
+            self._waiters[chat_id] = (loop, future)
+        return future
+
+    def cancel(self, chat_id):
+        with self._lock:
+            self._waiters.pop(chat_id, None)
+
+    def quiet_for(self, chat_id):
+        # ثانیه از آخرین پیام به این چت (پیام‌های انتهایی مرحله قبل)
+        return time.monotonic() - self._last.get(chat_id, 0.0)
+
+    def record(self, method, chat_id):
+        with self._lock:
+            self.methods[method] += 1
+            self._last[chat_id] = time.monotonic()
+            waiter = self._waiters.pop(chat_id, None)
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(time.perf_counter()))
+
+
+def _params(handler, body):
+    params = dict(parse_qsl(urlparse(handler.path).query))
+    kind = handler.headers.get("Content-Type", "")
+    if "json" in kind:
+        params.update(json.loads(body or b"{}"))
+    elif "multipart" in kind:
+        params.update((k.decode(), v.decode(errors="replace")) for k, v in _MULTIPART_FIELD.findall(body))
+    elif body:
+        params.update(parse_qsl(body.decode(errors="replace")))
+    return params
+
+
+class TelegramStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ids = count(1)
+
+    def log_message(self, *args):
+        pass
+
+    def _message(self, chat_id, photo=False):
+        n = next(self.ids)
+        msg = {"message_id": n, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}}
+        if photo:
+            msg["photo"] = [{"file_id": f"stub-{n}", "file_unique_id": f"u{n}", "width": 800,
+                             "height": 600}]
+        return msg
+
+    def _result(self, method, params):
+        chat_id = int(params.get("chat_id") or 0)
+        if method == "getMe":
+            return {"id": 1000, "is_bot": True, "first_name": "stub", "username": "stub_bot"}
+        if method == "sendMediaGroup":
+            media = params.get("media", "[]")
+            media = json.loads(media) if isinstance(media, str) else media
+            return [self._message(chat_id, photo=True) for _ in media]
+        if method in ("sendMessage", "sendPhoto", "sendDocument", "editMessageText"):
+            return self._message(chat_id, photo=method == "sendPhoto")
+        return True
+
+    def _reply(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        method = urlparse(self.path).path.rsplit("/", 1)[-1]
+        params = _params(self, body)
+        data = json.dumps({"ok": True, "result": self._result(method, params)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if params.get("chat_id") and method not in ("sendChatAction", "getFile"):
+            self.server.replies.record(method, int(params["chat_id"]))
+
+    do_GET = do_POST = _reply
+
+
+# --- stub OpenAI ---
+
+ANSWER = ("برای ساخت کابینت اول ابعاد دقیق دیوار را اندازه بگیرید، بعد متریال مناسب را انتخاب کنید "
+          "و نقشه برش را آماده کنید. ").split()
+
+
+class OpenAIStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        model = body.get("model", "")
+        self.server.models[model] += 1
+        latency = self.server.latency * random.uniform(0.5, 1.5)
+        words = ANSWER[:max(1, min(len(ANSWER), body.get("max_tokens", 800) // 20))]
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": model}
+        if not body.get("stream"):
+            time.sleep(latency)
+            data = json.dumps(dict(base, object="chat.completion", choices=[
+                {"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                 "finish_reason": "stop"}],
+                usage={"prompt_tokens": 200, "completion_tokens": len(words), "total_tokens": 200 + len(words)},
+            )).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        # استریم SSE با chunked؛ زمان تا اولین تکه یک سوم تأخیر
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(latency / 3)
+        step = latency * 2 / 3 / len(words)
+        for i, word in enumerate(words):
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": word + " "}, "finish_reason": None}])
+            self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            time.sleep(step)
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def serve(handler, port, **attrs):
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    for name, value in attrs.items():
+        setattr(server, name, value)
+    threading.Thread(target=server.serve_forever, name=handler.__name__, daemon=True).start()
+    return server
+
+
+# --- سناریوها ---
+
+PARTS = ["60x40 x4", "72x56 x2", "56x10 x6", "45x56 x2", "35x35 ر", "90x56", "40x20 x8"]
+QUESTIONS = [
+    "برای کابینت آشپزخانه چه ام دی افی مناسب است؟",
+    "هزینه ساخت کمد دیواری دو متری چقدر می‌شود؟",
+    "چطور لولای درب کابینت را تنظیم کنم؟",
+    "ام دی اف ضد رطوبت برای سرویس بهداشتی خوب است؟",
+]
+
+
+def scenario(name, rng):
+    """مراحل یک سناریو -> [(نام مرحله، متن پیام یا None، داده callback یا None)]"""
+    if name == "menu":
+        return [("start", "/start", None), ("gallery", "🖼️ نمونه کارها", None),
+                ("gallery_page", None, rng.choice(["gallery_kitchen", "gallery_wardrobe"])),
+                ("contact", "📞 تماس با ما", None), ("about", "📝 درباره ما", None)]
+    if name == "order":
+        return [("order_start", "📦 ثبت سفارش", None), ("order_name", "علی رضایی", None),
+                ("order_phone", f"0912{rng.randrange(10 ** 7):07d}", None),
+                ("order_details", "کابینت آشپزخانه ۴ متری، هایگلاس سفید", None),
+                ("order_confirm", "✅ بله، ارسال کن", None)]
+    if name == "cut":
+        parts = "\n".join(rng.sample(PARTS, rng.randint(2, len(PARTS))))
+        return [("cut_start", "✂️ برش بهینه", None), ("cut_stock", "183x366", None),
+                ("cut_parts", parts, None), ("cut_plan", "تمام", None)]
+    if name == "ai":
+        return [("ai_start", "🤖 چت با حسین (هوش مصنوعی)", None)] + [
+            ("ai_chat", rng.choice(QUESTIONS), None) for _ in range(rng.randint(1, 3))]
+    raise ValueError(f"unknown scenario {name}")
+
+
+SCENARIOS = ("menu", "order", "cut", "ai")
+update_ids = count(1)
+
+
+def make_update(chat_id, text=None, data=None):
+    user = {"id": chat_id, "is_bot": False, "first_name": "Load", "language_code": "fa"}
+    message = {"message_id": next(update_ids), "date": int(time.time()),
+               "chat": {"id": chat_id, "type": "private"}, "from": user}
+    if data is None:
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(update_ids), "message": message}
+    return {"update_id": next(update_ids), "callback_query": {
+        "id": str(next(update_ids)), "from": user, "chat_instance": str(chat_id),
+        "message": message, "data": data}}
+
+
+# --- بار ---
+
+class Stats:
+    def __init__(self):
+        self.latency = {}
+        self.errors = Counter()
+
+    def ok(self, step, seconds):
+        self.latency.setdefault(step, []).append(seconds)
+
+    def error(self, step):
+        self.errors[step] += 1
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def virtual_chat(client, url, chat_id, replies, stats, mix, deadline, args, rng):
+    loop = asyncio.get_running_loop()
+    names, weights = zip(*mix.items())
+    while time.monotonic() < deadline:
+        for step, text, data in scenario(rng.choices(names, weights)[0], rng):
+            # پیام‌های انتهایی مرحله قبل نباید پاسخ این مرحله حساب شوند
+            while replies.quiet_for(chat_id) < args.quiet:
+                await asyncio.sleep(args.quiet)
+            waiter = replies.expect(chat_id, loop)
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(url, json=make_update(chat_id, text, data))
+                stats.ok("webhook", time.perf_counter() - t0)
+                if r.status_code != 200:
+                    raise RuntimeError(f"HTTP {r.status_code}")
+                done = await asyncio.wait_for(waiter, args.timeout)
+                stats.ok(step, done - t0)
+            except Exception:
+                replies.cancel(chat_id)
+                stats.error(step)
+                break   # سناریوی نیمه‌کاره؛ از ابتدا با سناریوی دیگر
+            await asyncio.sleep(rng.uniform(0, 2 * args.think))
+            if time.monotonic() >= deadline:
+                return
+
+
+async def run_load(url, replies, args, mix):
+    import httpx
+
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.chats, max_keepalive_connections=args.chats)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        start = time.monotonic()
+        deadline = start + args.duration
+        rng = random.Random(args.seed)
+        tasks = []
+        for i in range(args.chats):
+            tasks.append(asyncio.create_task(virtual_chat(
+                client, f"{url}/{TOKEN}", FIRST_CHAT + i, replies, stats, mix, deadline, args,
+                random.Random(rng.random()))))
+            # شروع پلکانی تا همه چت‌ها در یک لحظه نرسند
+            await asyncio.sleep(args.ramp / args.chats)
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+    return stats, elapsed
+
+
+def report(config, stats, elapsed, replies, models):
+    rows = []
+    for step in sorted(set(stats.latency) | set(stats.errors)):
+        values = stats.latency.get(step, [])
+        errors = stats.errors[step]
+        total = len(values) + errors if step != "webhook" else len(values)
+        rows.append({
+            "config": config, "step": step, "count": len(values), "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.5) * 1000, 1),
+            "p90_ms": round(percentile(values, 0.9) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+            "max_ms": round(max(values, default=0) * 1000, 1),
+        })
+    return {"config": config, "elapsed": round(elapsed, 1), "steps": rows,
+            "telegram_calls": dict(replies.methods), "openai_models": dict(models)}
+
+
+def print_report(result):
+    print(f"\n== {result['config']}  ({result['elapsed']}s)")
+    print(f"{'step':<14} {'count':>7} {'err%':>6} {'rps':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for r in result["steps"]:
+        print(f"{r['step']:<14} {r['count']:>7} {r['error_rate'] * 100:>5.1f}% {r['rps']:>7.2f} "
+              f"{r['p50_ms']:>8.0f} {r['p90_ms']:>8.0f} {r['p99_ms']:>8.0f} {r['max_ms']:>8.0f}")
+    print(f"telegram: {result['telegram_calls']}")
+    print(f"openai models: {result['openai_models']}")
+
+
+# --- گونیکورن ---
+
+def start_bot(workers, threads, port, tg_port, oa_port, workdir, extra_env):
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_TOKEN": TOKEN,
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{tg_port}",
+        "ASYNC_TRANSPORT": "1",
+        "OPENAI_API_KEY": "sk-loadtest",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{oa_port}/v1",
+        "SESSION_STORE": os.path.join(workdir, "sessions.db"),
+        "JOB_DEDUP_DB": os.path.join(workdir, "dedup.db"),
+        "REMNANT_DB": os.path.join(workdir, "remnants.db"),
+        "PLAN_CACHE": os.path.join(workdir, "plan_cache.db"),
+        "ORDER_DB": os.path.join(workdir, "orders.db"),
+        "MEDIA_INDEX": os.path.join(workdir, "file_ids.json"),
+        "WHATSAPP_TOKEN": "",
+    })
+    env.update(extra_env)
+    cmd = [sys.executable, "-m", "gunicorn", "-w", str(workers), "--threads", str(threads),
+           "-b", f"127.0.0.1:{port}", "--chdir", ROOT, "--log-level", "warning", "najjar-bot:app"]
+    log = open(os.path.join(workdir, "gunicorn.log"), "wb")
+    return subprocess.Popen(cmd, env=env, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url, proc, timeout=120):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"bot exited with code {proc.returncode}")
+        try:
+            r = httpx.get(f"{url}/health", timeout=2)
+            if r.status_code == 200 and r.json().get("warm"):
+                return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"bot at {url} not ready after {timeout}s")
+
+
+def parse_mix(values):
+    mix = {name: 1.0 for name in SCENARIOS}
+    for item in values or []:
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chats", type=int, default=200, help="چت‌های مجازی هم‌زمان")
+    parser.add_argument("--duration", type=float, default=60, help="ثانیه برای هر پیکربندی")
+    parser.add_argument("--ramp", type=float, default=5, help="ثانیه تا شروع همه چت‌ها")
+    parser.add_argument("--configs", nargs="*", default=["1x8", "2x8"],
+                        help="پیکربندی‌های گونیکورن به شکل workersxthreads")
+    parser.add_argument("--mix", nargs="*", help="وزن سناریوها، مثل menu=4 order=1 cut=1 ai=2")
+    parser.add_argument("--think", type=float, default=1.0, help="میانگین مکث کاربر بین پیام‌ها")
+    parser.add_argument("--quiet", type=float, default=0.2,
+                        help="سکوت لازم چت قبل از مرحله بعد (پیام‌های انتهایی مرحله قبل)")
+    parser.add_argument("--timeout", type=float, default=30, help="حداکثر انتظار برای پاسخ بات")
+    parser.add_argument("--openai-latency", type=float, default=1.0, help="میانگین تأخیر stub OpenAI")
+    parser.add_argument("--url", help="بات در حال اجرا (بدون اجرای گونیکورن)")
+    parser.add_argument("--port", type=int, default=5055, help="پورت گونیکورن")
+    parser.add_argument("--telegram-port", type=int, default=0)
+    parser.add_argument("--openai-port", type=int, default=0)
+    parser.add_argument("--env", nargs="*", default=[], help="متغیرهای محیطی اضافه بات، KEY=VALUE")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="خروجی JSON")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    replies = Replies()
+    models = Counter()
+    tg = serve(TelegramStub, args.telegram_port, replies=replies)
+    oa = serve(OpenAIStub, args.openai_port, models=models, latency=args.openai_latency)
+    tg_port, oa_port = tg.server_address[1], oa.server_address[1]
+
+    if args.url:
+        configs = [("external", None)]
+    else:
+        configs = [(c, tuple(int(n) for n in c.lower().split("x"))) for c in args.configs]
+    extra_env = dict(item.partition("=")[::2] for item in args.env)
+
+    results = []
+    for name, shape in configs:
+        replies.methods.clear()
+        models.clear()
+        proc = None
+        with tempfile.TemporaryDirectory(prefix="najjar-load-") as workdir:
+            url = args.url.rstrip("/") if args.url else f"http://127.0.0.1:{args.port}"
+            if shape is not None:
+                proc = start_bot(shape[0], shape[1], args.port, tg_port, oa_port, workdir, extra_env)
+            try:
+                wait_ready(url, proc)
+                stats, elapsed = asyncio.run(run_load(url, replies, args, mix))
+            finally:
+                if proc is not None:
+                    proc.terminate()
+                    try:
+                        proc.wait(30)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+        result = report(name, stats, elapsed, replies, models)
+        results.append(result)
+        if not args.json:
+            print_report(result)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()